@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+################################################################################
+#
+#	RMG Website - A Django-powered website for Reaction Mechanism Generator
+#
+#	Copyright (c) 2011 Prof. William H. Green (whgreen@mit.edu) and the
+#	RMG Team (rmg_dev@mit.edu)
+#
+#	Permission is hereby granted, free of charge, to any person obtaining a
+#	copy of this software and associated documentation files (the 'Software'),
+#	to deal in the Software without restriction, including without limitation
+#	the rights to use, copy, modify, merge, publish, distribute, sublicense,
+#	and/or sell copies of the Software, and to permit persons to whom the
+#	Software is furnished to do so, subject to the following conditions:
+#
+#	The above copyright notice and this permission notice shall be included in
+#	all copies or substantial portions of the Software.
+#
+#	THE SOFTWARE IS PROVIDED 'AS IS', WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#	IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#	FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#	AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#	LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+#	FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#	DEALINGS IN THE SOFTWARE.
+#
+################################################################################
+
+
+"""
+Compare how quickly each of the available renderers draws every group in the
+group trees of one or more kinetics families, i.e. the images on the group tree
+pages of the database website. The image cache is bypassed.
+"""
+
+import time
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rmgweb.database.tools import getKineticsDatabase
+from rmgweb.main.images import GROUP_RENDERERS, getGroupGraph, getGraphLayout
+
+################################################################################
+
+class Command(BaseCommand):
+    args = '<family> [<family> ...]'
+    help = 'Time drawing every group in the given kinetics families with each group renderer.'
+    option_list = BaseCommand.option_list + (
+        make_option('--format', dest='format', default='png',
+            help='The image format to draw, either png or svg.'),
+        make_option('--renderer', action='append', dest='renderers',
+            help='A renderer to time (may be given more than once); all are timed by default.'),
+    )
+
+    def handle(self, *args, **options):
+        if not args:
+            raise CommandError('Give the label of at least one kinetics family.')
+        adjlists = []
+        for label in args:
+            try:
+                groups = getKineticsDatabase('families', '{0}/groups'.format(label))
+            except ValueError:
+                raise CommandError('Unknown kinetics family "{0}".'.format(label))
+            adjlists.extend([entry.item.toAdjacencyList() for entry in groups.entries.values() if hasattr(entry.item, 'toAdjacencyList')])
+        if not adjlists:
+            raise CommandError('No groups to draw.')
+
+        renderers = options['renderers'] or sorted(GROUP_RENDERERS)
+        for renderer in renderers:
+            if renderer not in GROUP_RENDERERS:
+                raise CommandError('Unknown renderer "{0}"; choose from {1}.'.format(renderer, ', '.join(sorted(GROUP_RENDERERS))))
+
+        print '{0:<10} {1:>8} {2:>10} {3:>12} {4:>12}'.format('Renderer', 'Images', 'Total (s)', 'Each (ms)', 'Size (kB)')
+
+        # The part of the Cairo renderer that doesn't need Cairo: reading each
+        # group and laying out its graph
+        t0 = time.time()
+        for adjlist in adjlists:
+            nodes, edges = getGroupGraph(adjlist)
+            getGraphLayout(len(nodes), edges)
+        seconds = time.time() - t0
+        print '{0:<10} {1:>8d} {2:>10.2f} {3:>12.1f} {4:>12}'.format('(layout)', len(adjlists), seconds, 1000 * seconds / len(adjlists), '-')
+
+        for renderer in renderers:
+            size = 0
+            t0 = time.time()
+            try:
+                for adjlist in adjlists:
+                    size += len(GROUP_RENDERERS[renderer](adjlist, options['format']))
+            except Exception, e:
+                # Most likely Cairo or Graphviz is not installed; pydot raises
+                # a plain Exception if it can't find neato
+                print '{0:<10} not available: {1}'.format(renderer, e)
+                continue
+            seconds = time.time() - t0
+            print '{0:<10} {1:>8d} {2:>10.2f} {3:>12.1f} {4:>12.1f}'.format(renderer, len(adjlists), seconds, 1000 * seconds / len(adjlists), size / 1024.)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+################################################################################
+#
+#	RMG Website - A Django-powered website for Reaction Mechanism Generator
+#
+#	Copyright (c) 2011 Prof. William H. Green (whgreen@mit.edu) and the
+#	RMG Team (rmg_dev@mit.edu)
+#
+#	Permission is hereby granted, free of charge, to any person obtaining a
+#	copy of this software and associated documentation files (the 'Software'),
+#	to deal in the Software without restriction, including without limitation
+#	the rights to use, copy, modify, merge, publish, distribute, sublicense,
+#	and/or sell copies of the Software, and to permit persons to whom the
+#	Software is furnished to do so, subject to the following conditions:
+#
+#	The above copyright notice and this permission notice shall be included in
+#	all copies or substantial portions of the Software.
+#
+#	THE SOFTWARE IS PROVIDED 'AS IS', WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#	IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#	FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#	AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#	LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+#	FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#	DEALINGS IN THE SOFTWARE.
+#
+################################################################################
+
+
+"""
+Measure how long it takes to query RMG-Java for the kinetics of a reaction
+and to read its answer, using a stand-in for the RMG-Java server that answers
+with a given number of species (as RMG-Java does for reactive species), each
+way of delimiting the answers.
+"""
+
+import time
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rmgpy.molecule import Molecule
+
+from rmgweb.database import tools
+from rmgweb.database.rmgjava import RMG_JAVA_FRAMINGS
+from rmgweb.database.tests import StandInRMGJavaServer, makeRMGJavaResponse
+
+################################################################################
+
+class Command(BaseCommand):
+    help = 'Time queries to RMG-Java for kinetics against a stand-in server.'
+    option_list = BaseCommand.option_list + (
+        make_option('--species', dest='species', type='int', default=500,
+            help='The number of species in each answer.'),
+        make_option('--queries', dest='queries', type='int', default=20,
+            help='The number of queries to time with each framing.'),
+    )
+
+    def handle(self, *args, **options):
+        if options['species'] < 4 or options['queries'] < 1:
+            raise CommandError('Give at least 4 species and 1 query.')
+        reactants = [Molecule().fromSMILES('C'), Molecule().fromSMILES('[OH]')]
+        products = [Molecule().fromSMILES('[CH3]'), Molecule().fromSMILES('O')]
+        species = zip(['CH4(1)', 'OH(2)', 'CH3(3)', 'H2O(4)'], reactants + products)
+        # Pad the answer with alkanes, which never match the query
+        for i in range(4, options['species']):
+            species.append(('C{0}({0})'.format(i), Molecule().fromSMILES('C' * (i % 20 + 2))))
+        response = makeRMGJavaResponse(species, ['CH4(1) + OH(2) --> CH3(3) + H2O(4)\t1.0e+07\t1.83\t2.78\tH_Abstraction estimate'])
+
+        saved = (tools.settings.RMG_JAVA_HOST, tools.settings.RMG_JAVA_PORT, tools.settings.RMG_JAVA_FRAMING)
+        print '{0:<10} {1:>8} {2:>12} {3:>11} {4:>12}'.format('Framing', 'Queries', 'Connections', 'Total (s)', 'Each (ms)')
+        try:
+            for framing in RMG_JAVA_FRAMINGS:
+                server = StandInRMGJavaServer(response, framing=framing)
+                server.start()
+                tools.settings.RMG_JAVA_HOST = 'localhost'
+                tools.settings.RMG_JAVA_PORT = server.port
+                tools.settings.RMG_JAVA_FRAMING = framing
+                t0 = time.time()
+                for i in range(options['queries']):
+                    reactionList = tools.getRMGJavaKinetics(reactants, products, raiseErrors=True)
+                    if len(reactionList) != 1:
+                        raise CommandError('Expected 1 reaction from the stand-in server, not {0}.'.format(len(reactionList)))
+                seconds = time.time() - t0
+                tools.getRMGJavaClient().close()
+                server.stop()
+                print '{0:<10} {1:>8d} {2:>12d} {3:>11.2f} {4:>12.1f}'.format(framing, options['queries'], server.connections, seconds, 1000 * seconds / options['queries'])
+        finally:
+            tools.settings.RMG_JAVA_HOST, tools.settings.RMG_JAVA_PORT, tools.settings.RMG_JAVA_FRAMING = saved
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+################################################################################
+#
+#	RMG Website - A Django-powered website for Reaction Mechanism Generator
+#
+#	Copyright (c) 2011 Prof. William H. Green (whgreen@mit.edu) and the
+#	RMG Team (rmg_dev@mit.edu)
+#
+#	Permission is hereby granted, free of charge, to any person obtaining a
+#	copy of this software and associated documentation files (the 'Software'),
+#	to deal in the Software without restriction, including without limitation
+#	the rights to use, copy, modify, merge, publish, distribute, sublicense,
+#	and/or sell copies of the Software, and to permit persons to whom the
+#	Software is furnished to do so, subject to the following conditions:
+#
+#	The above copyright notice and this permission notice shall be included in
+#	all copies or substantial portions of the Software.
+#
+#	THE SOFTWARE IS PROVIDED 'AS IS', WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#	IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#	FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#	AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#	LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+#	FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#	DEALINGS IN THE SOFTWARE.
+#
+################################################################################
+
+
+"""
+Measure how long kinetics searches take, i.e. the reactions pages of the
+database website, and how much of that is spent removing duplicate reactions
+from the results. Duplicates are removed both by comparing every pair of
+reactions, as the website used to, and by comparing only those with the same
+:func:`getReactionKey`. Only the kinetics families are searched, so the
+reaction cache, kinetics libraries and RMG-Java are bypassed.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rmgpy.molecule import Molecule
+
+from rmgweb.database.tools import loadDatabase, generateReactionsUncached, getUniqueReactions
+
+# The searches made if none are given: radicals react in many families, so
+# give the most reactions to deduplicate
+DEFAULT_SEARCHES = ['[CH3]', '[OH]+CC', '[H]+C=C', '[CH2]C=C', 'C=CC=C']
+
+################################################################################
+
+def getUniqueReactionsPairwise(reactionList):
+    """
+    Return the unique reactions in `reactionList` and the number of times
+    each appears, by checking each reaction for isomorphism against every
+    unique reaction so far.
+    """
+    uniqueReactionList = []
+    uniqueReactionCount = []
+    for reaction in reactionList:
+        for i, rxn in enumerate(uniqueReactionList):
+            if reaction.isIsomorphic(rxn):
+                uniqueReactionCount[i] += 1
+                break
+        else:
+            uniqueReactionList.append(reaction)
+            uniqueReactionCount.append(1)
+    return uniqueReactionList, uniqueReactionCount
+
+class CountingReaction(object):
+    """
+    A wrapper around a `reaction` that counts the isomorphism checks made
+    with it in the class attribute `checks`, since the number of checks is
+    what each way of deduplicating reactions is trying to reduce.
+    """
+    checks = 0
+
+    def __init__(self, reaction):
+        self.reaction = reaction
+        self.reactants = reaction.reactants
+        self.products = reaction.products
+
+    def isIsomorphic(self, other):
+        CountingReaction.checks += 1
+        return self.reaction.isIsomorphic(other.reaction)
+
+def countIsomorphismChecks(function, reactionList):
+    """
+    Return the number of isomorphism checks made when calling `function` to
+    deduplicate the reactions in `reactionList`.
+    """
+    CountingReaction.checks = 0
+    function([CountingReaction(reaction) for reaction in reactionList])
+    return CountingReaction.checks
+
+class Command(BaseCommand):
+    args = '[<smiles>[+<smiles>...] ...]'
+    help = 'Time kinetics searches for the given reactants, and deduplicating their results.'
+
+    def handle(self, *args, **options):
+        searches = args or DEFAULT_SEARCHES
+        database = loadDatabase('kinetics')
+
+        print '{0:<20} {1:>9} {2:>7} {3:>11} {4:>13} {5:>13} {6:>16} {7:>16}'.format('Reactants', 'Reactions', 'Unique', 'Search (s)', 'Pairwise (s)', 'Bucketed (s)', 'Pairwise checks', 'Bucketed checks')
+        for search in searches:
+            try:
+                reactants = [Molecule().fromSMILES(smiles) for smiles in search.split('+')]
+            except Exception, e:
+                raise CommandError('Invalid reactants "{0}": {1}'.format(search, e))
+
+            t0 = time.time()
+            reactionList = generateReactionsUncached(database, reactants, only_families=database.kinetics.families.keys())[0]
+            t1 = time.time()
+            pairwise = getUniqueReactionsPairwise(reactionList)
+            t2 = time.time()
+            bucketed = getUniqueReactions(reactionList)
+            t3 = time.time()
+            if pairwise[1] != bucketed[1]:
+                raise CommandError('Deduplicating the reactions of "{0}" gave different results each way.'.format(search))
+            # Count the isomorphism checks separately, so that counting them
+            # doesn't slow down the timings
+            pairwiseChecks = countIsomorphismChecks(getUniqueReactionsPairwise, reactionList)
+            bucketedChecks = countIsomorphismChecks(getUniqueReactions, reactionList)
+            print '{0:<20} {1:>9d} {2:>7d} {3:>11.2f} {4:>13.2f} {5:>13.2f} {6:>16d} {7:>16d}'.format(search, len(reactionList), len(bucketed[0]), t1 - t0, t2 - t1, t3 - t2, pairwiseChecks, bucketedChecks)
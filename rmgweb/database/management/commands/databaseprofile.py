@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+################################################################################
+#
+#	RMG Website - A Django-powered website for Reaction Mechanism Generator
+#
+#	Copyright (c) 2011 Prof. William H. Green (whgreen@mit.edu) and the
+#	RMG Team (rmg_dev@mit.edu)
+#
+#	Permission is hereby granted, free of charge, to any person obtaining a
+#	copy of this software and associated documentation files (the 'Software'),
+#	to deal in the Software without restriction, including without limitation
+#	the rights to use, copy, modify, merge, publish, distribute, sublicense,
+#	and/or sell copies of the Software, and to permit persons to whom the
+#	Software is furnished to do so, subject to the following conditions:
+#
+#	The above copyright notice and this permission notice shall be included in
+#	all copies or substantial portions of the Software.
+#
+#	THE SOFTWARE IS PROVIDED 'AS IS', WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#	IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#	FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#	AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#	LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+#	FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#	DEALINGS IN THE SOFTWARE.
+#
+################################################################################
+
+
+"""
+Load the RMG database and print how long each part of it took to load, how
+many entries it has, and roughly how much memory it uses. Load times are only
+known for the parts of the database actually loaded from the database files by
+this command, so use ``--no-snapshot`` to ignore any saved snapshot.
+"""
+
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+
+from rmgweb.database import tools
+
+################################################################################
+
+class Command(NoArgsCommand):
+    help = 'Load the RMG database and print a table of load times, entry counts and memory use.'
+    option_list = NoArgsCommand.option_list + (
+        make_option('--no-sizes', action='store_false', dest='sizes', default=True,
+            help='Do not compute the (slow) approximate memory use of each part of the database.'),
+        make_option('--no-snapshot', action='store_false', dest='snapshot', default=True,
+            help='Load the database from its files rather than from a saved snapshot.'),
+    )
+
+    def handle_noargs(self, **options):
+        if not options['snapshot']:
+            tools.settings.DATABASE_SNAPSHOT_PATH = None
+        tools.loadDatabase()
+        if options['sizes']:
+            tools.measureDatabaseSizes()
+        print tools.formatDatabaseProfile(tools.getDatabaseProfile())
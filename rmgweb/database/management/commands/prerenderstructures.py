@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+################################################################################
+#
+#	RMG Website - A Django-powered website for Reaction Mechanism Generator
+#
+#	Copyright (c) 2011 Prof. William H. Green (whgreen@mit.edu) and the
+#	RMG Team (rmg_dev@mit.edu)
+#
+#	Permission is hereby granted, free of charge, to any person obtaining a
+#	copy of this software and associated documentation files (the 'Software'),
+#	to deal in the Software without restriction, including without limitation
+#	the rights to use, copy, modify, merge, publish, distribute, sublicense,
+#	and/or sell copies of the Software, and to permit persons to whom the
+#	Software is furnished to do so, subject to the following conditions:
+#
+#	The above copyright notice and this permission notice shall be included in
+#	all copies or substantial portions of the Software.
+#
+#	THE SOFTWARE IS PROVIDED 'AS IS', WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#	IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#	FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#	AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#	LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+#	FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#	DEALINGS IN THE SOFTWARE.
+#
+################################################################################
+
+
+"""
+Draw every molecule and group in the RMG database into the static media, so
+that the database pages can link to these images rather than having each one
+drawn on demand by the website.
+"""
+
+import os
+import sys
+import multiprocessing
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand, CommandError
+
+from rmgpy.molecule import Molecule
+from rmgpy.group import Group
+from rmgpy.species import Species
+
+from rmgweb.database.tools import loadDatabase, getDatabaseObjects, DATABASE_SECTIONS
+from rmgweb.main.images import prerenderImage, getPrerenderedImagePath
+
+################################################################################
+
+def getItemStructures(item):
+    """
+    Return a list of (kind, adjlist) pairs for each of the structures that
+    are drawn for the database entry `item`.
+    """
+    if isinstance(item, Species):
+        return getItemStructures(item.molecule[0]) if item.molecule else []
+    elif isinstance(item, Molecule):
+        return [('molecule', item.toAdjacencyList(removeH=True))]
+    elif isinstance(item, Group):
+        return [('group', item.toAdjacencyList())]
+    elif hasattr(item, 'reactants') and hasattr(item, 'products'):
+        structures = []
+        for reactant in item.reactants + item.products:
+            structures.extend(getItemStructures(reactant))
+        return structures
+    return []
+
+def getDatabaseStructures():
+    """
+    Return a set of (kind, adjlist) pairs for every structure in the entries
+    of the loaded RMG database.
+    """
+    databases = []
+    for component, section in DATABASE_SECTIONS:
+        for db in getDatabaseObjects(component, section).values():
+            if component == 'kinetics' and section == 'families':
+                databases.extend([db.groups, db.rules] + list(db.depositories))
+            else:
+                databases.append(db)
+    structures = set()
+    for db in databases:
+        for entries in db.entries.values():
+            # The rules of a family map each label to a list of entries
+            if not isinstance(entries, list):
+                entries = [entries]
+            for entry in entries:
+                structures.update(getItemStructures(entry.item))
+    return structures
+
+def prerenderWorker(args):
+    """
+    Pre-render one structure in a worker process. Returns ``None`` if
+    successful, or a message describing the error if not.
+    """
+    kind, adjlist, format = args
+    try:
+        prerenderImage(kind, adjlist, format)
+    except Exception, e:
+        return 'Unable to draw {0}:\n{1}\n{2}: {3}'.format(kind, adjlist, e.__class__.__name__, e)
+    return None
+
+class Command(NoArgsCommand):
+    help = 'Draw every molecule and group in the RMG database into the static media.'
+    option_list = NoArgsCommand.option_list + (
+        make_option('--format', action='append', dest='formats',
+            help='An image format to draw, either png or svg (may be given more than once); png by default.'),
+        make_option('--processes', type='int', dest='processes', default=None,
+            help='The number of processes to draw with; one per CPU by default.'),
+        make_option('--force', action='store_true', dest='force', default=False,
+            help='Draw structures again even if they have already been drawn.'),
+    )
+
+    def handle_noargs(self, **options):
+        formats = options['formats'] or ['png']
+        for format in formats:
+            if format not in ['png', 'svg']:
+                raise CommandError('Invalid image format "{0}".'.format(format))
+
+        loadDatabase()
+        tasks = []
+        for kind, adjlist in sorted(getDatabaseStructures()):
+            for format in formats:
+                if options['force'] or not os.path.isfile(getPrerenderedImagePath(kind, adjlist, format)):
+                    tasks.append((kind, adjlist, format))
+        print 'Drawing {0:d} images...'.format(len(tasks))
+
+        pool = multiprocessing.Pool(options['processes'])
+        errors = 0
+        try:
+            for count, error in enumerate(pool.imap_unordered(prerenderWorker, tasks, chunksize=16)):
+                if error is not None:
+                    print >> sys.stderr, error
+                    errors += 1
+                if (count + 1) % 1000 == 0:
+                    print 'Drew {0:d} of {1:d} images'.format(count + 1, len(tasks))
+        finally:
+            pool.close()
+            pool.join()
+        print 'Drew {0:d} images ({1:d} failed)'.format(len(tasks) - errors, errors)
@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+################################################################################
+#
+#	RMG Website - A Django-powered website for Reaction Mechanism Generator
+#
+#	Copyright (c) 2011 Prof. William H. Green (whgreen@mit.edu) and the
+#	RMG Team (rmg_dev@mit.edu)
+#
+#	Permission is hereby granted, free of charge, to any person obtaining a
+#	copy of this software and associated documentation files (the 'Software'),
+#	to deal in the Software without restriction, including without limitation
+#	the rights to use, copy, modify, merge, publish, distribute, sublicense,
+#	and/or sell copies of the Software, and to permit persons to whom the
+#	Software is furnished to do so, subject to the following conditions:
+#
+#	The above copyright notice and this permission notice shall be included in
+#	all copies or substantial portions of the Software.
+#
+#	THE SOFTWARE IS PROVIDED 'AS IS', WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#	IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#	FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#	AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#	LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+#	FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#	DEALINGS IN THE SOFTWARE.
+#
+################################################################################
+
+
+"""
+This module contains a client for the RMG-Java PopulateReactions server, which
+the website queries for RMG-Java's reactions and kinetics, and a stand-in for
+that server to test and benchmark the client against.
+"""
+
+import os
+import errno
+import time
+import socket
+import struct
+import threading
+
+import settings
+
+from rmgpy.molecule import Molecule
+
+from rmgweb.main.cache import MemoryCache
+
+################################################################################
+
+class RMGJavaError(Exception):
+    """
+    An exception raised when the RMG-Java server can't be queried.
+    """
+    pass
+
+################################################################################
+
+# The ways requests and responses can be delimited: 'close' for a response
+# that ends when the server closes the connection, as the RMG-Java server
+# does, or 'length' for requests and responses each preceded by their length
+# as a four-byte big-endian integer, which lets a connection be reused
+RMG_JAVA_FRAMINGS = ['close', 'length']
+
+# The errors seen when writing to or reading from a connection that the
+# server has closed while it sat idle
+STALE_CONNECTION_ERRNOS = [errno.ECONNRESET, errno.EPIPE, errno.ECONNABORTED]
+
+def isStaleConnectionError(error):
+    """
+    Return ``True`` if `error`, raised while sending a request or reading
+    the response, shows that the server had already closed the connection.
+    """
+    if isinstance(error, EOFError):
+        return True
+    return isinstance(error, socket.error) and not isinstance(error, socket.timeout) and error.errno in STALE_CONNECTION_ERRNOS
+
+class RMGJavaClient(object):
+    """
+    A client for the RMG-Java PopulateReactions server listening at `host`
+    and `port`, using the given `framing` (one of :data:`RMG_JAVA_FRAMINGS`).
+    With length framing, up to `poolSize` idle connections are kept open to
+    be reused by later queries. The client can be used from several threads
+    at once.
+    """
+
+    def __init__(self, host, port, framing='close', poolSize=4):
+        if framing not in RMG_JAVA_FRAMINGS:
+            raise ValueError('Invalid RMG-Java framing "{0}".'.format(framing))
+        self.host = host
+        self.port = port
+        self.framing = framing
+        self.poolSize = poolSize
+        self.idle = []
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+
+    def connect(self, timeout, reuse=True):
+        """
+        Return an open connection to the server, reusing an idle one if
+        possible and `reuse` is ``True``, and whether it was reused.
+        """
+        with self.lock:
+            if self.pid != os.getpid():
+                # Connections can't be shared with the process we forked from
+                self.idle = []
+                self.pid = os.getpid()
+            if reuse and self.idle:
+                return self.idle.pop(), True
+        client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        client_socket.settimeout(timeout)
+        try:
+            client_socket.connect((self.host, self.port))
+        except IOError:
+            client_socket.close()
+            raise RMGJavaError('Unable to query RMG-Java for kinetics. (Is the RMG-Java server running?)')
+        return client_socket, False
+
+    def release(self, client_socket):
+        """
+        Keep the open connection `client_socket` to be reused if the framing
+        allows and the pool isn't full, or else close it.
+        """
+        if self.framing == 'length':
+            with self.lock:
+                if len(self.idle) < self.poolSize and self.pid == os.getpid():
+                    self.idle.append(client_socket)
+                    return
+        client_socket.close()
+
+    def close(self):
+        """
+        Close all of the idle connections.
+        """
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for client_socket in idle:
+            client_socket.close()
+
+    def query(self, request, timeout):
+        """
+        Send the `request` (the input file of a PopulateReactions job) to the
+        server and return its response, waiting no more than `timeout`
+        seconds in total. An :class:`RMGJavaError` is raised if the server
+        can't be reached or doesn't answer in time.
+        """
+        deadline = time.time() + timeout
+        client_socket, reused = self.connect(timeout)
+        try:
+            try:
+                response = self.exchange(client_socket, request, deadline)
+            except (EOFError, socket.error), e:
+                if not reused or not isStaleConnectionError(e):
+                    raise
+                # The server closed the idle connection, and probably the
+                # other idle ones too (e.g. if it was restarted), so try a new
+                # one
+                client_socket.close()
+                self.close()
+                client_socket, reused = self.connect(max(deadline - time.time(), 0.001), reuse=False)
+                response = self.exchange(client_socket, request, deadline)
+        except socket.timeout:
+            client_socket.close()
+            raise RMGJavaError('RMG-Java did not answer within {0:g} s.'.format(timeout))
+        except (IOError, EOFError), e:
+            client_socket.close()
+            raise RMGJavaError('Lost connection to RMG-Java: {0}'.format(e or 'connection closed'))
+        self.release(client_socket)
+        return response
+
+    def exchange(self, client_socket, request, deadline):
+        """
+        Send the `request` over the connection `client_socket` and return the
+        response, reading it in large chunks until the `deadline`. An
+        :class:`EOFError` is raised if the connection is closed before a
+        length-framed response is complete.
+        """
+        if self.framing == 'length':
+            client_socket.sendall(struct.pack('!I', len(request)) + request)
+            length = struct.unpack('!I', self.receive(client_socket, 4, deadline))[0]
+            return self.receive(client_socket, length, deadline)
+        else:
+            client_socket.sendall(request)
+            return self.receive(client_socket, None, deadline)
+
+    def receive(self, client_socket, length, deadline):
+        """
+        Return `length` bytes read from `client_socket`, or everything until
+        the connection is closed if `length` is ``None``.
+        """
+        chunks = []
+        received = 0
+        while length is None or received < length:
+            client_socket.settimeout(max(deadline - time.time(), 0.001))
+            chunk = client_socket.recv(65536 if length is None else min(length - received, 65536))
+            if not chunk:
+                if length is not None:
+                    raise EOFError()
+                break
+            chunks.append(chunk)
+            received += len(chunk)
+        return ''.join(chunks)
+
+# The RMG-Java clients, by (host, port, framing)
+_clients = {}
+_clientsLock = threading.Lock()
+
+def getRMGJavaClient():
+    """
+    Return the client for the RMG-Java server at ``settings.RMG_JAVA_HOST``
+    and ``settings.RMG_JAVA_PORT``, using ``settings.RMG_JAVA_FRAMING``.
+    """
+    key = (settings.RMG_JAVA_HOST, settings.RMG_JAVA_PORT, settings.RMG_JAVA_FRAMING)
+    with _clientsLock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = RMGJavaClient(*key, poolSize=settings.RMG_JAVA_POOL_SIZE)
+    return client
+
+################################################################################
+
+# Molecules parsed from the adjacency lists that RMG-Java sends, by adjacency
+# list; the same species come back in the answers to many queries
+_molecules = MemoryCache(maxEntries=10000)
+
+def getMoleculeFromAdjacencyList(adjlist):
+    """
+    Return the molecule with the given adjacency list, as sent by RMG-Java.
+    The molecule may be shared with other callers, so must not be modified;
+    use a copy if you need to.
+    """
+    molecule = _molecules.get(adjlist)
+    if molecule is None:
+        molecule = Molecule().fromAdjacencyList(adjlist)
+        _molecules.set(adjlist, molecule)
+    return molecule
+
+def getAdjacencyListFormula(adjlist):
+    """
+    Return a dictionary of the number of atoms of each element other than
+    hydrogen in the given adjacency list, which is read without parsing the
+    molecule. Hydrogens are left out since RMG-Java may leave them implicit.
+    """
+    formula = {}
+    for line in adjlist.splitlines():
+        tokens = line.split()
+        if len(tokens) < 3 or not tokens[0].isdigit():
+            continue
+        # Skip the atom label, if any
+        element = tokens[2] if tokens[1].startswith('*') else tokens[1]
+        if element != 'H':
+            formula[element] = formula.get(element, 0) + 1
+    return formula
+
+def getMoleculeFormula(molecule):
+    """
+    Return a dictionary of the number of atoms of each element other than
+    hydrogen in the given `molecule`.
+    """
+    formula = {}
+    for atom in molecule.atoms:
+        element = atom.element.symbol
+        if element != 'H':
+            formula[element] = formula.get(element, 0) + 1
+    return formula
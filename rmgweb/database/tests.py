@@ -35,8 +35,114 @@ unittest). These will both pass when you run "manage.py test".
 Replace these with more appropriate tests for your application.
 """
 
+import time
+import errno
+import socket
+import struct
+import threading
+
 from django.test import TestCase
 
+from rmgpy.molecule import Molecule
+
+from rmgweb.database import tools
+from rmgweb.database.rmgjava import RMGJavaClient
+
+################################################################################
+
+class StandInRMGJavaServer(threading.Thread):
+    """
+    A stand-in for the RMG-Java PopulateReactions server, listening on a free
+    port on localhost, for testing and benchmarking the RMG-Java client. It
+    answers every request with `response` after waiting `delay` seconds,
+    using the given `framing`. With length framing, each connection is kept open for
+    further requests until the client closes it.
+    """
+
+    def __init__(self, response, delay=0, framing='close'):
+        threading.Thread.__init__(self, name='StandInRMGJavaServer')
+        self.daemon = True
+        self.response = response
+        self.delay = delay
+        self.framing = framing
+        self.requests = []
+        self.connections = 0
+        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server_socket.bind(('localhost', 0))
+        self.server_socket.listen(5)
+        self.port = self.server_socket.getsockname()[1]
+
+    def run(self):
+        while True:
+            try:
+                client_socket, address = self.server_socket.accept()
+            except socket.error:
+                # The server was stopped
+                break
+            self.connections += 1
+            thread = threading.Thread(target=self.serve, args=(client_socket,))
+            thread.daemon = True
+            thread.start()
+
+    def serve(self, client_socket):
+        """
+        Answer the requests sent over the connection `client_socket`.
+        """
+        try:
+            while True:
+                request = self.read(client_socket)
+                if request is None:
+                    break
+                self.requests.append(request)
+                time.sleep(self.delay)
+                if self.framing == 'length':
+                    client_socket.sendall(struct.pack('!I', len(self.response)) + self.response)
+                else:
+                    client_socket.sendall(self.response)
+                    break
+        except socket.error:
+            # The client gave up waiting
+            pass
+        client_socket.close()
+
+    def read(self, client_socket):
+        """
+        Return the next request sent over `client_socket`, or ``None`` if the
+        client closed the connection.
+        """
+        data = ''
+        if self.framing == 'length':
+            while len(data) < 4 or len(data) < 4 + struct.unpack('!I', data[:4])[0]:
+                chunk = client_socket.recv(65536)
+                if not chunk:
+                    return None
+                data += chunk
+            return data[4:]
+        else:
+            while not data.endswith('END\n'):
+                chunk = client_socket.recv(65536)
+                if not chunk:
+                    return None
+                data += chunk
+            return data
+
+    def stop(self):
+        self.server_socket.close()
+
+def makeRMGJavaResponse(species, reactions):
+    """
+    Return a response from the RMG-Java server with the given `species`, a
+    list of (name, molecule) pairs, and `reactions`, a list of reaction lines
+    such as ``'A(1) + B(2) --> C(3) + D(4)\\t1.0e+07\\t1.83\\t2.78\\tcomment'``.
+    """
+    response = '\n\n'.join(['{0}\n{1}'.format(name, molecule.toAdjacencyList().strip()) for name, molecule in species])
+    response += '\n\n\nReactions:\n\n'
+    response += '\n'.join(reactions)
+    return response
+
+################################################################################
+
 class SimpleTest(TestCase):
     def test_basic_addition(self):
         """
@@ -44,6 +150,115 @@ class SimpleTest(TestCase):
         """
         self.failUnlessEqual(1 + 1, 2)
 
+################################################################################
+
+class RMGJavaTest(TestCase):
+    """
+    Tests of querying RMG-Java for kinetics, using a stand-in server.
+    """
+
+    def setUp(self):
+        self.host = tools.settings.RMG_JAVA_HOST
+        self.port = tools.settings.RMG_JAVA_PORT
+        self.servers = []
+        self.reactants = [Molecule().fromSMILES('C'), Molecule().fromSMILES('[OH]')]
+        self.products = [Molecule().fromSMILES('[CH3]'), Molecule().fromSMILES('O')]
+        species = zip(['CH4(1)', 'OH(2)', 'CH3(3)', 'H2O(4)'], self.reactants + self.products)
+        self.response = makeRMGJavaResponse(species, ['CH4(1) + OH(2) --> CH3(3) + H2O(4)\t1.0e+07\t1.83\t2.78\tH_Abstraction estimate'])
+
+    def tearDown(self):
+        tools.settings.RMG_JAVA_HOST = self.host
+        tools.settings.RMG_JAVA_PORT = self.port
+        for server in self.servers:
+            server.stop()
+
+    def startServer(self, delay=0, framing='close'):
+        """
+        Start a stand-in RMG-Java server that answers with the reaction of
+        methane and hydroxyl after `delay` seconds, and point the website at it.
+        """
+        server = StandInRMGJavaServer(self.response, delay, framing)
+        server.start()
+        self.servers.append(server)
+        tools.settings.RMG_JAVA_HOST = 'localhost'
+        tools.settings.RMG_JAVA_PORT = server.port
+        return server
+
+    def testClientReusesConnections(self):
+        """
+        Test that a client using length framing reuses its connection, and
+        that one using the RMG-Java server's framing doesn't.
+        """
+        for framing, connections in [('length', 1), ('close', 3)]:
+            server = self.startServer(framing=framing)
+            client = RMGJavaClient('localhost', server.port, framing)
+            for i in range(3):
+                self.assertEqual(client.query('reactant1\nEND\n', 5), self.response)
+            client.close()
+            self.assertEqual(server.connections, connections)
+            self.assertEqual(len(server.requests), 3)
+
+    def testClientRetriesResetConnections(self):
+        """
+        Test that a client retries a query on a new connection if the idle
+        connection it reused turns out to have been reset by the server.
+        """
+        class ResetSocket(object):
+            def settimeout(self, timeout): pass
+            def sendall(self, data): raise socket.error(errno.ECONNRESET, 'Connection reset by peer')
+            def close(self): pass
+        server = self.startServer(framing='length')
+        client = RMGJavaClient('localhost', server.port, 'length')
+        client.idle = [ResetSocket()]
+        self.assertEqual(client.query('reactant1\nEND\n', 5), self.response)
+        client.close()
+        self.assertEqual(server.connections, 1)
+        self.assertEqual(len(server.requests), 1)
+
+    def testGetRMGJavaKinetics(self):
+        """
+        Test that the reactions in RMG-Java's answer are found.
+        """
+        server = self.startServer()
+        reactionList = tools.getRMGJavaKinetics(self.reactants, self.products, raiseErrors=True, timeout=5)
+        self.assertEqual(len(server.requests), 1)
+        self.assertEqual(len(reactionList), 1)
+        self.assertTrue('H_Abstraction estimate' in reactionList[0].kinetics.comment)
+
+    def testQueryInBackground(self):
+        """
+        Test that a query runs while the caller works, and returns the same
+        reactions as querying directly.
+        """
+        self.startServer(delay=0.5)
+        t0 = time.time()
+        query = tools.RMGJavaQuery(self.reactants, self.products, timeout=5)
+        query.start()
+        self.assertTrue(time.time() - t0 < 0.5)
+        reactionList = query.getResult()
+        self.assertEqual(len(reactionList), 1)
+
+    def testQueryDeadline(self):
+        """
+        Test that a query gives up once its deadline has passed.
+        """
+        self.startServer(delay=3)
+        t0 = time.time()
+        query = tools.RMGJavaQuery(self.reactants, self.products, timeout=0.5)
+        query.start()
+        self.assertRaises(tools.RMGJavaError, query.getResult)
+        self.assertTrue(time.time() - t0 < 2)
+
+    def testServerNotRunning(self):
+        """
+        Test that an unreachable server gives no reactions, or an error if
+        requested.
+        """
+        server = self.startServer()
+        server.stop()
+        self.assertEqual(tools.getRMGJavaKinetics(self.reactants, self.products, timeout=1), [])
+        self.assertRaises(tools.RMGJavaError, tools.getRMGJavaKinetics, self.reactants, self.products, raiseErrors=True, timeout=1)
+
 __test__ = {"doctest": """
 Another way to test that 1 + 1 is equal to 2.
 
@@ -33,9 +33,17 @@ This module contains additional classes and functions used by the database
 app that don't belong to any other module.
 """
 
-import socket
 import sys
 import os
+import gc
+import time
+import hashlib
+import copy
+import cPickle
+import subprocess
+import threading
+import weakref
+import re
 import settings
 import pybel
 import openbabel as ob
@@ -49,18 +57,61 @@ from rmgpy.reaction import Reaction
 from rmgpy.data.base import Entry
 from rmgpy.data.kinetics import TemplateReaction, DepositoryReaction
 from rmgweb.main.tools import *
+from rmgweb.main.cache import getCache, SQLiteCache
+from watcher import DatabaseWatcher
+from rmgjava import RMGJavaError, getRMGJavaClient, getMoleculeFromAdjacencyList, getAdjacencyListFormula, getMoleculeFormula
 
-from rmgpy.data.thermo import ThermoDatabase
-from rmgpy.data.kinetics import KineticsDatabase
+from rmgpy.data.thermo import ThermoDatabase, ThermoDepository, ThermoLibrary, ThermoGroups
+from rmgpy.data.kinetics import KineticsDatabase, KineticsLibrary, KineticsFamily
 from rmgpy.data.rmg import RMGDatabase
 
 ################################################################################
 
 database = None
 
+# The sections of the RMG database that can be loaded, as (component, section)
+DATABASE_SECTIONS = [
+    ('thermo', 'depository'),
+    ('thermo', 'libraries'),
+    ('thermo', 'groups'),
+    ('kinetics', 'libraries'),
+    ('kinetics', 'families'),
+]
+
+def getSectionPath(component, section):
+    """
+    Return the path on disk of the given `section` of the given `component`
+    (thermo or kinetics) of the RMG database.
+    """
+    return os.path.join(settings.DATABASE_PATH, component, section)
+
+def getForbiddenStructuresPath():
+    """
+    Return the path on disk of the forbidden structures of the RMG database,
+    the one file loaded from outside of its sections.
+    """
+    return os.path.join(settings.DATABASE_PATH, 'forbiddenStructures.py')
+
 ################################################################################
 
 _timestamps = {}
+# The directories (one per section) that have been loaded at least once
+_loadedSections = set()
+
+# Guards creation of the global database, the watcher and the section locks
+_lock = threading.RLock()
+# A lock for each section, held while it is being (re)loaded
+_sectionLocks = {}
+
+def getSectionLock(dirpath):
+    """
+    Return the lock that must be held while (re)loading the database section
+    at `dirpath`.
+    """
+    with _lock:
+        if dirpath not in _sectionLocks:
+            _sectionLocks[dirpath] = threading.RLock()
+        return _sectionLocks[dirpath]
 # Some functions to determine if the database files have changed on disk since
 # they were last loaded. 
 def resetTimestamp(path):
@@ -75,6 +126,9 @@ def resetDirTimestamps(dirpath):
     Walk the directory tree from dirpath, calling resetTimestamp(file) on each file.
     """
     print "Resetting 'last loaded' timestamps for {0} in process {1}".format(dirpath, os.getpid())
+    # Forget files that have since been removed, so they aren't reported as modified forever
+    for path in [path for path in _timestamps.keys() if path.startswith(dirpath)]:
+        del _timestamps[path]
     for root, dirs, files in os.walk(dirpath):
         for name in files:
             resetTimestamp(os.path.join(root,name))
@@ -83,28 +137,21 @@ def isFileModified(path):
     """
     Return True if the file at `path` has been modified since `resetTimestamp(path)` was last called.
     """
-    try:
-        # If path doesn't denote a file and were previously
-        # tracking it, then it has been removed or the file type
-        # has changed, so return True.
-        if not os.path.isfile(path):
-            return path in _timestamps
-        
-        # If path wasn't being tracked then it's new, so return True
-        mtime = os.stat(path).st_mtime
-        if path not in _timestamps:
-            return True
-        
-        # Force restart when modification time has changed, even
-        # if time now older, as that could indicate older file
-        # has been restored.
-        if mtime != _timestamps[path]:
-            return True
-    except:
-        # for debugging, raise the exception
-        # If any exception occured, likely that file has been
-        # been removed just before stat(), so force a restart.
-        raise
+    # If path doesn't denote a file and were previously
+    # tracking it, then it has been removed or the file type
+    # has changed, so return True.
+    if not os.path.isfile(path):
+        return path in _timestamps
+    
+    # If path wasn't being tracked then it's new, so return True
+    mtime = os.stat(path).st_mtime
+    if path not in _timestamps:
+        return True
+    
+    # Force restart when modification time has changed, even
+    # if time now older, as that could indicate older file
+    # has been restored.
+    if mtime != _timestamps.get(path):
         return True
     # passed all tests
     return False
@@ -113,7 +160,7 @@ def isDirModified(dirpath):
     """
     Returns True if anything in the directory at dirpath has been modified since resetDirTimestamps(dirpath).
     """
-    to_check = set([path for path in _timestamps if path.startswith(dirpath)])
+    to_check = set([path for path in _timestamps.keys() if path.startswith(dirpath)])
     for root, dirs, files in os.walk(dirpath):
         for name in files:
             path = os.path.join(root,name)
@@ -127,73 +174,792 @@ def isDirModified(dirpath):
     # Passed all tests.
     return False
 
+def getModifiedFiles(dirpath):
+    """
+    Return the set of files in the directory at dirpath that have been modified, created or removed since resetDirTimestamps(dirpath).
+    """
+    modified = set([path for path in _timestamps.keys() if path.startswith(dirpath) and not os.path.isfile(path)])
+    for root, dirs, files in os.walk(dirpath):
+        for name in files:
+            path = os.path.join(root,name)
+            if isFileModified(path):
+                modified.add(path)
+    return modified
+
 ################################################################################
 
-def loadDatabase(component='', section=''):
+_watcher = None
+
+def getDatabaseWatcher():
     """
-    Load the requested `component` of the RMG database if modified since last loaded.
+    Return the :class:`DatabaseWatcher` that reports changes to the database
+    files in this process, starting one if necessary, or ``None`` if the
+    watcher has been disabled in the settings.
     """
-    global database
-    if not database:
-        database = RMGDatabase()
-        database.thermo = ThermoDatabase()
-        database.kinetics = KineticsDatabase()
-        database.loadForbiddenStructures(os.path.join(settings.DATABASE_PATH, 'forbiddenStructures.py'))
-
-    if component in ['thermo', '']:
-        if section in ['depository', '']:
-            dirpath = os.path.join(settings.DATABASE_PATH, 'thermo', 'depository')
-            if isDirModified(dirpath):
-                database.thermo.loadDepository(dirpath)
-                resetDirTimestamps(dirpath)
-        if section in ['libraries', '']:
-            dirpath = os.path.join(settings.DATABASE_PATH, 'thermo', 'libraries')
-            if isDirModified(dirpath):
-                database.thermo.loadLibraries(dirpath)
-                # put them in our preferred order, so that when we look up thermo in order to estimate kinetics,
-                # we use our favourite values first.
-                preferred_order = ['primaryThermoLibrary','DFT_QCI_thermo','GRI-Mech3.0','CBS_QB3_1dHR','KlippensteinH2O2']
-                new_order = [i for i in preferred_order if i in database.thermo.libraryOrder]
-                for i in database.thermo.libraryOrder:
-                    if i not in new_order: new_order.append(i) 
-                database.thermo.libraryOrder = new_order
-                resetDirTimestamps(dirpath)
-        if section in ['groups', '']:
-            dirpath = os.path.join(settings.DATABASE_PATH, 'thermo', 'groups')
-            if isDirModified(dirpath):
-                database.thermo.loadGroups(dirpath)
-                resetDirTimestamps(dirpath)
-    if component in ['kinetics', '']:
-        if section in ['libraries', '']:
-            dirpath = os.path.join(settings.DATABASE_PATH, 'kinetics', 'libraries')
-            if isDirModified(dirpath):
-                database.kinetics.loadLibraries(dirpath)
-                resetDirTimestamps(dirpath)
-        if section in ['families', '']:
-            dirpath = os.path.join(settings.DATABASE_PATH, 'kinetics', 'families')
-            if isDirModified(dirpath):
-                database.kinetics.loadFamilies(dirpath)
-                resetDirTimestamps(dirpath)
+    global _watcher
+    if not settings.DATABASE_WATCHER:
+        return None
+    if _watcher is None or not _watcher.isRunning():
+        with _lock:
+            if _watcher is None or not _watcher.isRunning():
+                dirpaths = [getSectionPath(component, section) for component, section in DATABASE_SECTIONS]
+                watcher = DatabaseWatcher(dirpaths, getModifiedFiles, interval=settings.DATABASE_WATCHER_INTERVAL)
+                watcher.start()
+                _watcher = watcher
+    return _watcher
 
-    return database
+def isSectionModified(dirpath):
+    """
+    Return ``True`` if the database section at `dirpath` has never been
+    loaded, or if any of its files have changed since it was last loaded.
+    When the watcher is enabled this does not touch the disk; otherwise every
+    file in the section is checked.
+    """
+    if dirpath not in _loadedSections:
+        return True
+    watcher = getDatabaseWatcher()
+    if watcher is None:
+        return isDirModified(dirpath)
+    return watcher.isModified(dirpath)
 
-def getThermoDatabase(section, subsection):
+def getSectionModifiedFiles(dirpath):
     """
-    Return the component of the thermodynamics database corresponding to the
-    given `section` and `subsection`. If either of these is invalid, a
-    :class:`ValueError` is raised.
+    Return the set of files in the database section at `dirpath` that have
+    been modified, created or removed since the section was last loaded.
     """
-    global database
+    watcher = getDatabaseWatcher()
+    if watcher is None:
+        return getModifiedFiles(dirpath)
+    return watcher.getModified(dirpath)
+
+def getObjectModifiedFiles(dirpath, path):
+    """
+    Return the set of files of the database object at `path` (a file, or a
+    directory for a kinetics family) in the database section at `dirpath`
+    that have been modified, created or removed since it was last loaded.
+    Without a watcher, only the object's own files are checked, rather than
+    the whole section.
+    """
+    watcher = getDatabaseWatcher()
+    if watcher is not None:
+        modified = watcher.getModified(dirpath)
+    elif os.path.isdir(path):
+        modified = getModifiedFiles(path + os.sep)
+    else:
+        modified = set([path]) if isFileModified(path) else set()
+    return set([p for p in modified if p == path or p.startswith(path + os.sep)])
+
+def clearSectionModified(dirpath, paths):
+    """
+    Stop reporting the files `paths` in the database section at `dirpath` as
+    modified. This should be called just *before* they are reloaded.
+    """
+    watcher = getDatabaseWatcher()
+    if watcher is not None:
+        watcher.discard(dirpath, paths)
+
+################################################################################
+
+# Increment this whenever a change to RMG-Py or to this module makes previously
+# saved snapshots of the database unusable
+SNAPSHOT_VERSION = 1
+
+def getDirTimestamps(dirpath):
+    """
+    Return a dictionary of the modification times of every file in the
+    directory tree at `dirpath`, keyed by path.
+    """
+    timestamps = {}
+    for root, dirs, files in os.walk(dirpath):
+        for name in files:
+            path = os.path.join(root, name)
+            timestamps[path] = os.stat(path).st_mtime
+    return timestamps
+
+def getDatabaseFingerprint(timestamps=None):
+    """
+    Return a string identifying the state of the RMG database on disk, made
+    from the git HEAD of ``settings.DATABASE_PATH`` and the modification times
+    of every database file that is loaded: those in each section and the
+    forbidden structures. The modification times are taken from the
+    `timestamps` dictionary if given, or else read from disk.
+    """
+    try:
+        head = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=settings.DATABASE_PATH, stderr=subprocess.STDOUT).strip()
+    except (OSError, subprocess.CalledProcessError):
+        head = ''
+    if timestamps is None:
+        timestamps = {}
+        for component, section in DATABASE_SECTIONS:
+            timestamps.update(getDirTimestamps(getSectionPath(component, section)))
+        path = getForbiddenStructuresPath()
+        if os.path.isfile(path):
+            timestamps[path] = os.stat(path).st_mtime
+    fingerprint = hashlib.sha1(head)
+    for path in sorted(timestamps):
+        fingerprint.update('{0}\t{1!r}\n'.format(path, timestamps[path]))
+    return fingerprint.hexdigest()
+
+# The fingerprint of the database files the global database was last loaded
+# from or saved to a snapshot, if it was
+_snapshotFingerprint = None
+
+def saveDatabaseSnapshot(path=None):
+    """
+    Save a snapshot of the fully-loaded global `database` to the file at
+    `path` (``settings.DATABASE_SNAPSHOT_PATH`` by default), so that other
+    processes can load it with :func:`loadDatabaseSnapshot` instead of
+    parsing the database files. Pickling the whole database takes a while,
+    so this is only done by :func:`warmDatabase` and the
+    ``snapshotdatabase`` management command, never while serving a request.
+    """
+    global _snapshotFingerprint
+    path = path or settings.DATABASE_SNAPSHOT_PATH
+    if not path or database is None:
+        return
+    
+    t0 = time.time()
+    fingerprint = getDatabaseFingerprint(_timestamps)
+    dirname = os.path.dirname(path)
+    if not os.path.isdir(dirname):
+        os.makedirs(dirname)
+    # Write to a temporary file and then move it into place, so that other
+    # processes never see a partially written snapshot
+    tempPath = '{0}.{1:d}.tmp'.format(path, os.getpid())
+    try:
+        f = open(tempPath, 'wb')
+        try:
+            # The header is pickled separately so that it can be checked
+            # without unpickling the whole database
+            cPickle.dump((SNAPSHOT_VERSION, fingerprint), f, cPickle.HIGHEST_PROTOCOL)
+            cPickle.dump((_timestamps, database), f, cPickle.HIGHEST_PROTOCOL)
+        finally:
+            f.close()
+        os.rename(tempPath, path)
+    except Exception, e:
+        print >> sys.stderr, 'Unable to save RMG database snapshot to {0}: {1}'.format(path, e)
+        sys.stderr.flush()
+        if os.path.exists(tempPath):
+            os.remove(tempPath)
+        return
+    _snapshotFingerprint = fingerprint
+    print "Saved RMG database snapshot to {0} in {1:.1f} s".format(path, time.time() - t0)
 
+def loadDatabaseSnapshot(path=None):
+    """
+    Replace the global `database` with the snapshot saved at `path`
+    (``settings.DATABASE_SNAPSHOT_PATH`` by default). The snapshot is only
+    used if it was saved by a compatible version of this module from the same
+    database files as are currently on disk. Returns ``True`` if the snapshot
+    was loaded and ``False`` if not.
+    """
+    global database, _snapshotFingerprint
+    path = path or settings.DATABASE_SNAPSHOT_PATH
+    if not path or not os.path.isfile(path):
+        return False
+    
+    t0 = time.time()
     try:
+        f = open(path, 'rb')
+        try:
+            version, fingerprint = cPickle.load(f)
+            if version != SNAPSHOT_VERSION or fingerprint != getDatabaseFingerprint():
+                print "RMG database snapshot at {0} is out of date, so ignoring it".format(path)
+                return False
+            timestamps, snapshot = cPickle.load(f)
+        finally:
+            f.close()
+    except Exception, e:
+        print >> sys.stderr, 'Unable to load RMG database snapshot from {0}: {1}'.format(path, e)
+        sys.stderr.flush()
+        return False
+    
+    database = snapshot
+    _snapshotFingerprint = fingerprint
+    _timestamps.clear()
+    _timestamps.update(timestamps)
+    for component, section in DATABASE_SECTIONS:
+        _loadedSections.add(getSectionPath(component, section))
+    print "Loaded RMG database snapshot from {0} in {1:.1f} s in process {2}".format(path, time.time() - t0, os.getpid())
+    return True
+
+################################################################################
+
+def getPreferredThermoLibraryOrder(labels):
+    """
+    Return the thermo library `labels` in our preferred order.
+    """
+    # put them in our preferred order, so that when we look up thermo in order to estimate kinetics,
+    # we use our favourite values first.
+    preferred_order = ['primaryThermoLibrary','DFT_QCI_thermo','GRI-Mech3.0','CBS_QB3_1dHR','KlippensteinH2O2']
+    new_order = [i for i in preferred_order if i in labels]
+    for i in labels:
+        if i not in new_order: new_order.append(i) 
+    return new_order
+
+def loadSection(component, section):
+    """
+    Load the given `section` of the given `component` of the RMG database
+    from disk and swap it into the global `database`, replacing whatever was
+    there. The section is built separately first, so other threads carry on
+    seeing the complete old section until the new one is ready. Each library,
+    depository, group tree or family is loaded (and profiled) on its own.
+    """
+    objects = {}
+    for label, path in sorted(getSectionObjectPaths(component, section).items()):
+        profileLoad('{0}/{1}/{2}'.format(component, section, label), readSectionObject, objects, component, section, label, path)
+    if component == 'thermo' and section == 'depository':
+        database.thermo.depository = objects
+    elif component == 'thermo' and section == 'libraries':
+        # Trim the old order to libraries in both old and new sets before
+        # swapping, so the order never refers to a missing library
+        database.thermo.libraryOrder = [label for label in database.thermo.libraryOrder if label in objects]
+        database.thermo.libraries = objects
+        database.thermo.libraryOrder = getPreferredThermoLibraryOrder(sorted(objects))
+    elif component == 'thermo' and section == 'groups':
+        database.thermo.groups = objects
+    elif component == 'kinetics' and section == 'libraries':
+        database.kinetics.libraryOrder = [label for label in database.kinetics.libraryOrder if label in objects]
+        database.kinetics.libraries = objects
+        database.kinetics.libraryOrder = sorted(objects)
+    elif component == 'kinetics' and section == 'families':
+        database.kinetics.families = objects
+
+def getSectionObjectPaths(component, section):
+    """
+    Return a dictionary of the path of the file (or, for a kinetics family,
+    the directory) of each library, depository, group tree or family in the
+    given `section` of the given `component` of the RMG database, by label.
+    These are the same files that RMG-Py loads for the section: every Python
+    file in a libraries section or its subdirectories, every Python file in
+    the depository and groups sections, and every directory in the families
+    section.
+    """
+    if (component, section) not in DATABASE_SECTIONS:
+        raise ValueError('Invalid database section "{0}/{1}".'.format(component, section))
+    dirpath = getSectionPath(component, section)
+    paths = {}
+    if component == 'kinetics' and section == 'families':
+        for name in os.listdir(dirpath):
+            path = os.path.join(dirpath, name)
+            if os.path.isdir(path) and not name.startswith('.'):
+                paths[name] = path
+        return paths
+    for root, dirs, files in os.walk(dirpath):
+        for name in files:
+            if os.path.splitext(name)[1].lower() == '.py':
+                path = os.path.join(root, name)
+                paths[getDatabaseObjectLabel(component, section, path)] = path
+        if section != 'libraries':
+            break
+    return paths
+
+def readSectionObject(objects, component, section, label, path):
+    """
+    Load the library, depository, group tree or family with the given `label`
+    in the given `section` of the given `component` of the RMG database from
+    `path`, and add it to the dictionary `objects`.
+    """
+    objects[label] = readDatabaseObject(component, section, label, path)
+
+def getDatabaseObjectLabel(component, section, path):
+    """
+    Return the label of the library, depository, group tree or family in the
+    given `section` of the given `component` of the RMG database that is
+    loaded from the file at `path`. This is the key used for the object in
+    the corresponding dictionary of the global `database`.
+    """
+    relpath = os.path.relpath(path, getSectionPath(component, section))
+    if component == 'kinetics' and section == 'families':
+        return relpath.split(os.sep)[0]
+    elif component == 'kinetics' and section == 'libraries':
+        return os.path.splitext(relpath)[0]
+    else:
+        return os.path.splitext(os.path.basename(relpath))[0]
+
+def getDatabaseObjects(component, section):
+    """
+    Return the dictionary of libraries, depositories, group trees or families
+    in the given `section` of the given `component` of the global `database`.
+    """
+    if component == 'thermo' and section == 'depository':
+        return database.thermo.depository
+    elif component == 'thermo' and section == 'libraries':
+        return database.thermo.libraries
+    elif component == 'thermo' and section == 'groups':
+        return database.thermo.groups
+    elif component == 'kinetics' and section == 'libraries':
+        return database.kinetics.libraries
+    elif component == 'kinetics' and section == 'families':
+        return database.kinetics.families
+    raise ValueError('Invalid database section "{0}/{1}".'.format(component, section))
+
+def loadDatabaseObject(component, section, label, path):
+    """
+    Load the single library, depository, group tree or family with the given
+    `label` in the given `section` of the given `component` of the RMG
+    database from `path` (a file, or a directory for a kinetics family). The
+    new object replaces any existing one with that label in the global
+    `database`; the rest of the section is left untouched.
+    """
+    obj = readDatabaseObject(component, section, label, path)
+    getDatabaseObjects(component, section)[label] = obj
+    return obj
+
+def readDatabaseObject(component, section, label, path):
+    """
+    Load and return the library, depository, group tree or family with the
+    given `label` in the given `section` of the given `component` of the RMG
+    database from `path`, without adding it to the global `database`.
+    """
+    if component == 'thermo':
+        local_context = database.thermo.local_context
+        global_context = database.thermo.global_context
         if section == 'depository':
-            db = database.thermo.depository[subsection]
+            obj = ThermoDepository(label=label)
         elif section == 'libraries':
-            db = database.thermo.libraries[subsection]
+            obj = ThermoLibrary()
         elif section == 'groups':
-            db = database.thermo.groups[subsection]
+            obj = ThermoGroups(label=label)
+        obj.load(path, local_context, global_context)
+        obj.label = label
+    elif component == 'kinetics':
+        local_context = database.kinetics.local_context
+        global_context = database.kinetics.global_context
+        if section == 'libraries':
+            obj = KineticsLibrary()
+            obj.load(path, local_context, global_context)
+            obj.label = label
+        elif section == 'families':
+            obj = KineticsFamily(label=label)
+            obj.load(path, local_context, global_context)
+    return obj
+
+def reloadDatabaseFiles(component, section, paths):
+    """
+    Reload only those objects in the given `section` of the given `component`
+    of the RMG database that are loaded from the modified files `paths`. This
+    is only possible if every modified file belongs to an object that is
+    already loaded and still exists; if not, nothing is reloaded and ``None``
+    is returned. Otherwise a list of (label, seconds) pairs saying what was
+    reloaded and how long it took is returned.
+    """
+    dirpath = getSectionPath(component, section)
+    objects = getDatabaseObjects(component, section)
+    # Only Python files are loaded, so changes to any others don't matter
+    paths = [path for path in paths if path.endswith('.py')]
+    labels = {}
+    for path in paths:
+        label = getDatabaseObjectLabel(component, section, path)
+        if label not in objects or not os.path.isfile(path):
+            # A new or removed file, so the whole section must be reloaded
+            return None
+        if section == 'families':
+            labels[label] = os.path.join(dirpath, label)
         else:
-            raise ValueError('Invalid value "%s" for section parameter.' % section)
+            labels[label] = path
+
+    report = []
+    for label in sorted(labels):
+        report.append(profileLoad('{0}/{1}/{2}'.format(component, section, label), loadDatabaseObject, component, section, label, labels[label]))
+    return report
+
+# The most recent reloads of (part of) the database, as (label, seconds) pairs
+reloadHistory = []
+
+def logReload(report):
+    """
+    Print a `report` of reloaded parts of the database, as returned by
+    :func:`reloadDatabaseFiles`, and add it to the `reloadHistory`.
+    """
+    for label, seconds in report:
+        print "Reloaded {0} in {1:.2f} s in process {2}".format(label, seconds, os.getpid())
+    reloadHistory.extend(report)
+    del reloadHistory[:-50]
+
+################################################################################
+
+# The most recent time taken (in s) and change in resident memory (in bytes)
+# when loading each section of the database, or each library, depository,
+# group tree or family that was loaded on its own, by label
+loadProfile = {}
+
+def getResidentMemory():
+    """
+    Return the resident memory of the current process in bytes. Where /proc
+    is unavailable the peak resident memory is returned instead, which only
+    ever grows, so differences may underestimate.
+    """
+    try:
+        f = open('/proc/self/statm', 'r')
+        pages = int(f.read().split()[1])
+        f.close()
+        return pages * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def profileLoad(label, function, *args):
+    """
+    Call `function` with the given `args` to load the part of the database
+    with the given `label`, recording the time taken and the change in
+    resident memory in the `loadProfile`. Returns a (label, seconds) pair.
+    """
+    memory0 = getResidentMemory()
+    t0 = time.time()
+    function(*args)
+    seconds = time.time() - t0
+    loadProfile[label] = {
+        'seconds': seconds,
+        'memory': getResidentMemory() - memory0,
+        'loaded': t0,
+    }
+    # The size measured before the reload no longer applies
+    objectSizes.pop(label, None)
+    return (label, seconds)
+
+def getObjectSize(obj):
+    """
+    Return the approximate memory in bytes retained by `obj`, found by adding
+    up the sizes of every object reachable from it. Classes, modules and
+    functions are shared, so are not counted. This walks the whole object
+    graph, so it is slow for the larger parts of the database.
+    """
+    import types
+    shared = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.ClassType)
+    seen = set()
+    size = 0
+    stack = [obj]
+    while stack:
+        o = stack.pop()
+        if id(o) in seen or isinstance(o, shared):
+            continue
+        seen.add(id(o))
+        size += sys.getsizeof(o, 0)
+        stack.extend(gc.get_referents(o))
+    return size
+
+# The approximate memory in bytes retained by each library, depository, group
+# tree or family, by label, as last measured by measureDatabaseSizes()
+objectSizes = {}
+
+def measureDatabaseSizes():
+    """
+    Measure the approximate memory retained by each library, depository,
+    group tree or family in the loaded database with :func:`getObjectSize`
+    and keep it in :data:`objectSizes`. This walks the whole database, which
+    takes a while, so it is only done by :func:`warmDatabase` (if
+    ``settings.DATABASE_PROFILE_SIZES`` is set) and the ``databaseprofile``
+    management command, never while serving a request.
+    """
+    if not database:
+        return
+    for component, section in DATABASE_SECTIONS:
+        objects = getDatabaseObjects(component, section)
+        for label in objects:
+            objectSizes['{0}/{1}/{2}'.format(component, section, label)] = getObjectSize(objects[label])
+
+def countDatabaseEntries(component, section, db):
+    """
+    Return the number of entries in the library, depository, group tree or
+    family `db` in the given `section` of the given `component`.
+    """
+    if component == 'kinetics' and section == 'families':
+        return len(db.groups.entries) + len(db.rules.entries) + sum([len(depository.entries) for depository in db.depositories])
+    return len(db.entries)
+
+def getDatabaseProfile():
+    """
+    Return a list of rows describing each loaded section of the database and
+    each library, depository, group tree or family in it. Each row is a
+    dictionary with the `label`, the number of `entries`, the approximate
+    retained memory `size` in bytes (as last measured by
+    :func:`measureDatabaseSizes`, if it has been since the object was
+    loaded), and the `seconds` and change in resident `memory` when it was
+    last loaded, if known.
+    """
+    rows = []
+    if not database:
+        return rows
+    for component, section in DATABASE_SECTIONS:
+        sectionLabel = '{0}/{1}'.format(component, section)
+        objects = getDatabaseObjects(component, section)
+        if not objects:
+            continue
+        sectionRow = {'label': sectionLabel, 'entries': 0, 'size': 0, 'seconds': None, 'memory': None}
+        sectionRow.update(loadProfile.get(sectionLabel, {}))
+        rows.append(sectionRow)
+        for label in sorted(objects):
+            objectLabel = '{0}/{1}'.format(sectionLabel, label)
+            row = {'label': objectLabel, 'entries': countDatabaseEntries(component, section, objects[label]), 'size': objectSizes.get(objectLabel), 'seconds': None, 'memory': None}
+            row.update(loadProfile.get(objectLabel, {}))
+            # The section's size is only known if all of its objects' are
+            if row['size'] is None or sectionRow['size'] is None:
+                sectionRow['size'] = None
+            else:
+                sectionRow['size'] += row['size']
+            sectionRow['entries'] += row['entries']
+            rows.append(row)
+    return rows
+
+def formatDatabaseProfile(rows):
+    """
+    Return the database profile `rows`, as returned by
+    :func:`getDatabaseProfile`, formatted as a plain text table.
+    """
+    def formatValue(value, format):
+        return '-' if value is None else format.format(value)
+    lines = ['{0:<60} {1:>8} {2:>10} {3:>10} {4:>10}'.format('Label', 'Entries', 'Size (MB)', 'Time (s)', 'RSS (MB)')]
+    for row in rows:
+        lines.append('{0:<60} {1:>8} {2:>10} {3:>10} {4:>10}'.format(
+            row['label'],
+            row['entries'],
+            formatValue(row['size'] / 1048576. if row['size'] is not None else None, '{0:.2f}'),
+            formatValue(row['seconds'], '{0:.2f}'),
+            formatValue(row['memory'] / 1048576. if row['memory'] is not None else None, '{0:.2f}'),
+        ))
+    return '\n'.join(lines)
+
+def initDatabase():
+    """
+    Create the global `database` if it doesn't exist yet, from a snapshot if
+    possible or else with all of its sections empty.
+    """
+    global database
+    if not database:
+        with _lock:
+            if not database and not loadDatabaseSnapshot():
+                rmgDatabase = RMGDatabase()
+                rmgDatabase.thermo = ThermoDatabase()
+                rmgDatabase.kinetics = KineticsDatabase()
+                rmgDatabase.loadForbiddenStructures(getForbiddenStructuresPath())
+                # Note when it was loaded, for the snapshot's fingerprint
+                resetTimestamp(getForbiddenStructuresPath())
+                database = rmgDatabase
+    return database
+
+def loadDatabase(component='', section=''):
+    """
+    Load the requested `component` of the RMG database if modified since last
+    loaded. Changes are normally detected by a :class:`DatabaseWatcher`, so
+    this is cheap enough to call on every request. When a process first loads
+    the database, a snapshot saved by another process is used if it is still
+    up to date (see :func:`warmDatabase`).
+    
+    This is safe to call from several threads at once. Only one thread
+    (re)loads each section at a time; other threads needing that section
+    wait for it to finish rather than loading it again.
+    """
+    initDatabase()
+
+    for component0, section0 in DATABASE_SECTIONS:
+        if component not in [component0, ''] or section not in [section0, '']:
+            continue
+        dirpath = getSectionPath(component0, section0)
+        if not isSectionModified(dirpath):
+            continue
+        with getSectionLock(dirpath):
+            # Another thread may have loaded the section while we waited
+            if not isSectionModified(dirpath):
+                continue
+            paths = getSectionModifiedFiles(dirpath)
+            clearSectionModified(dirpath, paths)
+            # If possible, only reload the libraries or families whose files
+            # have changed, rather than the whole section
+            report = None
+            if dirpath in _loadedSections:
+                report = reloadDatabaseFiles(component0, section0, paths)
+            if report is None:
+                report = [profileLoad('{0}/{1}'.format(component0, section0), loadSection, component0, section0)]
+            logReload(report)
+            resetDirTimestamps(dirpath)
+            # Free the plot data and math generated for the replaced models
+            clearPlotCache(component0)
+            _loadedSections.add(dirpath)
+
+    return database
+
+def isDatabaseWarm():
+    """
+    Return ``True`` if every section of the RMG database has been loaded in
+    this process, so that no request will have to wait for it to load.
+    """
+    return database is not None and len(_loadedSections) == len(DATABASE_SECTIONS)
+
+def warmDatabase():
+    """
+    Fully load the RMG database. This is meant to be called in the master
+    process of a preforking web server, before the workers are forked, so
+    that the workers start warm and share the memory pages holding the
+    database (copy-on-write) instead of each building their own copy. If the
+    database had to be
+    loaded from its files, a snapshot of it is saved for the next process to
+    start.
+    """
+    t0 = time.time()
+    loadDatabase()
+    updateDatabaseSnapshot()
+    if settings.DATABASE_PROFILE_SIZES:
+        measureDatabaseSizes()
+    # Collect now, so the collector doesn't later free objects in each worker
+    # and thereby copy the pages holding them
+    gc.collect()
+    print "Warmed up RMG database in {0:.1f} s in process {1}".format(time.time() - t0, os.getpid())
+    return database
+
+def updateDatabaseSnapshot():
+    """
+    Save a snapshot of the fully-loaded global `database` unless it is
+    already the one in the snapshot (i.e. it was loaded from there or saved
+    there, and nothing has been reloaded since).
+    """
+    if isDatabaseWarm() and getDatabaseFingerprint(_timestamps) != _snapshotFingerprint:
+        saveDatabaseSnapshot()
+
+def isPathInDirectory(path, dirpath):
+    """
+    Return ``True`` if `path` is somewhere inside the directory `dirpath`,
+    once any symbolic links and ``..`` components are resolved.
+    """
+    return os.path.realpath(path).startswith(os.path.realpath(dirpath) + os.sep)
+
+def getDatabaseObjectPath(component, section, label):
+    """
+    Return the path of the file (or, for a kinetics family, the directory)
+    from which the library, depository, group tree or family with the given
+    `label` in the given `section` of the given `component` of the RMG
+    database is loaded, or ``None`` if there is no such object. The `label`
+    usually comes from a URL, so ``None`` is also returned for any label that
+    would lead outside of the section's directory.
+    """
+    dirpath = getSectionPath(component, section)
+    if not label:
+        return None
+    if component == 'kinetics' and section == 'families':
+        # Each family is a directory directly inside the section
+        path = os.path.join(dirpath, label)
+        return path if os.sep not in label and isPathInDirectory(path, dirpath) and os.path.isdir(path) else None
+    path = os.path.join(dirpath, label + '.py')
+    if isPathInDirectory(path, dirpath) and os.path.isfile(path):
+        return path
+    if component == 'thermo':
+        # Thermo libraries are labeled by file name alone, wherever they are
+        for root, dirs, files in os.walk(dirpath):
+            if label + '.py' in files:
+                return os.path.join(root, label + '.py')
+    return None
+
+def getDatabaseObject(component, section, label):
+    """
+    Return the library, depository, group tree or family with the given
+    `label` in the given `section` of the given `component` of the RMG
+    database. If the section has been loaded, it is first reloaded as
+    necessary; if not, only the requested object is loaded (or reloaded, if
+    its files have changed since it was loaded). A :class:`KeyError` is
+    raised if there is no such object.
+    """
+    initDatabase()
+    dirpath = getSectionPath(component, section)
+    if dirpath in _loadedSections:
+        loadDatabase(component, section)
+        return getDatabaseObjects(component, section)[label]
+
+    path = getDatabaseObjectPath(component, section, label)
+    if path is None:
+        raise KeyError(label)
+    with getSectionLock(dirpath):
+        objects = getDatabaseObjects(component, section)
+        paths = getObjectModifiedFiles(dirpath, path)
+        if label not in objects or paths:
+            clearSectionModified(dirpath, paths)
+            logReload([profileLoad('{0}/{1}/{2}'.format(component, section, label), loadDatabaseObject, component, section, label, path)])
+            if os.path.isdir(path):
+                resetDirTimestamps(path)
+            else:
+                resetTimestamp(path)
+        return objects[label]
+
+class EntryIndex(object):
+    """
+    A map from the index of each entry in a database (library, depository,
+    group tree, etc.) to the key of that entry in the database's `entries`
+    dictionary, along with the highest index in use, `maxIndex`.
+    """
+
+    def __init__(self, database):
+        self.keys = {}
+        self.maxIndex = 0
+        for key, entry in database.entries.iteritems():
+            self.add(key, entry)
+
+    def add(self, key, entry):
+        """
+        Record that the given `entry` is stored under `key`.
+        """
+        # Where several entries share an index, keep the first
+        self.keys.setdefault(entry.index, key)
+        self.maxIndex = max(self.maxIndex, entry.index)
+
+# The index of the entries in each loaded database; since reloading any part
+# of the RMG database makes new database objects, indexes are made again
+# after reloading and the old ones are discarded
+_entryIndexes = weakref.WeakKeyDictionary()
+
+def getEntryIndex(database, rebuild=False):
+    """
+    Return the :class:`EntryIndex` for the given `database`, making it if it
+    doesn't exist yet or if `rebuild` is ``True``.
+    """
+    entryIndex = None if rebuild else _entryIndexes.get(database)
+    if entryIndex is None:
+        entryIndex = EntryIndex(database)
+        _entryIndexes[database] = entryIndex
+    return entryIndex
+
+def getEntryByIndex(database, index):
+    """
+    Return the entry in the given `database` with the given `index`, or
+    ``None`` if there is no such entry.
+    """
+    key = getEntryIndex(database).keys.get(index)
+    if key is None:
+        return None
+    entry = database.entries.get(key)
+    if entry is None or entry.index != index:
+        # The entries have been changed without updating the index
+        key = getEntryIndex(database, rebuild=True).keys.get(index)
+        entry = database.entries.get(key) if key is not None else None
+    return entry
+
+def getMaxEntryIndex(database):
+    """
+    Return the highest index of the entries in the given `database`, or 0 if
+    it has no entries.
+    """
+    return getEntryIndex(database).maxIndex
+
+def setEntry(database, entry):
+    """
+    Add the given `entry` to the given `database`, replacing any existing
+    entry with the same index, and keep the index of its entries up to date.
+    New entries are stored under their index.
+    """
+    entryIndex = getEntryIndex(database)
+    key = entryIndex.keys.get(entry.index, entry.index)
+    database.entries[key] = entry
+    entryIndex.keys[entry.index] = key
+    entryIndex.maxIndex = max(entryIndex.maxIndex, entry.index)
+
+def getThermoDatabase(section, subsection):
+    """
+    Return the component of the thermodynamics database corresponding to the
+    given `section` and `subsection`, loading it first if necessary. If
+    either of these is invalid, a :class:`ValueError` is raised.
+    """
+    if section not in ['depository', 'libraries', 'groups']:
+        raise ValueError('Invalid value "%s" for section parameter.' % section)
+    try:
+        db = getDatabaseObject('thermo', section, subsection)
     except KeyError:
         raise ValueError('Invalid value "%s" for subsection parameter.' % subsection)
     return db
@@ -201,19 +967,17 @@ def getThermoDatabase(section, subsection):
 def getKineticsDatabase(section, subsection):
     """
     Return the component of the kinetics database corresponding to the
-    given `section` and `subsection`. If either of these is invalid, a
-    :class:`ValueError` is raised.
+    given `section` and `subsection`, loading it first if necessary. If
+    either of these is invalid, a :class:`ValueError` is raised.
     """
-    global database
-    
     db = None
     try:
         if section == 'libraries':
-            db = database.kinetics.libraries[subsection]
+            db = getDatabaseObject('kinetics', 'libraries', subsection)
         elif section == 'families':
             subsection = subsection.split('/')
             if subsection[0] != '' and len(subsection) == 2:
-                family = database.kinetics.families[subsection[0]]
+                family = getDatabaseObject('kinetics', 'families', subsection[0])
                 if subsection[1] == 'groups':
                     db = family.groups
                 elif subsection[1] == 'rules':
@@ -229,6 +993,104 @@ def getKineticsDatabase(section, subsection):
 
 ################################################################################
 
+class DatabaseSummary(object):
+    """
+    A summary of a library, depository, group tree or family in the RMG
+    database, for listing in the database index pages. For a kinetics family,
+    `groups`, `rules` and `depositories` hold summaries of its parts.
+    """
+
+    def __init__(self, label='', name='', numEntries=0, groups=None, rules=None, depositories=None):
+        self.label = label
+        self.name = name
+        self.numEntries = numEntries
+        self.groups = groups
+        self.rules = rules
+        self.depositories = depositories or []
+
+    @classmethod
+    def fromDatabase(cls, db):
+        """
+        Return a summary of the loaded database `db`.
+        """
+        return cls(label=db.label, name=db.name, numEntries=len(db.entries))
+
+    @classmethod
+    def fromFile(cls, label, path):
+        """
+        Return a summary of the database file at `path` with the given
+        `label`, found by scanning the file rather than loading it.
+        """
+        f = open(path, 'r')
+        text = f.read()
+        f.close()
+        match = re.search(r'^name\s*=\s*u?(["\'])(.*?)\1', text, re.MULTILINE)
+        name = match.group(2) if match else label
+        numEntries = len(re.findall(r'^entry\s*\(', text, re.MULTILINE))
+        return cls(label=label, name=name, numEntries=numEntries)
+
+def getDatabaseSummaries(component, section):
+    """
+    Return a list of (label, summary) pairs, sorted by label, for each of the
+    libraries, depositories, group trees or families in the given `section`
+    of the given `component` of the RMG database. If the section has been
+    loaded the summaries are taken from it; otherwise the files are scanned,
+    which is much faster than loading them. Thermo libraries are returned in
+    our preferred order instead of by label.
+    """
+    initDatabase()
+    dirpath = getSectionPath(component, section)
+    summaries = {}
+    if dirpath in _loadedSections:
+        loadDatabase(component, section)
+        for label, db in getDatabaseObjects(component, section).iteritems():
+            if component == 'kinetics' and section == 'families':
+                summaries[label] = DatabaseSummary(label=label, name=db.name,
+                    groups = DatabaseSummary.fromDatabase(db.groups),
+                    rules = DatabaseSummary.fromDatabase(db.rules),
+                    depositories = [DatabaseSummary.fromDatabase(depository) for depository in db.depositories],
+                )
+            else:
+                summaries[label] = DatabaseSummary.fromDatabase(db)
+    elif component == 'kinetics' and section == 'families':
+        for label in os.listdir(dirpath):
+            familyPath = os.path.join(dirpath, label)
+            if not os.path.isfile(os.path.join(familyPath, 'groups.py')):
+                continue
+            depositories = []
+            for f in sorted(os.listdir(familyPath)):
+                name, ext = os.path.splitext(f)
+                if ext == '.py' and name not in ['groups', 'rules']:
+                    depositories.append(DatabaseSummary.fromFile('{0}/{1}'.format(label, name), os.path.join(familyPath, f)))
+            rulesPath = os.path.join(familyPath, 'rules.py')
+            if os.path.isfile(rulesPath):
+                rules = DatabaseSummary.fromFile('{0}/rules'.format(label), rulesPath)
+            else:
+                rules = DatabaseSummary(label='{0}/rules'.format(label))
+            summaries[label] = DatabaseSummary(label=label, name=label,
+                groups = DatabaseSummary.fromFile('{0}/groups'.format(label), os.path.join(familyPath, 'groups.py')),
+                rules = rules,
+                depositories = depositories,
+            )
+    else:
+        for root, dirs, files in os.walk(dirpath):
+            for f in files:
+                if f.endswith('.py'):
+                    path = os.path.join(root, f)
+                    label = getDatabaseObjectLabel(component, section, path)
+                    summaries[label] = DatabaseSummary.fromFile(label, path)
+
+    if component == 'thermo' and section == 'libraries':
+        if dirpath in _loadedSections:
+            labels = database.thermo.libraryOrder
+        else:
+            labels = getPreferredThermoLibraryOrder(sorted(summaries))
+    else:
+        labels = sorted(summaries)
+    return [(label, summaries[label]) for label in labels]
+
+################################################################################
+
 def generateSpeciesThermo(species, database):
     """
     Generate the thermodynamics data for a given :class:`Species` object
@@ -239,6 +1101,155 @@ def generateSpeciesThermo(species, database):
         
 ################################################################################
 
+class DatabaseObjectRegistry(object):
+    """
+    Gives a key to each family, library and depository in the given kinetics
+    `database`, and to each of their entries, so that reactions that refer to
+    them can be pickled by reference rather than by copying half of the
+    database. The keys are made from labels, so are the same in every process
+    that has loaded the same database.
+    """
+
+    def __init__(self, database):
+        self.objects = {}
+        self.keys = {}
+        for label, family in database.families.iteritems():
+            self.add(('families', label), family, entries=False)
+            self.add(('families', label, 'groups'), family.groups)
+            self.add(('families', label, 'rules'), family.rules)
+            for depository in family.depositories:
+                self.add(('families', label, 'depositories', depository.label), depository)
+        for label, library in database.libraries.iteritems():
+            self.add(('libraries', label), library)
+
+    def add(self, key, obj, entries=True):
+        """
+        Give the key `key` to the object `obj`, and if `entries` is ``True``,
+        to each of its entries.
+        """
+        self.objects[key] = obj
+        self.keys[id(obj)] = key
+        if entries:
+            for label, entry in obj.entries.iteritems():
+                if isinstance(entry, list):
+                    # The rules hold a list of entries for each template
+                    for index, e in enumerate(entry):
+                        self.add(key + ('entry', label, index), e, entries=False)
+                else:
+                    self.add(key + ('entry', label), entry, entries=False)
+
+    def getKey(self, obj):
+        """
+        Return the key of the object `obj`, or ``None`` if it has none (and so
+        should be pickled as usual). For use as a pickler's `persistent_id`.
+        """
+        return self.keys.get(id(obj))
+
+    def getObject(self, key):
+        """
+        Return the object with the given `key`. For use as an unpickler's
+        `persistent_load`.
+        """
+        try:
+            return self.objects[key]
+        except KeyError:
+            raise cPickle.UnpicklingError('No database object with key {0!r}.'.format(key))
+
+# The kinetics objects that the reaction cache version was made from, the
+# fingerprint of their files, and a registry of them if needed
+_reactionCacheVersion = (None, None, None)
+
+def getReactionCacheVersion(database):
+    """
+    Return the fingerprint of the kinetics part of the given RMG `database`
+    used to key the :data:`reactionCache`, and a :class:`DatabaseObjectRegistry`
+    for it if the cache pickles reactions (or ``None`` if not). These are
+    only worked out again when a kinetics family or library is (re)loaded.
+    """
+    global _reactionCacheVersion
+    kinetics = database.kinetics
+    objects = [kinetics.families, kinetics.libraries] + kinetics.families.values() + kinetics.libraries.values()
+    version = _reactionCacheVersion
+    if version[0] is None or len(version[0]) != len(objects) or any([a is not b for a, b in zip(version[0], objects)]):
+        dirpaths = [getSectionPath('kinetics', section) + os.sep for section in ['families', 'libraries']]
+        timestamps = dict([(path, mtime) for path, mtime in _timestamps.items() if any([path.startswith(d) for d in dirpaths])])
+        fingerprint = getDatabaseFingerprint(timestamps)
+        registry = None
+        if isinstance(reactionCache, SQLiteCache):
+            registry = DatabaseObjectRegistry(kinetics)
+        version = _reactionCacheVersion = (objects, fingerprint, registry)
+    return version[1], version[2]
+
+def getPersistentId(obj):
+    """
+    Return the key of `obj` in the current registry of kinetics objects, if
+    any, so that reactions are pickled with references to it.
+    """
+    registry = _reactionCacheVersion[2]
+    return registry.getKey(obj) if registry is not None else None
+
+def getPersistentObject(key):
+    """
+    Return the kinetics object with the given `key` in the current registry,
+    for unpickling reactions pickled by reference to it.
+    """
+    registry = _reactionCacheVersion[2]
+    if registry is None:
+        raise cPickle.UnpicklingError('No registry of database objects.')
+    return registry.getObject(key)
+
+# The cache of the results of generateReactions(), or None if disabled
+reactionCache = getCache(settings.REACTION_CACHE, persistentId=getPersistentId, persistentLoad=getPersistentObject)
+
+def getReactionCacheKey(fingerprint, reactants, products=None, only_families=None):
+    """
+    Return the key in the :data:`reactionCache` of the reactions of the given
+    `reactants` and `products` in the given `only_families`, in the version of
+    the kinetics database with the given `fingerprint`, or of the reactions
+    from RMG-Java if `fingerprint` is ``None``. The order of the
+    reactants, products and families doesn't matter. Since different
+    molecules very occasionally share a key (see :func:`getMoleculeKey`), the
+    reactants and products are cached along with the reactions so that a
+    match can be confirmed.
+    """
+    reactantKeys = sorted([getMoleculeKey(molecule) for molecule in reactants])
+    productKeys = sorted([getMoleculeKey(molecule) for molecule in products]) if products is not None else None
+    families = sorted(only_families) if only_families is not None else None
+    return 'reactions:' + hashlib.sha1(repr((fingerprint, reactantKeys, productKeys, families))).hexdigest()
+
+def isSameMolecules(molecules1, molecules2):
+    """
+    Return ``True`` if the lists of molecules `molecules1` and `molecules2`
+    are the same apart from their order, i.e. if each molecule in one is
+    isomorphic to a different molecule in the other. Either list may be
+    ``None``, which only matches ``None``.
+    """
+    if molecules1 is None or molecules2 is None:
+        return molecules1 is None and molecules2 is None
+    if len(molecules1) != len(molecules2):
+        return False
+    unmatched = list(molecules2)
+    for molecule in molecules1:
+        for index, other in enumerate(unmatched):
+            if molecule.isIsomorphic(other):
+                del unmatched[index]
+                break
+        else:
+            return False
+    return True
+
+def copyReaction(reaction):
+    """
+    Return a copy of the given `reaction` with its own lists of copied
+    reactant and product species, which can be given thermo data or new
+    kinetics without changing the original. Anything else, such as the
+    family or entry it came from, is shared with the original.
+    """
+    reaction = copy.copy(reaction)
+    reaction.reactants = [copy.copy(species) for species in reaction.reactants]
+    reaction.products = [copy.copy(species) for species in reaction.products]
+    return reaction
+
 def generateReactions(database, reactants, products=None, only_families=None):
     """
     Generate the reactions (and associated kinetics) for a given set of
@@ -249,24 +1260,76 @@ def generateReactions(database, reactants, products=None, only_families=None):
     this function will also query it for reactions and kinetics.
     If `only_families` is a list of strings, only those labeled families are 
     used: no libraries and no RMG-Java kinetics are returned.
+    
+    Returns the list of reactions from RMG-Py, the list from RMG-Java, and a
+    message saying why there are no RMG-Java results if it couldn't be
+    queried (e.g. if it didn't answer within ``settings.RMG_JAVA_TIMEOUT``),
+    or else ``None``.
+    
+    The results are kept in the :data:`reactionCache`, if enabled: those from
+    RMG-Py until the kinetics database changes, and those from RMG-Java
+    separately, so that RMG-Py's are still cached when RMG-Java can't be
+    queried. The reactions returned are always copies, so they may be
+    modified freely.
     """
+    if reactionCache is None:
+        return generateReactionsUncached(database, reactants, products, only_families)
     
-    # get RMG-py reactions
-    reactionList = []
+    # Start querying RMG-Java if its results aren't cached, so that it works
+    # while RMG-Py does
+    rmgJavaKey = rmgJavaQuery = None
+    rmgJavaReactionList = []
     if only_families is None:
-        # Not restricted to certain families, so also check libraries.
-        reactionList.extend(database.kinetics.generateReactionsFromLibraries(reactants, products))
-    reactionList.extend(database.kinetics.generateReactionsFromFamilies(reactants, products, only_families=only_families))
-    if len(reactants) == 1:
-        # if only one reactant, react it with itself bimolecularly, with RMG-py
-        # the java version already does this (it includes A+A reactions when you react A)
-        reactants2 = [reactants[0], reactants[0]]
-        if only_families is None:
-            # Not restricted to certain families, so also check libraries.
-            reactionList.extend(database.kinetics.generateReactionsFromLibraries(reactants2, products))
-        reactionList.extend(database.kinetics.generateReactionsFromFamilies(reactants2, products, only_families=only_families))
+        rmgJavaKey = getReactionCacheKey(None, reactants, products)
+        rmgJavaReactionList = getCachedReactions(rmgJavaKey, reactants, products)
+        if rmgJavaReactionList is None:
+            rmgJavaQuery = RMGJavaQuery(reactants, products)
+            rmgJavaQuery.start()
     
-    # get RMG-py kinetics
+    fingerprint = getReactionCacheVersion(database)[0]
+    key = getReactionCacheKey(fingerprint, reactants, products, only_families)
+    reactionList = getCachedReactions(key, reactants, products)
+    if reactionList is None:
+        reactionList = generateRMGPyReactions(database, reactants, products, only_families)
+        setCachedReactions(key, reactants, products, reactionList)
+    
+    rmgJavaError = None
+    if rmgJavaQuery is not None:
+        rmgJavaReactionList, rmgJavaError = getRMGJavaQueryResult(rmgJavaQuery)
+        if rmgJavaError is None:
+            setCachedReactions(rmgJavaKey, reactants, products, rmgJavaReactionList)
+    
+    return [copyReaction(reaction) for reaction in reactionList], [copyReaction(reaction) for reaction in rmgJavaReactionList], rmgJavaError
+
+def getCachedReactions(key, reactants, products=None):
+    """
+    Return the list of reactions of the given `reactants` and `products` kept
+    in the :data:`reactionCache` under the given `key`, or ``None`` if there
+    is none.
+    """
+    result = reactionCache.get(key)
+    if result is None or not (isSameMolecules(reactants, result[0]) and isSameMolecules(products, result[1])):
+        # Not cached, or different molecules that happen to share a key
+        return None
+    return result[2]
+
+def setCachedReactions(key, reactants, products, reactionList):
+    """
+    Keep the list of reactions `reactionList` of the given `reactants` and
+    `products` in the :data:`reactionCache` under the given `key`. Copies of
+    the molecules are kept, since the originals may be changed elsewhere.
+    """
+    reactants = [molecule.copy(deep=True) for molecule in reactants]
+    products = [molecule.copy(deep=True) for molecule in products] if products is not None else None
+    reactionCache.set(key, (reactants, products, reactionList))
+
+def getReactionKinetics(reactionList):
+    """
+    Return a list of the reactions in `reactionList`, with a copy of each
+    reaction from a kinetics family for each of the kinetics estimates for it
+    in the family's rules and depositories. Reactions that already have
+    kinetics (e.g. from a library) are returned as they are.
+    """
     reactionList0 = reactionList; reactionList = []
     for reaction in reactionList0:
         # If the reaction already has kinetics (e.g. from a library),
@@ -321,15 +1384,69 @@ def generateReactions(database, reactants, products=None, only_families=None):
                         family = reaction.family,
                     )
                 reactionList.append(rxn)
+    return reactionList
+
+def generateReactionsUncached(database, reactants, products=None, only_families=None):
+    """
+    Generate the reactions (and associated kinetics) for a given set of
+    `reactants` and an optional set of `products`, as described for
+    :func:`generateReactions`, without using the cache. Returns the list of
+    reactions from RMG-Py, the list from RMG-Java, and a message saying why
+    RMG-Java didn't answer if it should have been queried but wasn't, or else
+    ``None``. RMG-Java is queried in another thread while RMG-Py generates
+    reactions.
+    """
     
-    # get RMG-java reactions
+    # Start querying RMG-Java, so that it works while RMG-Py does
     if only_families is None:
         # Not restricted to certain families, so also check RMG-Java.
-        rmgJavaReactionList = getRMGJavaKinetics(reactants, products)
+        rmgJavaQuery = RMGJavaQuery(reactants, products)
+        rmgJavaQuery.start()
     else:
-        rmgJavaReactionList = []
+        rmgJavaQuery = None
+    
+    reactionList = generateRMGPyReactions(database, reactants, products, only_families)
     
-    return reactionList, rmgJavaReactionList
+    rmgJavaReactionList = []
+    rmgJavaError = None
+    if rmgJavaQuery is not None:
+        rmgJavaReactionList, rmgJavaError = getRMGJavaQueryResult(rmgJavaQuery)
+    
+    return reactionList, rmgJavaReactionList, rmgJavaError
+
+def generateRMGPyReactions(database, reactants, products=None, only_families=None):
+    """
+    Return the list of reactions (and associated kinetics) of the given
+    `reactants` and optional `products` found by RMG-Py in the given
+    `database`, as described for :func:`generateReactions`.
+    """
+    reactants2 = [reactants[0], reactants[0]] if len(reactants) == 1 else None
+    reactionList = []
+    if only_families is None:
+        # Not restricted to certain families, so also check libraries.
+        reactionList.extend(database.kinetics.generateReactionsFromLibraries(reactants, products))
+    reactionList.extend(database.kinetics.generateReactionsFromFamilies(reactants, products, only_families=only_families))
+    if reactants2:
+        # if only one reactant, react it with itself bimolecularly, with RMG-py
+        # the java version already does this (it includes A+A reactions when you react A)
+        if only_families is None:
+            # Not restricted to certain families, so also check libraries.
+            reactionList.extend(database.kinetics.generateReactionsFromLibraries(reactants2, products))
+        reactionList.extend(database.kinetics.generateReactionsFromFamilies(reactants2, products, only_families=only_families))
+    return getReactionKinetics(reactionList)
+
+def getRMGJavaQueryResult(rmgJavaQuery):
+    """
+    Wait for the given :class:`RMGJavaQuery` to finish, and return the list of
+    reactions it found along with ``None``, or an empty list and a message
+    saying why RMG-Java didn't answer.
+    """
+    try:
+        return rmgJavaQuery.getResult(), None
+    except RMGJavaError, e:
+        print >> sys.stderr, e
+        sys.stderr.flush()
+        return [], str(e)
     
 ################################################################################
 
@@ -351,6 +1468,49 @@ def reactionHasReactants(reaction, reactants):
             return False
     return True
 
+def getSpeciesKey(species):
+    """
+    Return a key for the given :class:`Species` or :class:`Molecule`
+    `species` that is the same for any two isomorphic species, made from its
+    molecular formula and number of radical electrons. Unlike a SMILES string,
+    this doesn't depend on which resonance isomer is used.
+    """
+    molecule = species.molecule[0] if isinstance(species, Species) else species
+    return (molecule.getFormula(), molecule.getRadicalCount())
+
+def getReactionKey(reaction):
+    """
+    Return a key for the given `reaction` that is the same for any two
+    reactions that are isomorphic in either direction, made from the keys of
+    the species on each side. Reactions with different keys can't be
+    isomorphic, so this is a cheap way to avoid most isomorphism checks.
+    """
+    reactants = tuple(sorted([getSpeciesKey(species) for species in reaction.reactants]))
+    products = tuple(sorted([getSpeciesKey(species) for species in reaction.products]))
+    return min(reactants, products), max(reactants, products)
+
+def getUniqueReactions(reactionList):
+    """
+    Return a list of the unique reactions in `reactionList`, in the order
+    they first appear, and a list of the number of times each appears. Each
+    reaction is only checked for isomorphism against the unique reactions
+    with the same :func:`getReactionKey`.
+    """
+    uniqueReactionList = []
+    uniqueReactionCount = []
+    buckets = {}
+    for reaction in reactionList:
+        bucket = buckets.setdefault(getReactionKey(reaction), [])
+        for i in bucket:
+            if reaction.isIsomorphic(uniqueReactionList[i]):
+                uniqueReactionCount[i] += 1
+                break
+        else:
+            bucket.append(len(uniqueReactionList))
+            uniqueReactionList.append(reaction)
+            uniqueReactionCount.append(1)
+    return uniqueReactionList, uniqueReactionCount
+
 def getRMGJavaKineticsFromReaction(reaction):
     """
     Get the kinetics for the given `reaction` (with reactants and products as :class:`Species`)
@@ -370,11 +1530,60 @@ def getRMGJavaKineticsFromReaction(reaction):
     return reactionList[0]
     
     
-def getRMGJavaKinetics(reactantList, productList=None):
+class RMGJavaQuery(threading.Thread):
+    """
+    A thread that gets the reactions of the given `reactants` (and optional
+    `products`) from RMG-Java by calling :func:`getRMGJavaKinetics`, so that
+    other work can be done while waiting for the server. Copies of the
+    molecules are sent, since RMG-Java's answer is matched against them while
+    the originals may be in use elsewhere. Call :meth:`start` to send the
+    query and :meth:`getResult` to wait for the reactions.
+    """
+
+    def __init__(self, reactants, products=None, timeout=None):
+        threading.Thread.__init__(self, name='RMGJavaQuery')
+        self.daemon = True
+        self.reactants = [molecule.copy(deep=True) for molecule in reactants]
+        self.products = [molecule.copy(deep=True) for molecule in products] if products else None
+        self.timeout = timeout if timeout is not None else settings.RMG_JAVA_TIMEOUT
+        self.deadline = None
+        self.reactionList = None
+        self.error = None
+
+    def start(self):
+        self.deadline = time.time() + self.timeout
+        threading.Thread.start(self)
+
+    def run(self):
+        try:
+            self.reactionList = getRMGJavaKinetics(self.reactants, self.products, raiseErrors=True, timeout=self.timeout)
+        except Exception, e:
+            self.error = e
+
+    def getResult(self):
+        """
+        Wait until the query's deadline for RMG-Java to answer, then return
+        the list of reactions it found. An :class:`RMGJavaError` is raised if
+        it couldn't be reached or didn't answer in time. If so, the thread is
+        left to finish in the background.
+        """
+        self.join(max(self.deadline - time.time(), 0))
+        if self.isAlive():
+            raise RMGJavaError('RMG-Java did not answer within {0:g} s, so its results are not shown.'.format(self.timeout))
+        if isinstance(self.error, RMGJavaError):
+            raise self.error
+        elif self.error is not None:
+            raise RMGJavaError('Unable to query RMG-Java for kinetics: {0}'.format(self.error))
+        return self.reactionList
+
+def getRMGJavaKinetics(reactantList, productList=None, raiseErrors=False, timeout=None):
     """
     Get the kinetics for the given `reaction` as estimated by RMG-Java. The
     reactants and products of the given reaction should be :class:`Molecule`
-    objects.
+    objects. If the RMG-Java server can't be reached or doesn't answer within
+    `timeout` seconds (``settings.RMG_JAVA_TIMEOUT`` by default), an empty
+    list is returned, or an :class:`RMGJavaError` raised if `raiseErrors` is
+    ``True``.
     
     This is done by querying a socket running RMG-Java as a service. We
     construct the input file for a PopulateReactions job, pass that as input
@@ -472,10 +1681,15 @@ def getRMGJavaKinetics(reactantList, productList=None):
         """
         Given a species_dict list and the species adjacency list, identifies
         whether species is found in the list and returns its name if found.
+        Only the adjacency lists with the same heavy atoms as the species are
+        parsed.
         """
         resonance_isomers = molecule.generateResonanceIsomers()
+        formula = getMoleculeFormula(molecule)
         for name, adjlist in species_dict:
-            listmolecule = Molecule().fromAdjacencyList(adjlist)
+            if getAdjacencyListFormula(adjlist) != formula:
+                continue
+            listmolecule = getMoleculeFromAdjacencyList(adjlist)
             for isomer in resonance_isomers:
                 if isomer.isIsomorphic(listmolecule):
                     return name
@@ -499,26 +1713,17 @@ def getRMGJavaKinetics(reactantList, productList=None):
     popreactants += 'END\n'
     
     
-    # First send search request to PopulateReactions server
-    client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    client_socket.settimeout(10)
+    # Send search request to PopulateReactions server
+    if timeout is None:
+        timeout = settings.RMG_JAVA_TIMEOUT
     try:
-        client_socket.connect(("localhost", 5000))
-    except IOError:
-        print >> sys.stderr, 'Unable to query RMG-Java for kinetics. (Is the RMG-Java server running?)'
+        response = getRMGJavaClient().query(popreactants, timeout)
+    except RMGJavaError, e:
+        if raiseErrors:
+            raise
+        print >> sys.stderr, e
         sys.stderr.flush()
         return reactionList
-    
-    # Send request to server
-    print "SENDING REQUEST FOR RMG-JAVA SEARCH TO SERVER"
-    client_socket.sendall(popreactants)
-    partial_response = client_socket.recv(512)
-    response = partial_response
-    while partial_response:
-        partial_response = client_socket.recv(512)
-        response += partial_response
-    client_socket.close()
-    print "FINISHED REQUEST. CLOSED CONNECTION TO SERVER"
 
     # Clean response from server
     species_dict, reactions_list = cleanResponse(response)
@@ -529,13 +1734,21 @@ def getRMGJavaKinetics(reactantList, productList=None):
         reactantNames.append(identifySpecies(species_dict, reactant))
     productNames = []
     for product in productList:
-        productNames.append(identifySpecies(species_dict, product))
+        productName = identifySpecies(species_dict, product)
+        productNames.append(productName)
         # identifySpecies(species_dict, product) returns "False" if it can't find product
-        if not identifySpecies(species_dict, product):
+        if not productName:
             print "Could not find this requested product in the species dictionary from RMG-Java:"
             print str(product)
     
-    species_dict = dict([(key, Molecule().fromAdjacencyList(value)) for key, value in species_dict])
+    # Only the species in matching reactions are parsed, each into its own
+    # copy of the (possibly shared) molecule
+    adjlists = dict(species_dict)
+    molecules = {}
+    def getSpeciesMolecule(name):
+        if name not in molecules:
+            molecules[name] = getMoleculeFromAdjacencyList(adjlists[name]).copy(deep=True)
+        return molecules[name]
     
     # Both products were actually found in species dictionary or were blank
     if all(productNames):
@@ -544,7 +1757,6 @@ def getRMGJavaKinetics(reactantList, productList=None):
         degeneracy = 1
 
         # Search for da Reactions
-        print 'Searching output for desired reaction...\n'
         for reactionline in reactions_list:
             if reactionline.strip().startswith('DUP'):
                 print "WARNING - DUPLICATE REACTION KINETICS ARE NOT BEING SUMMED"
@@ -558,12 +1770,10 @@ def getRMGJavaKinetics(reactantList, productList=None):
             indicator1 = searchReaction(reactionline, reactantNames, productNames)
             indicator2 = searchReaction(reactionline, productNames, reactantNames)
             if indicator1 == True or indicator2 == True:
-                print 'Found a matching reaction:'
-                print reactionline
                 reactants, products, kinetics, entry = extractKinetics(reactionline)
                 reaction = DepositoryReaction(
-                    reactants = [species_dict[reactant] for reactant in reactants],
-                    products = [species_dict[product] for product in products],
+                    reactants = [getSpeciesMolecule(reactant) for reactant in reactants],
+                    products = [getSpeciesMolecule(product) for product in products],
                     kinetics = kinetics,
                     degeneracy = degeneracy,
                     entry = entry,
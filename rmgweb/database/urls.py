@@ -38,6 +38,15 @@ urlpatterns = patterns('rmgweb.database',
     # Load the whole database into memory
     (r'^load/?$', 'views.load'),
     
+    # Load times and memory use of each part of the database (staff only)
+    (r'^load/profile/?$', 'views.profile'),
+    
+    # Use of the reaction and plot data caches in this process (staff only)
+    (r'^load/cache/?$', 'views.cacheStats'),
+    
+    # Whether the database is loaded in this process
+    (r'^ready/?$', 'views.ready'),
+    
     # History
     # These are up front to avoid it being interpreted as the 'history' section or subsection.
     (r'^history', 'views.gitHistory'),
@@ -50,6 +59,8 @@ urlpatterns = patterns('rmgweb.database',
     (r'^thermo/search/$', 'views.thermoSearch'),
     (r'^thermo/molecule/(?P<adjlist>[\S\s]+)$', 'views.thermoData'),
     (r'^thermo/(?P<section>\w+)/(?P<subsection>.+)/(?P<index>\d+)/$', 'views.thermoEntry'),
+    (r'^thermo/(?P<section>\w+)/(?P<subsection>.+)/(?P<index>\d+)/plot/$', 'views.thermoEntryPlot'),
+    (r'^thermo/(?P<section>\w+)/(?P<subsection>.+)/rows/$', 'views.thermoRows'),
     (r'^thermo/(?P<section>\w+)/(?P<subsection>.+)/$', 'views.thermo'),
     (r'^thermo/(?P<section>\w+)/$', 'views.thermo'),
     
@@ -86,6 +97,8 @@ urlpatterns = patterns('rmgweb.database',
     
     (r'^kinetics/(?P<section>\w+)/(?P<subsection>.+)/(?P<index>\d+)/edit$', 'views.kineticsEntryEdit'),
     (r'^kinetics/(?P<section>\w+)/(?P<subsection>.+)/(?P<index>\d+)/$', 'views.kineticsEntry'),
+    (r'^kinetics/(?P<section>\w+)/(?P<subsection>.+)/(?P<index>\d+)/plot/$', 'views.kineticsEntryPlot'),
+    (r'^kinetics/(?P<section>\w+)/(?P<subsection>.+)/rows/$', 'views.kineticsRows'),
     (r'^kinetics/(?P<section>\w+)/(?P<subsection>.+)/$', 'views.kinetics'),
     (r'^kinetics/(?P<section>\w+)/$', 'views.kinetics'),
     
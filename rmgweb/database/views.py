@@ -36,12 +36,16 @@ import StringIO # cStringIO is faster, but can't do Unicode
 import copy
 import time
 import subprocess
+import json
+import numpy
 
 from django.shortcuts import render_to_response
 from django.template import RequestContext
 from django.http import Http404, HttpResponseRedirect, HttpResponse
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.core.urlresolvers import reverse
+from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 import settings
 
 from rmgpy.molecule import Molecule
@@ -59,6 +63,8 @@ from rmgpy.data.rmg import RMGDatabase
 from forms import *
 from tools import *
 from rmgweb.main.tools import *
+from rmgweb.main.templatetags.render_thermo import getThermoPlotData
+from rmgweb.main.templatetags.render_kinetics import getRateCoefficientPlotData
 
 #from rmgweb.main.tools import moleculeToURL, moleculeFromURL
 
@@ -71,12 +77,130 @@ def load(request):
     loadDatabase()
     return HttpResponseRedirect(reverse(index))
     
+def ready(request):
+    """
+    Report whether the RMG database is fully loaded in this process, with a
+    status of 200 if so (warm) or 503 if not (cold), so that load balancers
+    can avoid sending requests to cold workers.
+    """
+    if isDatabaseWarm():
+        return HttpResponse(json.dumps({'status': 'warm'}), mimetype="application/json")
+    else:
+        return HttpResponse(json.dumps({'status': 'cold'}), mimetype="application/json", status=503)
+
+@staff_member_required
+def profile(request):
+    """
+    Report how long each loaded section of the RMG database and each library,
+    depository, group tree or family took to load, how many entries it has,
+    and roughly how much memory it uses, as JSON. The memory used is slow to
+    measure, so it is only shown if it was measured when the database was
+    warmed up (see ``settings.DATABASE_PROFILE_SIZES``).
+    """
+    result = {
+        'pid': os.getpid(),
+        'memory': getResidentMemory(),
+        'profile': getDatabaseProfile(),
+    }
+    return HttpResponse(json.dumps(result, indent=2), mimetype="application/json")
+
+@staff_member_required
+def cacheStats(request):
+    """
+    Report how many entries, hits and misses there have been in this process
+    for the cache of reactions found by kinetics searches and the caches of
+    plot data and math for kinetics, thermo and statmech models, as JSON.
+    """
+    result = {
+        'pid': os.getpid(),
+        'reactions': reactionCache.getStats() if reactionCache is not None else None,
+        'plots': getPlotCacheStats(),
+    }
+    return HttpResponse(json.dumps(result, indent=2), mimetype="application/json")
+
 def index(request):
     """
     The RMG database homepage.
     """
     return render_to_response('database.html', context_instance=RequestContext(request))
 
+def getTablePage(request, entries, sortKeys, default='index'):
+    """
+    Return the page of the list of database `entries` requested by the
+    ``page`` parameter of the `request`, after sorting them by the ``sort``
+    parameter: the name of one of the `sortKeys` (a dictionary of functions
+    that return the key to sort an entry by), prefixed with ``-`` to sort in
+    reverse. The page and the sort actually used are returned.
+    """
+    sort = request.GET.get('sort', default)
+    if sort.lstrip('-') not in sortKeys:
+        sort = default
+    entries = sorted(entries, key=sortKeys[sort.lstrip('-')], reverse=sort.startswith('-'))
+    paginator = Paginator(entries, settings.DATABASE_TABLE_PAGE_SIZE)
+    try:
+        page = paginator.page(request.GET.get('page', 1))
+    except PageNotAnInteger:
+        page = paginator.page(1)
+    except EmptyPage:
+        page = paginator.page(paginator.num_pages)
+    return page, sort
+
+def getTableRowsResponse(page, sort, rows):
+    """
+    Return a JSON response containing the given table `rows` on the given
+    `page` of a database table sorted by `sort`.
+    """
+    result = {
+        'page': page.number,
+        'numPages': page.paginator.num_pages,
+        'count': page.paginator.count,
+        'sort': sort,
+        'rows': rows,
+    }
+    return HttpResponse(json.dumps(result), mimetype="application/json")
+
+def getThermoDataFormat(data):
+    """
+    Return a description of the format of the thermodynamics `data` of an
+    entry in the thermo database.
+    """
+    if data is None: return 'None'
+    elif isinstance(data, ThermoData): return 'Group additivity'
+    elif isinstance(data, Wilhoit): return 'Wilhoit'
+    elif isinstance(data, MultiNASA): return 'NASA'
+    elif isinstance(data, str): return 'Link'
+    return ''
+
+def getThermoTablePage(request, section, subsection):
+    """
+    Return the thermo database for the given `section` and `subsection`, the
+    page of its entries requested by `request`, and the sort used. If either
+    of `section` or `subsection` is invalid, a :class:`ValueError` is raised.
+    """
+    database = getThermoDatabase(section, subsection)
+    sortKeys = {
+        'index': lambda entry: entry.index,
+        'label': lambda entry: entry.label.lower(),
+        'format': lambda entry: (getThermoDataFormat(entry.data), entry.index),
+    }
+    page, sort = getTablePage(request, database.entries.values(), sortKeys)
+    return database, page, sort
+
+def getThermoTableRow(section, subsection, entry):
+    """
+    Return a dictionary of the information shown in the row of a thermo table
+    for the given `entry`. Entries without data are shown with index 0; the
+    entry itself is left alone, since it belongs to the shared database.
+    """
+    index = entry.index if entry.data is not None else 0
+    return {
+        'index': index,
+        'label': entry.label,
+        'url': reverse(thermoEntry, kwargs={'section': section, 'subsection': subsection, 'index': index}),
+        'structure': getStructureMarkup(entry.item),
+        'dataFormat': getThermoDataFormat(entry.data),
+    }
+
 def thermo(request, section='', subsection=''):
     """
     The RMG database homepage.
@@ -85,71 +209,51 @@ def thermo(request, section='', subsection=''):
     if section not in ['depository', 'libraries', 'groups', '']:
         raise Http404
 
-    # Load the thermo database if necessary
-    database = loadDatabase('thermo', section)
-
     if subsection != '':
 
         # A subsection was specified, so render a table of the entries in
         # that part of the database
         
-        # Determine which subsection we wish to view
         try:
-            database = getThermoDatabase(section, subsection)
+            database, page, sort = getThermoTablePage(request, section, subsection)
         except ValueError:
             raise Http404
+        entries = [getThermoTableRow(section, subsection, entry) for entry in page.object_list]
 
-        # Sort entries by index
-        entries0 = database.entries.values()
-        entries0.sort(key=lambda entry: entry.index)
-
-        entries = []
-        for entry in entries0:
-
-            structure = getStructureMarkup(entry.item)
-
-            if isinstance(entry.data, ThermoData): dataFormat = 'Group additivity'
-            elif isinstance(entry.data, Wilhoit): dataFormat = 'Wilhoit'
-            elif isinstance(entry.data, MultiNASA): dataFormat = 'NASA'
-            elif isinstance(entry.data, str): dataFormat = 'Link'
-            
-            if entry.data is None:
-                dataFormat = 'None'
-                entry.index = 0
-            
-            entries.append((entry.index,entry.label,structure,dataFormat))
-
-        return render_to_response('thermoTable.html', {'section': section, 'subsection': subsection, 'databaseName': database.name, 'entries': entries}, context_instance=RequestContext(request))
+        return render_to_response('thermoTable.html', {'section': section, 'subsection': subsection, 'databaseName': database.name, 'entries': entries, 'page': page, 'sort': sort}, context_instance=RequestContext(request))
 
     else:
         # No subsection was specified, so render an outline of the thermo
-        # database components
-        thermoDepository = [(label, depository) for label, depository in database.thermo.depository.iteritems()]
-        thermoDepository.sort()
-        thermoLibraries = [(label, database.thermo.libraries[label]) for label in database.thermo.libraryOrder]
-        #If they weren't already sorted in our preferred order, we'd call thermoLibraries.sort()
-        thermoGroups = [(label, groups) for label, groups in database.thermo.groups.iteritems()]
-        thermoGroups.sort()
+        # database components (which doesn't need them to be loaded)
+        thermoDepository = getDatabaseSummaries('thermo', 'depository') if section in ['depository', ''] else []
+        thermoLibraries = getDatabaseSummaries('thermo', 'libraries') if section in ['libraries', ''] else []
+        thermoGroups = getDatabaseSummaries('thermo', 'groups') if section in ['groups', ''] else []
         return render_to_response('thermo.html', {'section': section, 'subsection': subsection, 'thermoDepository': thermoDepository, 'thermoLibraries': thermoLibraries, 'thermoGroups': thermoGroups}, context_instance=RequestContext(request))
 
+def thermoRows(request, section, subsection):
+    """
+    Return the rows of one page of a table of the entries in the given
+    `section` and `subsection` of the thermo database, as JSON.
+    """
+    try:
+        database, page, sort = getThermoTablePage(request, section, subsection)
+    except ValueError:
+        raise Http404
+    return getTableRowsResponse(page, sort, [getThermoTableRow(section, subsection, entry) for entry in page.object_list])
+
 def thermoEntry(request, section, subsection, index):
     """
     A view for showing an entry in a thermodynamics database.
     """
 
-    # Load the thermo database if necessary
-    loadDatabase('thermo', section)
-
-    # Determine the entry we wish to view
+    # Determine the entry we wish to view (loading it if necessary)
     try:
         database = getThermoDatabase(section, subsection)
     except ValueError:
         raise Http404
     index = int(index)
-    for entry in database.entries.values():
-        if entry.index == index:
-            break
-    else:
+    entry = getEntryByIndex(database, index)
+    if entry is None:
         raise Http404
 
     # Get the structure of the item we are viewing
@@ -166,6 +270,23 @@ def thermoEntry(request, section, subsection, index):
     reference = entry.reference
     return render_to_response('thermoEntry.html', {'section': section, 'subsection': subsection, 'databaseName': database.name, 'entry': entry, 'structure': structure, 'reference': reference, 'referenceType': referenceType, 'thermo': thermo}, context_instance=RequestContext(request))
 
+def thermoEntryPlot(request, section, subsection, index):
+    """
+    A view returning the data plotted on the page of an entry in a
+    thermodynamics database, as JSON, so that the page can fetch it after
+    loading.
+    """
+    try:
+        database = getThermoDatabase(section, subsection)
+    except ValueError:
+        raise Http404
+    entry = getEntryByIndex(database, int(index))
+    if entry is None or not isinstance(entry.data, (ThermoData, Wilhoit, MultiNASA)):
+        raise Http404
+    units = getUserUnits(request.user)
+    data = getCachedPlotData('thermo', 'json', entry.data, units, lambda: getPlotDataJSON(getThermoPlotData(entry.data, units)))
+    return HttpResponse(data, mimetype='application/json')
+
 def thermoSearch(request):
     """
     A view of a form for specifying a molecule to search the database for
@@ -245,34 +366,111 @@ def getDatabaseTreeAsList(database, entries):
         tree.extend(getDatabaseTreeAsList(database, entry.children))
     return tree
 
+# The temperatures (in K) at which rate coefficients are shown in kinetics trees
+KINETICS_TREE_TEMPERATURES = [300,400,500,600,800,1000,1500,2000]
+
+# The most recent markup for each kinetics tree, by (section, subsection), as
+# (database, html) pairs; the markup is only reused for the same database
+# object, so reloading a family (after its files change) invalidates it
+kineticsTreeCache = {}
+
 def getKineticsTreeHTML(database, section, subsection, entries):
     """
     Return a string of HTML markup used for displaying information about
     kinetics entries in a given `database` as a tree of unordered lists.
+    The markup for the tree starting from the top of the `database` is
+    cached, and only made again once the database is reloaded.
+    """
+    cacheable = entries is database.top
+    if cacheable:
+        cached = kineticsTreeCache.get((section, subsection))
+        if cached is not None and cached[0] is database:
+            return cached[1]
+    html = []
+    writeKineticsTreeHTML(html, section, subsection, entries or [])
+    html = ''.join(html)
+    if cacheable:
+        kineticsTreeCache[(section, subsection)] = (database, html)
+    return html
+
+def writeKineticsTreeHTML(html, section, subsection, entries):
+    """
+    Append the HTML markup for the kinetics `entries` and their descendants,
+    from the given `section` and `subsection` of the database, to the list
+    `html` as a tree of unordered lists.
     """
-    html = ''
     for entry in entries:
         # Write current node
         url = reverse(kineticsEntry, kwargs={'section': section, 'subsection': subsection, 'index': entry.index})
-        html += '<li class="kineticsEntry">\n'
-        html += '<div class="kineticsLabel">'
+        html.append('<li class="kineticsEntry">\n')
+        html.append('<div class="kineticsLabel">')
         if len(entry.children) > 0:
-            html += '<img id="button_{0}" class="treeButton" src="/media/tree-collapse.png"/>'.format(entry.index)
+            html.append('<img id="button_{0}" class="treeButton" src="/media/tree-collapse.png"/>'.format(entry.index))
         else:
-            html += '<img class="treeButton" src="/media/tree-blank.png"/>'
-        html += '<a href="{0}">{1}. {2}</a>\n'.format(url, entry.index, entry.label)
-        html += '<div class="kineticsData">\n'
+            html.append('<img class="treeButton" src="/media/tree-blank.png"/>')
+        html.append('<a href="{0}">{1}. {2}</a>\n'.format(url, entry.index, entry.label))
+        html.append('<div class="kineticsData">\n')
         if entry.data is not None:
-            for T in [300,400,500,600,800,1000,1500,2000]:
-                html += '<span class="kineticsDatum">{0:.2f}</span> '.format(math.log10(entry.data.getRateCoefficient(T, P=1e5)))
-        html += '</div>\n'
+            for logk in numpy.log10(getRateCoefficients(entry.data, KINETICS_TREE_TEMPERATURES, P=1e5)):
+                html.append('<span class="kineticsDatum">{0:.2f}</span> '.format(logk))
+        html.append('</div>\n')
         # Recursively descend children (depth-first)
         if len(entry.children) > 0:
-            html += '<ul id="children_{0}" class="kineticsSubTree">\n'.format(entry.index)
-            html += getKineticsTreeHTML(database, section, subsection, entry.children)
-            html += '</ul>\n'
-        html += '</li>\n'
-    return html
+            html.append('<ul id="children_{0}" class="kineticsSubTree">\n'.format(entry.index))
+            writeKineticsTreeHTML(html, section, subsection, entry.children)
+            html.append('</ul>\n')
+        html.append('</li>\n')
+
+def getKineticsDataFormat(data):
+    """
+    Return a description of the format of the kinetics `data` of an entry in
+    the kinetics database.
+    """
+    if isinstance(data, KineticsData): return 'KineticsData'
+    elif isinstance(data, Arrhenius): return 'Arrhenius'
+    elif isinstance(data, str): return 'Link'
+    elif isinstance(data, ArrheniusEP): return 'ArrheniusEP'
+    elif isinstance(data, MultiKinetics): return 'MultiKinetics'
+    elif isinstance(data, PDepArrhenius): return 'PDepArrhenius'
+    elif isinstance(data, Chebyshev): return 'Chebyshev'
+    elif isinstance(data, Troe): return 'Troe'
+    elif isinstance(data, Lindemann): return 'Lindemann'
+    elif isinstance(data, ThirdBody): return 'ThirdBody'
+    return ''
+
+def getKineticsTablePage(request, database):
+    """
+    Return the page of the entries in the kinetics `database` (a library,
+    rules or depository) requested by `request`, and the sort used.
+    """
+    sortKeys = {
+        'index': lambda entry: (entry.index, entry.label),
+        'label': lambda entry: entry.label.lower(),
+        'format': lambda entry: (getKineticsDataFormat(entry.data), entry.index),
+    }
+    return getTablePage(request, database.entries.values(), sortKeys)
+
+def getKineticsTableRow(section, subsection, entry):
+    """
+    Return a dictionary of the information shown in the row of a kinetics
+    table for the given `entry`. Structures are marked up to be fetched in
+    batches by the ``structures.js`` script.
+    """
+    if 'rules' in subsection:
+        reactants = ' + '.join([getStructureMarkup(reactant, batch=True) for reactant in entry.item.reactants])
+        products = ' + '.join([getStructureMarkup(reactant, batch=True) for reactant in entry.item.products])
+    else:
+        reactants = ' + '.join([moleculeToInfo(reactant, batch=True) for reactant in entry.item.reactants])
+        products = ' + '.join([moleculeToInfo(reactant, batch=True) for reactant in entry.item.products])
+    return {
+        'index': entry.index,
+        'label': entry.label,
+        'url': reverse(kineticsEntry, kwargs={'section': section, 'subsection': subsection, 'index': entry.index}),
+        'dataFormat': getKineticsDataFormat(entry.data),
+        'reactants': reactants,
+        'arrow': '&hArr;' if entry.item.reversible else '&rarr;',
+        'products': products,
+    }
 
 def kinetics(request, section='', subsection=''):
     """
@@ -282,10 +480,8 @@ def kinetics(request, section='', subsection=''):
     if section not in ['libraries', 'families', '']:
         raise Http404
 
-    # Load the kinetics database, if necessary
-    rmgDatabase = loadDatabase('kinetics', section)
-
-    # Determine which subsection we wish to view
+    # Determine which subsection we wish to view (only this part of the
+    # database is loaded, if the rest hasn't been already)
     database = None
     try:
         database = getKineticsDatabase(section, subsection)
@@ -297,70 +493,46 @@ def kinetics(request, section='', subsection=''):
         # A subsection was specified, so render a table of the entries in
         # that part of the database
 
-        isGroupDatabase = False
-
-        # Sort entries by index
-        if database.top is not None and len(database.top) > 0:
-            # If there is a tree in this database, only consider the entries
-            # that are in the tree
-            entries0 = getDatabaseTreeAsList(database, database.top)
+        if isinstance(database, KineticsGroups):
+            # Group trees are shown whole, as a tree, so are not paginated;
+            # only the entries in the tree are considered
+            isGroupDatabase = True
+            entries = getDatabaseTreeAsList(database, database.top or [])
             tree = '<ul class="kineticsTree">\n{0}\n</ul>\n'.format(getKineticsTreeHTML(database, section, subsection, database.top))
+            page = None; sort = None
         else:
-            # If there is not a tree, consider all entries
-            entries0 = database.entries.values()
-            # Sort the entries by index and label
-            entries0.sort(key=lambda entry: (entry.index, entry.label))
+            isGroupDatabase = False
+            page, sort = getKineticsTablePage(request, database)
+            entries = [getKineticsTableRow(section, subsection, entry) for entry in page.object_list]
             tree = ''
             
-        entries = []
-
-        for entry0 in entries0:
-
-            dataFormat = ''
-
-            if isinstance(entry0.data, KineticsData): dataFormat = 'KineticsData'
-            elif isinstance(entry0.data, Arrhenius): dataFormat = 'Arrhenius'
-            elif isinstance(entry0.data, str): dataFormat = 'Link'
-            elif isinstance(entry0.data, ArrheniusEP): dataFormat = 'ArrheniusEP'
-            elif isinstance(entry0.data, MultiKinetics): dataFormat = 'MultiKinetics'
-            elif isinstance(entry0.data, PDepArrhenius): dataFormat = 'PDepArrhenius'
-            elif isinstance(entry0.data, Chebyshev): dataFormat = 'Chebyshev'
-            elif isinstance(entry0.data, Troe): dataFormat = 'Troe'
-            elif isinstance(entry0.data, Lindemann): dataFormat = 'Lindemann'
-            elif isinstance(entry0.data, ThirdBody): dataFormat = 'ThirdBody'
-
-            entry = {
-                'index': entry0.index,
-                'label': entry0.label,
-                'dataFormat': dataFormat,
-            }
-            if isinstance(database, KineticsGroups):
-                isGroupDatabase = True
-                entry['structure'] = getStructureMarkup(entry0.item)
-                entry['parent'] = entry0.parent
-                entry['children'] = entry0.children
-            elif 'rules' in subsection:
-                entry['reactants'] = ' + '.join([getStructureMarkup(reactant) for reactant in entry0.item.reactants])
-                entry['products'] = ' + '.join([getStructureMarkup(reactant) for reactant in entry0.item.products])
-                entry['arrow'] = '&hArr;' if entry0.item.reversible else '&rarr;'
-            else:
-                entry['reactants'] = ' + '.join([moleculeToInfo(reactant) for reactant in entry0.item.reactants])
-                entry['products'] = ' + '.join([moleculeToInfo(reactant) for reactant in entry0.item.products])
-                entry['arrow'] = '&hArr;' if entry0.item.reversible else '&rarr;'
-            
-            entries.append(entry)
-            
-        return render_to_response('kineticsTable.html', {'section': section, 'subsection': subsection, 'databaseName': database.name, 'entries': entries, 'tree': tree, 'isGroupDatabase': isGroupDatabase}, context_instance=RequestContext(request))
+        return render_to_response('kineticsTable.html', {'section': section, 'subsection': subsection, 'databaseName': database.name, 'entries': entries, 'tree': tree, 'isGroupDatabase': isGroupDatabase, 'page': page, 'sort': sort}, context_instance=RequestContext(request))
 
     else:
         # No subsection was specified, so render an outline of the kinetics
-        # database components
-        kineticsLibraries = [(label, library) for label, library in rmgDatabase.kinetics.libraries.iteritems() if subsection in label]
-        kineticsLibraries.sort()
-        kineticsFamilies = [(label, family) for label, family in rmgDatabase.kinetics.families.iteritems() if subsection in label]
-        kineticsFamilies.sort()
+        # database components (which doesn't need them to be loaded)
+        kineticsLibraries = []; kineticsFamilies = []
+        if section in ['libraries', '']:
+            kineticsLibraries = [(label, library) for label, library in getDatabaseSummaries('kinetics', 'libraries') if subsection in label]
+        if section in ['families', '']:
+            kineticsFamilies = [(label, family) for label, family in getDatabaseSummaries('kinetics', 'families') if subsection in label]
         return render_to_response('kinetics.html', {'section': section, 'subsection': subsection, 'kineticsLibraries': kineticsLibraries, 'kineticsFamilies': kineticsFamilies}, context_instance=RequestContext(request))
 
+def kineticsRows(request, section, subsection):
+    """
+    Return the rows of one page of a table of the entries in the given
+    `section` and `subsection` of the kinetics database, as JSON. Group trees
+    are not shown as tables, so have no rows.
+    """
+    try:
+        database = getKineticsDatabase(section, subsection)
+    except ValueError:
+        raise Http404
+    if database is None or isinstance(database, KineticsGroups):
+        raise Http404
+    page, sort = getKineticsTablePage(request, database)
+    return getTableRowsResponse(page, sort, [getKineticsTableRow(section, subsection, entry) for entry in page.object_list])
+
 def getReactionUrl(reaction, family=None):
     """
     Get the URL (for kinetics data) of a reaction.
@@ -404,8 +576,7 @@ def kineticsEntryNewTraining(request, family):
             new_entry = form.cleaned_data['entry']
             
             # determine index for new entry (1 higher than highest)
-            max_index = max(database.entries.keys() or [0])
-            index = max_index + 1
+            index = getMaxEntryIndex(database) + 1
             
             # check it's not already there
             for entry in database.entries.values():
@@ -450,7 +621,7 @@ def kineticsEntryNewTraining(request, family):
                 return HttpResponse(entry_string, mimetype="text/plain")
             if True:
                 # save it
-                database.entries[index] = new_entry
+                setEntry(database, new_entry)
                 path = os.path.join(settings.DATABASE_PATH, 'kinetics', 'families', family, 'training.py' )
                 database.save(path)
                 commit_author = "{0.first_name} {0.last_name} <{0.email}>".format(request.user)
@@ -499,10 +670,8 @@ def kineticsEntryEdit(request, section, subsection, index):
     except ValueError:
         raise Http404
     index = int(index)
-    for entry in database.entries.values():
-        if entry.index == index:
-            break
-    else:
+    entry = getEntryByIndex(database, index)
+    if entry is None:
         raise Http404
     
     if request.method == 'POST':
@@ -539,7 +708,7 @@ def kineticsEntryEdit(request, section, subsection, index):
                               context_instance=RequestContext(request))
             if True:
                 # save it
-                database.entries[index] = new_entry
+                setEntry(database, new_entry)
                 path = os.path.join(settings.DATABASE_PATH, 'kinetics', section, subsection + '.py' )
                 database.save(path)
                 commit_author = "{0.first_name} {0.last_name} <{0.email}>".format(request.user)
@@ -651,19 +820,14 @@ def kineticsEntry(request, section, subsection, index):
     A view for showing an entry in a kinetics database.
     """
 
-    # Load the kinetics database, if necessary
-    loadDatabase('kinetics', section)
-
-    # Determine the entry we wish to view
+    # Determine the entry we wish to view (loading it if necessary)
     try:
         database = getKineticsDatabase(section, subsection)
     except ValueError:
         raise Http404
     index = int(index)
-    for entry in database.entries.values():
-        if entry.index == index:
-            break
-    else:
+    entry = getEntryByIndex(database, index)
+    if entry is None:
         raise Http404
         
     reference = entry.reference
@@ -717,6 +881,22 @@ def kineticsEntry(request, section, subsection, index):
                                   context_instance=RequestContext(request))
 
 
+def kineticsEntryPlot(request, section, subsection, index):
+    """
+    A view returning the data plotted on the page of an entry in a kinetics
+    database, as JSON, so that the page can fetch it after loading.
+    """
+    try:
+        database = getKineticsDatabase(section, subsection)
+    except ValueError:
+        raise Http404
+    entry = getEntryByIndex(database, int(index))
+    if entry is None or entry.data is None:
+        raise Http404
+    units = getUserUnits(request.user)
+    data = getCachedPlotData('kinetics', 'json', entry.data, units, lambda: getPlotDataJSON(getRateCoefficientPlotData(entry.data, units)))
+    return HttpResponse(data, mimetype='application/json')
+
 def kineticsGroupEstimateEntry(request, family, reactant1, product1, reactant2='', reactant3='', product2='', product3=''):
     """
     View a kinetics group estimate as an entry.
@@ -750,7 +930,7 @@ def kineticsGroupEstimateEntry(request, family, reactant1, product1, reactant2='
         productList.append(moleculeFromURL(product3))    
     
     # Search for the corresponding reaction(s)
-    reactionList, empty_list = generateReactions(database, reactantList, productList, only_families=[family])
+    reactionList, empty_list, rmgJavaError = generateReactions(database, reactantList, productList, only_families=[family])
     
     kineticsDataList = []
     
@@ -906,26 +1086,17 @@ def kineticsResults(request, reactant1, reactant2='', reactant3='', product1='',
         productList = None
     
     # Search for the corresponding reaction(s)
-    reactionList, rmgJavaReactionList = generateReactions(database, reactantList, productList)
+    reactionList, rmgJavaReactionList, rmgJavaError = generateReactions(database, reactantList, productList)
     reactionList.extend(rmgJavaReactionList)
         
     # Remove duplicates from the list and count the number of results
-    uniqueReactionList = []
-    uniqueReactionCount = []
-    for reaction in reactionList:
-        for i, rxn in enumerate(uniqueReactionList):
-            if reaction.isIsomorphic(rxn):
-                uniqueReactionCount[i] += 1
-                break
-        else:
-            uniqueReactionList.append(reaction)
-            uniqueReactionCount.append(1)
+    uniqueReactionList, uniqueReactionCount = getUniqueReactions(reactionList)
     
     reactionDataList = []
     for reaction, count in zip(uniqueReactionList, uniqueReactionCount):
-        reactants = ' + '.join([moleculeToInfo(reactant) for reactant in reaction.reactants])
+        reactants = ' + '.join([moleculeToInfo(reactant, batch=True) for reactant in reaction.reactants])
         arrow = '&hArr;' if reaction.reversible else '&rarr;'
-        products = ' + '.join([moleculeToInfo(reactant) for reactant in reaction.products])
+        products = ' + '.join([moleculeToInfo(reactant, batch=True) for reactant in reaction.products])
         reactionUrl = getReactionUrl(reaction)
         
         forward = reactionHasReactants(reaction, reactantList)
@@ -934,7 +1105,7 @@ def kineticsResults(request, reactant1, reactant2='', reactant3='', product1='',
         else:
             reactionDataList.append([products, arrow, reactants, count, reactionUrl])
         
-    return render_to_response('kineticsResults.html', {'reactionDataList': reactionDataList}, context_instance=RequestContext(request))
+    return render_to_response('kineticsResults.html', {'reactionDataList': reactionDataList, 'rmgJavaError': rmgJavaError}, context_instance=RequestContext(request))
 
 def kineticsData(request, reactant1, reactant2='', reactant3='', product1='', product2='', product3=''):
     """
@@ -970,7 +1141,7 @@ def kineticsData(request, reactant1, reactant2='', reactant3='', product1='', pr
         productList = None
 
     # Search for the corresponding reaction(s)
-    reactionList, rmgJavaReactionList = generateReactions(database, reactantList, productList)
+    reactionList, rmgJavaReactionList, rmgJavaError = generateReactions(database, reactantList, productList)
     reactionList.extend(rmgJavaReactionList)
     
     kineticsDataList = []
@@ -1034,6 +1205,7 @@ def kineticsData(request, reactant1, reactant2='', reactant3='', product1='', pr
                                                     'reverseReactionURL':reverseReactionURL,
                                                     'form':form,
                                                     'temperature':temperature,
+                                                    'rmgJavaError':rmgJavaError,
                                                     },
                                              context_instance=RequestContext(request))
 
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+################################################################################
+#
+#	RMG Website - A Django-powered website for Reaction Mechanism Generator
+#
+#	Copyright (c) 2011 Prof. William H. Green (whgreen@mit.edu) and the
+#	RMG Team (rmg_dev@mit.edu)
+#
+#	Permission is hereby granted, free of charge, to any person obtaining a
+#	copy of this software and associated documentation files (the 'Software'),
+#	to deal in the Software without restriction, including without limitation
+#	the rights to use, copy, modify, merge, publish, distribute, sublicense,
+#	and/or sell copies of the Software, and to permit persons to whom the
+#	Software is furnished to do so, subject to the following conditions:
+#
+#	The above copyright notice and this permission notice shall be included in
+#	all copies or substantial portions of the Software.
+#
+#	THE SOFTWARE IS PROVIDED 'AS IS', WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#	IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#	FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#	AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#	LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+#	FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#	DEALINGS IN THE SOFTWARE.
+#
+################################################################################
+
+"""
+This module contains a class that watches the RMG database files for changes
+in the background, so that views can tell whether part of the database needs
+to be reloaded without examining every file on every request.
+"""
+
+import os
+import sys
+import time
+import threading
+
+try:
+    import pyinotify
+except ImportError:
+    pyinotify = None
+
+################################################################################
+
+class DatabaseWatcher(object):
+    """
+    Keeps a set of the files that have been modified, created or removed in
+    each of the watched directories `dirpaths` (and their subdirectories).
+    Changes are reported by inotify if the pyinotify package is available.
+    Otherwise a background thread polls the directories every `interval`
+    seconds by calling `poll`, a function that returns the set of modified
+    files in a given directory.
+
+    A watcher only runs in the process that started it, since its thread does
+    not survive a fork; use :meth:`isRunning` to check.
+    """
+
+    def __init__(self, dirpaths, poll, interval=5.0):
+        self.dirpaths = list(dirpaths)
+        self.poll = poll
+        self.interval = interval
+        self.pid = None
+        self.notifier = None
+        self.thread = None
+        self.lock = threading.Lock()
+        self.modified = dict([(dirpath, set()) for dirpath in self.dirpaths])
+
+    def start(self):
+        """
+        Start watching for changes. Any changes made before the watcher was
+        started (e.g. by another process) are picked up by an initial poll.
+        """
+        self.pid = os.getpid()
+        for dirpath in self.dirpaths:
+            self.add(dirpath, self.poll(dirpath))
+        if pyinotify is not None:
+            try:
+                self.__startNotifier()
+                return
+            except (pyinotify.WatchManagerError, OSError), e:
+                print >> sys.stderr, 'Unable to watch the RMG database with inotify ({0}); polling instead.'.format(e)
+                sys.stderr.flush()
+        self.thread = threading.Thread(target=self.__pollForever, name='DatabaseWatcher')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def __startNotifier(self):
+        """
+        Start a pyinotify notifier thread that reports changes to the watched
+        directories.
+        """
+        watchManager = pyinotify.WatchManager()
+        mask = pyinotify.IN_CLOSE_WRITE | pyinotify.IN_CREATE | pyinotify.IN_DELETE | pyinotify.IN_MOVED_FROM | pyinotify.IN_MOVED_TO
+        notifier = pyinotify.ThreadedNotifier(watchManager, _EventHandler(watcher=self))
+        notifier.daemon = True
+        for dirpath in self.dirpaths:
+            watchManager.add_watch(dirpath, mask, rec=True, auto_add=True, quiet=False)
+        notifier.start()
+        self.notifier = notifier
+
+    def __pollForever(self):
+        """
+        Poll each of the watched directories every `interval` seconds.
+        """
+        while True:
+            time.sleep(self.interval)
+            for dirpath in self.dirpaths:
+                try:
+                    self.add(dirpath, self.poll(dirpath))
+                except OSError:
+                    # A file was probably removed while we were looking at it;
+                    # we'll see the result on the next poll
+                    pass
+                except Exception, e:
+                    # Keep polling whatever goes wrong, since nothing restarts
+                    # this thread if it dies
+                    print >> sys.stderr, 'Error while polling {0} for changes: {1!r}'.format(dirpath, e)
+                    sys.stderr.flush()
+
+    def isRunning(self):
+        """
+        Return ``True`` if the watcher is running in the current process.
+        """
+        return self.pid == os.getpid()
+
+    def add(self, dirpath, paths):
+        """
+        Record the files `paths` in the watched directory `dirpath` as
+        modified.
+        """
+        if paths:
+            with self.lock:
+                self.modified[dirpath].update(paths)
+
+    def addPath(self, path):
+        """
+        Record the file `path` as modified, if it is in one of the watched
+        directories.
+        """
+        for dirpath in self.dirpaths:
+            if path.startswith(dirpath + os.sep):
+                self.add(dirpath, [path])
+                break
+
+    def isModified(self, dirpath):
+        """
+        Return ``True`` if any files in the watched directory `dirpath` have
+        been modified since they were last discarded.
+        """
+        return len(self.modified[dirpath]) > 0
+
+    def getModified(self, dirpath):
+        """
+        Return a set of the files in the watched directory `dirpath` that have
+        been modified since they were last discarded.
+        """
+        with self.lock:
+            return set(self.modified[dirpath])
+
+    def discard(self, dirpath, paths):
+        """
+        Stop reporting the files `paths` in the watched directory `dirpath` as
+        modified. Call this *before* reloading those files, so that any
+        further changes made while reloading are not lost.
+        """
+        with self.lock:
+            self.modified[dirpath].difference_update(paths)
+
+if pyinotify is not None:
+    class _EventHandler(pyinotify.ProcessEvent):
+        """
+        Passes the files named in inotify events on to a watcher.
+        """
+        def my_init(self, watcher):
+            self.watcher = watcher
+
+        def process_default(self, event):
+            if not event.dir:
+                self.watcher.addPath(event.pathname)
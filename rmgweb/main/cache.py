@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+################################################################################
+#
+#	RMG Website - A Django-powered website for Reaction Mechanism Generator
+#
+#	Copyright (c) 2011 Prof. William H. Green (whgreen@mit.edu) and the
+#	RMG Team (rmg_dev@mit.edu)
+#
+#	Permission is hereby granted, free of charge, to any person obtaining a
+#	copy of this software and associated documentation files (the 'Software'),
+#	to deal in the Software without restriction, including without limitation
+#	the rights to use, copy, modify, merge, publish, distribute, sublicense,
+#	and/or sell copies of the Software, and to permit persons to whom the
+#	Software is furnished to do so, subject to the following conditions:
+#
+#	The above copyright notice and this permission notice shall be included in
+#	all copies or substantial portions of the Software.
+#
+#	THE SOFTWARE IS PROVIDED 'AS IS', WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#	IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#	FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#	AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#	LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+#	FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#	DEALINGS IN THE SOFTWARE.
+#
+################################################################################
+
+
+"""
+This module contains simple caches for the results of expensive calculations,
+with least-recently-used eviction and an optional timeout. The
+:class:`MemoryCache` keeps results in the memory of the current process, while
+the :class:`SQLiteCache` keeps them in a SQLite database file that can be
+shared by all of the website's processes.
+"""
+
+import os
+import os.path
+import time
+import threading
+import cPickle
+from cStringIO import StringIO
+import sqlite3
+from collections import OrderedDict
+
+################################################################################
+
+def dumps(value, persistentId=None):
+    """
+    Return the given `value` pickled, using the function `persistentId` (if
+    given) to pickle some objects by reference, as described for the
+    :mod:`pickle` module.
+    """
+    f = StringIO()
+    pickler = cPickle.Pickler(f, cPickle.HIGHEST_PROTOCOL)
+    if persistentId is not None:
+        pickler.persistent_id = persistentId
+    pickler.dump(value)
+    return f.getvalue()
+
+def loads(data, persistentLoad=None):
+    """
+    Return the value unpickled from `data`, using the function
+    `persistentLoad` (if given) to find the objects pickled by reference.
+    """
+    unpickler = cPickle.Unpickler(StringIO(data))
+    if persistentLoad is not None:
+        unpickler.persistent_load = persistentLoad
+    return unpickler.load()
+
+################################################################################
+
+class MemoryCache(object):
+    """
+    A cache of up to `maxEntries` values in the memory of the current process.
+    Values expire `timeout` seconds after they are set, or never if `timeout`
+    is ``None``. The cache is safe to use from several threads at once. Values
+    are returned as stored, not copied, so should not be modified.
+    """
+
+    def __init__(self, maxEntries=1000, timeout=None):
+        self.maxEntries = maxEntries
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        """
+        Return the value with the given `key`, or `default` if there is no
+        such value or it has expired.
+        """
+        with self.lock:
+            item = self.entries.pop(key, None)
+            if item is None or (item[0] is not None and item[0] < time.time()):
+                self.misses += 1
+                return default
+            # Move the value to the end of the list, as most recently used
+            self.entries[key] = item
+            self.hits += 1
+            return item[1]
+
+    def set(self, key, value, timeout=None):
+        """
+        Store the given `value` with the given `key`, expiring after `timeout`
+        seconds (the cache's own timeout by default). If the cache is full,
+        the least recently used value is discarded.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        expires = time.time() + timeout if timeout else None
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = (expires, value)
+            while len(self.entries) > self.maxEntries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        """
+        Discard the value with the given `key`, if any.
+        """
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        """
+        Discard all of the values in the cache.
+        """
+        with self.lock:
+            self.entries.clear()
+
+    def getStats(self):
+        """
+        Return a dictionary of statistics about the use of the cache.
+        """
+        return {
+            'backend': 'memory',
+            'entries': len(self.entries),
+            'maxEntries': self.maxEntries,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+################################################################################
+
+class SQLiteCache(object):
+    """
+    A cache of up to `maxEntries` values stored in the SQLite database at
+    `path`, which can be shared by several processes. Values expire `timeout`
+    seconds after they are set, or never if `timeout` is ``None``.
+    
+    Values are pickled, using the optional functions `persistentId` and
+    `persistentLoad` (see the :mod:`pickle` module) to store references to
+    objects that should not be copied, such as parts of the RMG database.
+    Values that can't be unpickled are treated as missing.
+    """
+
+    def __init__(self, path, maxEntries=1000, timeout=None, persistentId=None, persistentLoad=None):
+        self.path = path
+        self.maxEntries = maxEntries
+        self.timeout = timeout
+        self.persistentId = persistentId
+        self.persistentLoad = persistentLoad
+        self.local = threading.local()
+        self.hits = 0
+        self.misses = 0
+
+    def getConnection(self):
+        """
+        Return a connection to the SQLite database for the current thread,
+        creating the database if necessary.
+        """
+        connection = getattr(self.local, 'connection', None)
+        if connection is None or self.local.pid != os.getpid():
+            dirname = os.path.dirname(self.path)
+            if dirname and not os.path.isdir(dirname):
+                try:
+                    os.makedirs(dirname)
+                except OSError:
+                    if not os.path.isdir(dirname): raise
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, expires REAL, used REAL)')
+            connection.commit()
+            self.local.connection = connection
+            self.local.pid = os.getpid()
+        return connection
+
+    def dumps(self, value):
+        """
+        Return the given `value` pickled.
+        """
+        return dumps(value, self.persistentId)
+
+    def loads(self, data):
+        """
+        Return the value unpickled from `data`.
+        """
+        return loads(data, self.persistentLoad)
+
+    def get(self, key, default=None):
+        """
+        Return the value with the given `key`, or `default` if there is no
+        such value or it has expired.
+        """
+        connection = self.getConnection()
+        row = connection.execute('SELECT value, expires FROM cache WHERE key = ?', (key,)).fetchone()
+        if row is not None and (row[1] is None or row[1] >= time.time()):
+            try:
+                value = self.loads(str(row[0]))
+            except Exception:
+                # e.g. the value refers to part of the database that is gone
+                value = None
+            else:
+                connection.execute('UPDATE cache SET used = ? WHERE key = ?', (time.time(), key))
+                connection.commit()
+                self.hits += 1
+                return value
+        if row is not None:
+            self.delete(key)
+        self.misses += 1
+        return default
+
+    def set(self, key, value, timeout=None):
+        """
+        Store the given `value` with the given `key`, expiring after `timeout`
+        seconds (the cache's own timeout by default). If the cache is full,
+        the least recently used values are discarded.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        expires = time.time() + timeout if timeout else None
+        data = sqlite3.Binary(self.dumps(value))
+        connection = self.getConnection()
+        connection.execute('INSERT OR REPLACE INTO cache (key, value, expires, used) VALUES (?, ?, ?, ?)', (key, data, expires, time.time()))
+        connection.execute('DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY used DESC LIMIT -1 OFFSET ?)', (self.maxEntries,))
+        connection.commit()
+
+    def delete(self, key):
+        """
+        Discard the value with the given `key`, if any.
+        """
+        connection = self.getConnection()
+        connection.execute('DELETE FROM cache WHERE key = ?', (key,))
+        connection.commit()
+
+    def clear(self):
+        """
+        Discard all of the values in the cache.
+        """
+        connection = self.getConnection()
+        connection.execute('DELETE FROM cache')
+        connection.commit()
+
+    def getStats(self):
+        """
+        Return a dictionary of statistics about the use of the cache. The
+        numbers of hits and misses are for the current process only.
+        """
+        return {
+            'backend': 'sqlite',
+            'entries': self.getConnection().execute('SELECT COUNT(*) FROM cache').fetchone()[0],
+            'maxEntries': self.maxEntries,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+################################################################################
+
+def getCache(config, **kwargs):
+    """
+    Return a new cache as described by the dictionary `config`, or ``None``
+    if `config` is empty or its ``BACKEND`` is ``None``. The ``BACKEND`` is
+    either ``'memory'`` for a :class:`MemoryCache` or ``'sqlite'`` for a
+    :class:`SQLiteCache` stored at ``PATH``. The optional ``MAX_ENTRIES`` and
+    ``TIMEOUT`` set the size of the cache and how long values last. Any other
+    keyword arguments are passed on to the cache.
+    """
+    if not config or not config.get('BACKEND'):
+        return None
+    backend = config['BACKEND']
+    maxEntries = config.get('MAX_ENTRIES', 1000)
+    timeout = config.get('TIMEOUT', None)
+    if backend == 'memory':
+        return MemoryCache(maxEntries, timeout)
+    elif backend == 'sqlite':
+        return SQLiteCache(config['PATH'], maxEntries, timeout, **kwargs)
+    raise ValueError('Invalid cache backend "{0}".'.format(backend))
@@ -0,0 +1,582 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+################################################################################
+#
+#	RMG Website - A Django-powered website for Reaction Mechanism Generator
+#
+#	Copyright (c) 2011 Prof. William H. Green (whgreen@mit.edu) and the
+#	RMG Team (rmg_dev@mit.edu)
+#
+#	Permission is hereby granted, free of charge, to any person obtaining a
+#	copy of this software and associated documentation files (the 'Software'),
+#	to deal in the Software without restriction, including without limitation
+#	the rights to use, copy, modify, merge, publish, distribute, sublicense,
+#	and/or sell copies of the Software, and to permit persons to whom the
+#	Software is furnished to do so, subject to the following conditions:
+#
+#	The above copyright notice and this permission notice shall be included in
+#	all copies or substantial portions of the Software.
+#
+#	THE SOFTWARE IS PROVIDED 'AS IS', WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#	IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#	FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#	AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#	LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+#	FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#	DEALINGS IN THE SOFTWARE.
+#
+################################################################################
+
+
+"""
+This module contains functions for drawing images of molecules and groups as
+PNG or SVG, and a simple on-disk cache for those images, so that each one only
+needs to be drawn once.
+"""
+
+import os
+import os.path
+import re
+import hashlib
+import tempfile
+import base64
+import StringIO
+
+import settings
+
+# The MIME type of each of the image formats we can draw
+IMAGE_MIMETYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+################################################################################
+
+class ImageCache(object):
+    """
+    A cache of images stored as files in the directory `path`, each named by
+    a hash of its key and the file `extension`. When the files take up more
+    than `maxSize` bytes, the least recently used ones are removed. The cache
+    may be shared by several processes, and by caches of images of different
+    formats.
+    """
+
+    def __init__(self, path, maxSize=100*1024*1024, extension='png'):
+        self.path = path
+        self.maxSize = maxSize
+        self.extension = extension
+        self.size = None
+
+    def getHash(self, key):
+        """
+        Return the hash of `key` used to name its file, which is also suitable
+        for use as an HTTP ``ETag``.
+        """
+        if isinstance(key, unicode):
+            key = key.encode('utf-8')
+        return hashlib.sha1(key).hexdigest()
+
+    def getPath(self, key):
+        """
+        Return the path of the file used to store the image with the given
+        `key`.
+        """
+        digest = self.getHash(key)
+        return os.path.join(self.path, digest[0:2], digest + '.' + self.extension)
+
+    def get(self, key, check=None):
+        """
+        Return the image data with the given `key`, or ``None`` if it is not
+        in the cache. If `check` is given, it is called with the identity
+        stored along with the image (see :meth:`set`), and the image is only
+        returned if the result is ``True``.
+        """
+        path = self.getPath(key)
+        try:
+            if check is not None:
+                f = open(path + '.id', 'rb')
+                identity = f.read()
+                f.close()
+                if not check(identity):
+                    return None
+            f = open(path, 'rb')
+            data = f.read()
+            f.close()
+        except IOError:
+            return None
+        try:
+            # Mark the file as recently used
+            os.utime(path, None)
+        except OSError:
+            pass
+        return data
+
+    def set(self, key, data, identity=None):
+        """
+        Store the image `data` with the given `key` in the cache. If the key
+        may be shared by different images, a string `identity` telling them
+        apart should be given, which is stored with the image to be checked
+        by :meth:`get`.
+        """
+        path = self.getPath(key)
+        dirname = os.path.dirname(path)
+        if not os.path.isdir(dirname):
+            try:
+                os.makedirs(dirname)
+            except OSError:
+                # Perhaps another process has just made it
+                if not os.path.isdir(dirname): raise
+        files = [(path, data)]
+        if identity is not None:
+            files.append((path + '.id', identity))
+        for filePath, fileData in files:
+            # Write to a temporary file first so that other processes never
+            # see a partially-written file
+            fd, tempPath = tempfile.mkstemp(dir=dirname)
+            f = os.fdopen(fd, 'wb')
+            f.write(fileData)
+            f.close()
+            os.rename(tempPath, filePath)
+
+        if self.size is None:
+            self.size = self.getSize()
+        else:
+            self.size += sum([len(fileData) for filePath, fileData in files])
+        if self.size > self.maxSize:
+            self.prune()
+
+    def getFiles(self):
+        """
+        Return a list of (time last used, size, path) for each file in the
+        cache.
+        """
+        files = []
+        for dirpath, dirnames, filenames in os.walk(self.path):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def getSize(self):
+        """
+        Return the total size in bytes of the files in the cache.
+        """
+        return sum([size for mtime, size, path in self.getFiles()])
+
+    def prune(self):
+        """
+        Remove the least recently used files from the cache until it takes up
+        no more than 90% of `maxSize`, leaving some room for new images.
+        """
+        files = sorted(self.getFiles())
+        self.size = sum([size for mtime, size, path in files])
+        for mtime, size, path in files:
+            if self.size <= 0.9 * self.maxSize:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                # Perhaps another process has just removed it
+                pass
+            self.size -= size
+
+################################################################################
+
+# The caches of drawn images, by image format
+imageCaches = dict([(format, ImageCache(settings.IMAGE_CACHE_PATH, settings.IMAGE_CACHE_SIZE, extension=format)) for format in IMAGE_MIMETYPES])
+
+def drawMoleculeImage(molecule, format='png'):
+    """
+    Draw the given `molecule` and return the image data in the given
+    `format`, either ``'png'`` or ``'svg'``.
+    """
+    from rmgpy.molecule_draw import drawMolecule
+
+    if format == 'png':
+        surface, cr, rect = drawMolecule(molecule, surface='png')
+        output = StringIO.StringIO()
+        surface.write_to_png(output)
+        return output.getvalue()
+    elif format == 'svg':
+        # The SVG surface can only be written to a file
+        fd, path = tempfile.mkstemp(suffix='.svg')
+        os.close(fd)
+        try:
+            drawMolecule(molecule, path=path, surface='svg')
+            f = open(path, 'rb')
+            data = f.read()
+            f.close()
+        finally:
+            os.remove(path)
+        return data
+    raise ValueError('Invalid image format "{0}".'.format(format))
+
+def getGroupGraph(adjlist):
+    """
+    Return the labels of the nodes and a list of the edges, as (index1,
+    index2, label) tuples, of the graph used to draw the group with the given
+    adjacency list `adjlist`.
+    """
+    from rmgpy.group import Group
+
+    pattern = Group().fromAdjacencyList(adjlist)
+
+    nodes = []
+    for atom in pattern.atoms:
+        atomType = '%s ' % atom.label if atom.label != '' else ''
+        atomType += ','.join([atomType.label for atomType in atom.atomType])
+        nodes.append(atomType)
+    edges = []
+    for atom1, bonds in pattern.bonds.iteritems():
+        for atom2, bond in bonds.iteritems():
+            index1 = pattern.atoms.index(atom1)
+            index2 = pattern.atoms.index(atom2)
+            if index1 < index2:
+                edges.append((index1, index2, ','.join([order for order in bond.order])))
+    return nodes, edges
+
+def getGraphLayout(numNodes, edges, iterations=200):
+    """
+    Return an array of the positions of `numNodes` nodes connected by the
+    given `edges` ((index1, index2, label) tuples), found using the
+    Fruchterman-Reingold spring layout. The nodes start evenly spaced on a
+    circle, so the layout is always the same for the same graph. The
+    positions are scaled so that connected nodes are about one unit apart.
+    """
+    import numpy
+
+    if numNodes == 0:
+        return numpy.zeros((0,2))
+    elif numNodes == 1:
+        return numpy.zeros((1,2))
+
+    adjacency = numpy.zeros((numNodes,numNodes))
+    for index1, index2, label in edges:
+        adjacency[index1,index2] = adjacency[index2,index1] = 1
+
+    angles = 2 * numpy.pi * numpy.arange(numNodes) / numNodes
+    positions = numpy.array([numpy.cos(angles), numpy.sin(angles)]).T
+    k = 2 * numpy.sin(numpy.pi / numNodes)
+    temperature = 0.1 * numNodes
+    for iteration in range(iterations):
+        delta = positions[:,numpy.newaxis,:] - positions[numpy.newaxis,:,:]
+        distance = numpy.sqrt((delta**2).sum(axis=2))
+        numpy.fill_diagonal(distance, 1.0)
+        distance = numpy.maximum(distance, 0.01)
+        # Every pair of nodes repels, and connected nodes also attract
+        strength = k * k / distance**2 - adjacency * distance / k
+        numpy.fill_diagonal(strength, 0.0)
+        # A weak pull towards the center keeps disconnected parts together
+        displacement = (strength[:,:,numpy.newaxis] * delta).sum(axis=1) - 0.5 * positions / k
+        length = numpy.maximum(numpy.sqrt((displacement**2).sum(axis=1)), 1e-9)
+        positions += displacement / length[:,numpy.newaxis] * numpy.minimum(length, temperature)[:,numpy.newaxis]
+        temperature *= 0.97
+
+    if edges:
+        bondLength = numpy.mean([numpy.sqrt(((positions[index1] - positions[index2])**2).sum()) for index1, index2, label in edges])
+    else:
+        bondLength = k
+    return (positions - positions.mean(axis=0)) / bondLength
+
+def drawGroupImageCairo(adjlist, format='png'):
+    """
+    Draw the group with the given adjacency list `adjlist` using Cairo, and
+    return the image data in the given `format`, either ``'png'`` or
+    ``'svg'``. This lays out and draws the graph within this process.
+    """
+    import cairo
+
+    nodes, edges = getGroupGraph(adjlist)
+    positions = getGraphLayout(len(nodes), edges) * 80.0
+
+    fontSize = 12.0
+    def setFont(cr):
+        cr.select_font_face('Helvetica', cairo.FONT_SLANT_NORMAL, cairo.FONT_WEIGHT_NORMAL)
+        cr.set_font_size(fontSize)
+
+    # Measure the labels to find the size of each node and of the image
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, 1, 1)
+    cr = cairo.Context(surface)
+    setFont(cr)
+    radii = []
+    for label in nodes:
+        xBearing, yBearing, width, height, xAdvance, yAdvance = cr.text_extents(label)
+        radii.append((xAdvance / 2 + 8, fontSize / 2 + 6))
+    padding = 4
+    left = min([x - rx for (x, y), (rx, ry) in zip(positions, radii)]) - padding
+    right = max([x + rx for (x, y), (rx, ry) in zip(positions, radii)]) + padding
+    top = min([y - ry for (x, y), (rx, ry) in zip(positions, radii)]) - padding
+    bottom = max([y + ry for (x, y), (rx, ry) in zip(positions, radii)]) + padding
+    width = int(right - left + 1); height = int(bottom - top + 1)
+
+    output = StringIO.StringIO()
+    if format == 'png':
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+    elif format == 'svg':
+        surface = cairo.SVGSurface(output, width, height)
+    else:
+        raise ValueError('Invalid image format "{0}".'.format(format))
+    cr = cairo.Context(surface)
+    setFont(cr)
+    cr.translate(-left, -top)
+    cr.set_source_rgb(1, 1, 1)
+    cr.paint()
+    cr.set_line_width(1.0)
+
+    def drawText(text, x, y, background=False):
+        xBearing, yBearing, textWidth, textHeight, xAdvance, yAdvance = cr.text_extents(text)
+        if background:
+            cr.set_source_rgb(1, 1, 1)
+            cr.rectangle(x - xAdvance / 2 - 1, y - fontSize / 2, xAdvance + 2, fontSize)
+            cr.fill()
+        cr.set_source_rgb(0, 0, 0)
+        cr.move_to(x - xAdvance / 2, y - yBearing - textHeight / 2)
+        cr.show_text(text)
+
+    for index1, index2, label in edges:
+        x1, y1 = positions[index1]; x2, y2 = positions[index2]
+        cr.set_source_rgb(0, 0, 0)
+        cr.move_to(x1, y1)
+        cr.line_to(x2, y2)
+        cr.stroke()
+        drawText(label, (x1 + x2) / 2, (y1 + y2) / 2, background=True)
+
+    for label, (x, y), (rx, ry) in zip(nodes, positions, radii):
+        cr.save()
+        cr.translate(x, y)
+        cr.scale(rx, ry)
+        cr.arc(0, 0, 1, 0, 2 * 3.141592653589793)
+        cr.restore()
+        cr.set_source_rgb(1, 1, 1)
+        cr.fill_preserve()
+        cr.set_source_rgb(0, 0, 0)
+        cr.stroke()
+        drawText(label, x, y)
+
+    if format == 'png':
+        surface.write_to_png(output)
+    else:
+        surface.finish()
+    return output.getvalue()
+
+def drawGroupImageGraphviz(adjlist, format='png'):
+    """
+    Draw the group with the given adjacency list `adjlist` using Graphviz,
+    and return the image data in the given `format`, either ``'png'`` or
+    ``'svg'``. This runs the Graphviz ``neato`` program.
+    """
+    import pydot
+
+    if format not in IMAGE_MIMETYPES:
+        raise ValueError('Invalid image format "{0}".'.format(format))
+
+    nodes, edges = getGroupGraph(adjlist)
+
+    graph = pydot.Dot(graph_type='graph', dpi=52)
+    for index, label in enumerate(nodes):
+        graph.add_node(pydot.Node(name='%i' % (index+1), label=label, fontname='Helvetica', fontsize=16))
+    for index1, index2, label in edges:
+        graph.add_edge(pydot.Edge(
+            src = '%i' % (index1+1),
+            dst = '%i' % (index2+1),
+            label = label,
+            fontname='Helvetica', fontsize = 16,
+        ))
+
+    return graph.create(prog='neato', format=format)
+
+# The functions that can be used to draw groups, by name
+GROUP_RENDERERS = {
+    'cairo': drawGroupImageCairo,
+    'neato': drawGroupImageGraphviz,
+}
+
+def getGroupRenderer():
+    """
+    Return the name of the renderer used to draw groups: the one given by
+    ``settings.GROUP_IMAGE_RENDERER``, unless that is Cairo and Cairo is not
+    installed, in which case Graphviz is used.
+    """
+    renderer = settings.GROUP_IMAGE_RENDERER
+    if renderer == 'cairo':
+        try:
+            import cairo
+        except ImportError:
+            renderer = 'neato'
+    return renderer
+
+def drawGroupImage(adjlist, format='png', renderer=None):
+    """
+    Draw the group with the given adjacency list `adjlist` and return the
+    image data in the given `format`, either ``'png'`` or ``'svg'``, using
+    the given `renderer` (see :func:`getGroupRenderer` for the default).
+    """
+    return GROUP_RENDERERS[renderer or getGroupRenderer()](adjlist, format)
+
+def getMoleculeImageKey(molecule):
+    """
+    Return the cache key for images of the given `molecule`. Very
+    occasionally different molecules share a key (see
+    :func:`rmgweb.main.tools.getMoleculeKey`), so images of molecules are
+    cached with their adjacency list and checked with
+    :func:`isSameMoleculeImage` before being used.
+    """
+    from tools import getMoleculeKey
+    return 'molecule:' + getMoleculeKey(molecule)
+
+def isSameMoleculeImage(molecule, adjlist):
+    """
+    Return ``True`` if the molecule with the adjacency list `adjlist` stored
+    with a cached image is isomorphic to the given `molecule`, so that the
+    image is one of `molecule`.
+    """
+    from rmgpy.molecule import Molecule
+    try:
+        return Molecule().fromAdjacencyList(adjlist).isIsomorphic(molecule)
+    except Exception:
+        # Unreadable, e.g. written by an older version of the website
+        return False
+
+def getGroupImageKey(adjlist):
+    """
+    Return the cache key for images of the group with the given adjacency
+    list `adjlist`. Images drawn by different renderers are kept apart.
+    """
+    return 'group:{0}:{1}'.format(getGroupRenderer(), adjlist.strip())
+
+def getCachedImage(key, format, draw, identity=None, check=None):
+    """
+    Return the image data in the given `format` with the given cache `key`,
+    either from the cache or by calling `draw`, which should return the image
+    data, and adding the result to the cache. If given, the string `identity`
+    is stored with the image, and `check` is called with it to make sure a
+    cached image is the one wanted (see :meth:`ImageCache.get`).
+    """
+    cache = imageCaches[format]
+    data = cache.get(key, check)
+    if data is None:
+        data = draw()
+        cache.set(key, data, identity)
+    return data
+
+def getMoleculeImage(molecule, format='png'):
+    """
+    Return an image of the given `molecule` in the given `format`, drawing it
+    only if it is not in the cache.
+    """
+    return getCachedImage(getMoleculeImageKey(molecule), format, lambda: drawMoleculeImage(molecule, format),
+        molecule.toAdjacencyList(), lambda adjlist: isSameMoleculeImage(molecule, adjlist))
+
+def getGroupImage(adjlist, format='png'):
+    """
+    Return an image of the group with the given adjacency list `adjlist` in
+    the given `format`, drawing it only if it is not in the cache.
+    """
+    return getCachedImage(getGroupImageKey(adjlist), format, lambda: drawGroupImage(adjlist, format))
+
+def getStructureImageKey(kind, adjlist):
+    """
+    Return the cache key for images of the given `kind` (either
+    ``'molecule'`` or ``'group'``) with the given adjacency list `adjlist`,
+    along with a function that returns such an image in a given format,
+    from the cache or by drawing it.
+    """
+    from rmgpy.molecule import Molecule
+    if kind == 'molecule':
+        molecule = Molecule().fromAdjacencyList(adjlist)
+        return getMoleculeImageKey(molecule), lambda format: getMoleculeImage(molecule, format)
+    elif kind == 'group':
+        return getGroupImageKey(adjlist), lambda format: getGroupImage(adjlist, format)
+    else:
+        raise ValueError('Invalid image kind "{0}".'.format(kind))
+
+def getImageDataURI(kind, adjlist, format='png'):
+    """
+    Return a ``data:`` URI containing the image in the given `format` of the
+    given `kind` (either ``'molecule'`` or ``'group'``) with the given
+    adjacency list `adjlist`, drawing it only if it is not in the cache.
+    """
+    key, getImage = getStructureImageKey(kind, adjlist)
+    return getDataURI(getImage(format), format)
+
+def getDataURI(data, format='png'):
+    """
+    Return a ``data:`` URI containing the image `data` in the given `format`.
+    """
+    return 'data:{0};base64,{1}'.format(IMAGE_MIMETYPES[format], base64.b64encode(data))
+
+def getInlineSVG(data, prefix):
+    """
+    Return the SVG image `data` in a form that can be embedded in an HTML
+    page, i.e. without the XML declaration and doctype. Every ``id`` in the
+    image (and every reference to one) is given the `prefix`, so that the ids
+    of different images embedded in the same page do not clash.
+    """
+    data = data[data.index('<svg'):]
+    ids = set(re.findall(r'\bid="([^"]+)"', data))
+    def replace(match):
+        if match.group(2) in ids:
+            return match.group(1) + prefix + match.group(2)
+        return match.group(0)
+    return re.sub(r'(\bid="|#)([A-Za-z_][\w.:-]*)', replace, data)
+
+################################################################################
+
+def getPrerenderedImageName(kind, adjlist, format='png'):
+    """
+    Return the name, relative to ``settings.STRUCTURE_IMAGE_ROOT``, of the
+    pre-rendered image in the given `format` of the given `kind` (either
+    ``'molecule'`` or ``'group'``) with the given adjacency list `adjlist`.
+    """
+    return '{0}/{1}.{2}'.format(kind, hashlib.sha1(adjlist.strip()).hexdigest(), format)
+
+def getPrerenderedImagePath(kind, adjlist, format='png'):
+    """
+    Return the path of the pre-rendered image in the given `format` of the
+    given `kind` with the given adjacency list `adjlist`.
+    """
+    return os.path.join(settings.STRUCTURE_IMAGE_ROOT, *getPrerenderedImageName(kind, adjlist, format).split('/'))
+
+def getPrerenderedImageURL(kind, adjlist, format='png'):
+    """
+    Return the URL of the pre-rendered image in the given `format` of the
+    given `kind` with the given adjacency list `adjlist`, or ``None`` if it
+    has not been pre-rendered.
+    """
+    if not settings.STRUCTURE_IMAGE_ROOT or not os.path.isfile(getPrerenderedImagePath(kind, adjlist, format)):
+        return None
+    return settings.STRUCTURE_IMAGE_URL + getPrerenderedImageName(kind, adjlist, format)
+
+def prerenderImage(kind, adjlist, format='png'):
+    """
+    Draw the image in the given `format` of the given `kind` (either
+    ``'molecule'`` or ``'group'``) with the given adjacency list `adjlist`,
+    and save it where :func:`getPrerenderedImageURL` will find it.
+    """
+    from rmgpy.molecule import Molecule
+
+    if kind == 'molecule':
+        data = drawMoleculeImage(Molecule().fromAdjacencyList(adjlist), format)
+    elif kind == 'group':
+        data = drawGroupImage(adjlist, format)
+    else:
+        raise ValueError('Invalid image kind "{0}".'.format(kind))
+
+    path = getPrerenderedImagePath(kind, adjlist, format)
+    dirname = os.path.dirname(path)
+    if not os.path.isdir(dirname):
+        try:
+            os.makedirs(dirname)
+        except OSError:
+            if not os.path.isdir(dirname): raise
+    fd, tempPath = tempfile.mkstemp(dir=dirname)
+    f = os.fdopen(fd, 'wb')
+    f.write(data)
+    f.close()
+    os.chmod(tempPath, 0644)
+    os.rename(tempPath, path)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+################################################################################
+#
+#	RMG Website - A Django-powered website for Reaction Mechanism Generator
+#
+#	Copyright (c) 2011 Prof. William H. Green (whgreen@mit.edu) and the
+#	RMG Team (rmg_dev@mit.edu)
+#
+#	Permission is hereby granted, free of charge, to any person obtaining a
+#	copy of this software and associated documentation files (the 'Software'),
+#	to deal in the Software without restriction, including without limitation
+#	the rights to use, copy, modify, merge, publish, distribute, sublicense,
+#	and/or sell copies of the Software, and to permit persons to whom the
+#	Software is furnished to do so, subject to the following conditions:
+#
+#	The above copyright notice and this permission notice shall be included in
+#	all copies or substantial portions of the Software.
+#
+#	THE SOFTWARE IS PROVIDED 'AS IS', WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#	IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#	FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#	AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#	LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+#	FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#	DEALINGS IN THE SOFTWARE.
+#
+################################################################################
+
+
+"""
+Provides middleware used by the RMG website.
+"""
+
+from django.contrib.auth import get_user
+from django.utils.functional import SimpleLazyObject
+
+################################################################################
+
+# The key in the session of the units preferred by the logged-in user
+UNITS_SESSION_KEY = 'rmgweb_units'
+
+class UserUnitsMiddleware(object):
+    """
+    Keeps the units preferred by a logged-in user in their session, so that
+    their profile only needs to be read once, rather than on every request
+    that shows data in those units. The units are stored along with the id
+    of the user they belong to, and restored to the ``preferredUnits``
+    attribute of ``request.user`` (see :func:`rmgweb.main.tools.getUserUnits`)
+    when the user is first looked up during a request. The session is only
+    touched for requests that look up the user anyway, so other responses
+    (e.g. images) are not made to vary by cookie.
+
+    This must be listed after the session and authentication middleware.
+    """
+
+    def process_request(self, request):
+        request.user = SimpleLazyObject(lambda: getUserWithUnits(request))
+        return None
+
+    def process_response(self, request, response):
+        # Save the units in the session if they were looked up (or restored)
+        # during this request and aren't already there
+        user = getattr(request, '_cached_user', None)
+        if user is not None and user.is_authenticated():
+            units = getattr(user, 'preferredUnits', None)
+            if units is not None and request.session.get(UNITS_SESSION_KEY) != (user.pk, units):
+                request.session[UNITS_SESSION_KEY] = (user.pk, units)
+        return response
+
+def getUserWithUnits(request):
+    """
+    Return the user making the given `request`, as the authentication
+    middleware would, with their preferred units restored from the session
+    if they are logged in and the units were saved there.
+    """
+    if not hasattr(request, '_cached_user'):
+        request._cached_user = get_user(request)
+    user = request._cached_user
+    if user.is_authenticated() and getattr(user, 'preferredUnits', None) is None:
+        saved = request.session.get(UNITS_SESSION_KEY)
+        if saved is not None and saved[0] == user.pk:
+            user.preferredUnits = tuple(saved[1])
+    return user
+
+def forgetUserUnits(request):
+    """
+    Forget the units preferred by the user making the given `request`, e.g.
+    because they have just changed them, so that they are read from their
+    profile again when next needed.
+    """
+    request.session.pop(UNITS_SESSION_KEY, None)
+    user = getattr(request, '_cached_user', None)
+    if hasattr(user, 'preferredUnits'):
+        del user.preferredUnits
@@ -40,7 +40,7 @@ from django.utils.safestring import mark_safe
 
 import numpy
 
-from rmgweb.main.tools import getLaTeXScientificNotation, getStructureMarkup
+from rmgweb.main.tools import getLaTeXScientificNotation, getStructureMarkup, getConversionFactorFromSI
 from rmgweb.main.models import UserProfile
 
 from rmgpy.quantity import Quantity
@@ -52,7 +52,7 @@ def renderMW(MW):
     Renders molecular weight from SI units to the regular g/mol units we are used to.
     """
     mass = Quantity(MW,'kg/mol').value
-    multfactor = Quantity(1,'g/mol').getConversionFactorFromSI()
+    multfactor = getConversionFactorFromSI('g/mol')
     return mark_safe("{0:.2f}".format(mass*multfactor))
 
 @register.filter
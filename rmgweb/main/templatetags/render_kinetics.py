@@ -38,12 +38,12 @@ register = template.Library()
 
 from django.utils.safestring import mark_safe
 
+import math
 import numpy
 
-from rmgweb.main.tools import getLaTeXScientificNotation, getStructureMarkup
-from rmgweb.main.models import UserProfile
+import settings
+from rmgweb.main.tools import getLaTeXScientificNotation, getStructureMarkup, getRateCoefficients, getRateCoefficientGrid, getPlotDataScript, adaptiveSample, getUserUnits, getConversionFactorFromSI, getCachedPlotData
 
-from rmgpy.quantity import Quantity
 from rmgpy.kinetics import *
 
 ################################################################################
@@ -83,13 +83,13 @@ def getArrheniusJSMath(A, Aunits, n, nunits, Ea, Eaunits, T0, T0units):
     result += ' \ \mathrm{{ {0!s} }}'.format(Aunits)
     return result
 
-def getRateCoefficientUnits(kinetics, user=None):
+def getRateCoefficientUnits(kinetics, units=None):
     """
     For a given `kinetics` model, return the desired rate coefficient units
     at high and low pressures, the conversion factor from SI to those units
-    (high pressure), and the number of reactant species. If a `user` is 
-    specified, the user's preferred units will be used; otherwise default units
-    will be used.
+    (high pressure), and the number of reactant species. If `units` preferred
+    by a user are specified (as from :func:`getUserUnits`), they will be used;
+    otherwise default units will be used.
     """
     
     # Determine the number of reactants based on the units of one of the
@@ -108,7 +108,7 @@ def getRateCoefficientUnits(kinetics, user=None):
     elif isinstance(kinetics, ThirdBody): # also matches Lindemann and Troe
         numReactants = getNumberOfReactantsFromUnits(kinetics.arrheniusHigh.A.units)
     elif isinstance(kinetics, MultiKinetics):
-        return getRateCoefficientUnits(kinetics.kineticsList[0])
+        return getRateCoefficientUnits(kinetics.kineticsList[0], units)
     
     # Use the number of reactants to get the rate coefficient units and conversion factor
     kunitsDict = {
@@ -117,40 +117,39 @@ def getRateCoefficientUnits(kinetics, user=None):
         3: 'cm^6/(mol^2*s)',
         4: 'cm^9/(mol^3*s)',
     }
-    if user and user.is_authenticated():
-        user_profile = UserProfile.objects.get(user=user)
-        if user_profile.rateCoefficientUnits == 'm^3,mol,s':
-            kunitsDict = {
-                1: 's^-1',
-                2: 'm^3/(mol*s)',
-                3: 'm^6/(mol^2*s)',
-                4: 'm^9/(mol^3*s)',
-            }
-        elif user_profile.rateCoefficientUnits == 'cm^3,mol,s':
-            kunitsDict = {
-                1: 's^-1',
-                2: 'cm^3/(mol*s)',
-                3: 'cm^6/(mol^2*s)',
-                4: 'cm^9/(mol^3*s)',
-            }
-        elif user_profile.rateCoefficientUnits == 'm^3,molecule,s':
-            kunitsDict = {
-                1: 's^-1',
-                2: 'm^3/(molecule*s)',
-                3: 'm^6/(molecule^2*s)',
-                4: 'm^9/(molecule^3*s)',
-            }
-        elif user_profile.rateCoefficientUnits == 'cm^3,molecule,s':
-            kunitsDict = {
-                1: 's^-1',
-                2: 'cm^3/(molecule*s)',
-                3: 'cm^6/(molecule^2*s)',
-                4: 'cm^9/(molecule^3*s)',
-            }
-            
+    rateCoefficientUnits = (units or getUserUnits())[4]
+    if rateCoefficientUnits == 'm^3,mol,s':
+        kunitsDict = {
+            1: 's^-1',
+            2: 'm^3/(mol*s)',
+            3: 'm^6/(mol^2*s)',
+            4: 'm^9/(mol^3*s)',
+        }
+    elif rateCoefficientUnits == 'cm^3,mol,s':
+        kunitsDict = {
+            1: 's^-1',
+            2: 'cm^3/(mol*s)',
+            3: 'cm^6/(mol^2*s)',
+            4: 'cm^9/(mol^3*s)',
+        }
+    elif rateCoefficientUnits == 'm^3,molecule,s':
+        kunitsDict = {
+            1: 's^-1',
+            2: 'm^3/(molecule*s)',
+            3: 'm^6/(molecule^2*s)',
+            4: 'm^9/(molecule^3*s)',
+        }
+    elif rateCoefficientUnits == 'cm^3,molecule,s':
+        kunitsDict = {
+            1: 's^-1',
+            2: 'cm^3/(molecule*s)',
+            3: 'cm^6/(molecule^2*s)',
+            4: 'cm^9/(molecule^3*s)',
+        }
+        
     kunits = kunitsDict[numReactants]
     kunits_low = kunitsDict[numReactants+1]
-    kfactor = Quantity(1, kunits).getConversionFactorFromSI()
+    kfactor = getConversionFactorFromSI(kunits)
     
     return kunits, kunits_low, kfactor, numReactants
 
@@ -165,20 +164,20 @@ def render_kinetics_math(kinetics, user=None):
     """
     if kinetics is None:
         return mark_safe("<p>There are no kinetics for this entry.</p>")
+    units = getUserUnits(user)
+    return mark_safe(getCachedPlotData('kinetics', 'math', kinetics, units, getKineticsMath, kinetics, units))
+
+def getKineticsMath(kinetics, units):
+    """
+    Return a math representation of the given `kinetics` using jsMath, in the
+    given `units` (see :func:`render_kinetics_math`).
+    """
     # Define other units and conversion factors to use
-    if user and user.is_authenticated():
-        user_profile = UserProfile.objects.get(user=user)
-        Tunits = str(user_profile.temperatureUnits)
-        Punits = str(user_profile.pressureUnits)
-        Eunits = str(user_profile.energyUnits)
-    else:
-        Tunits = 'K'
-        Punits = 'bar'
-        Eunits = 'kcal/mol'
-    kunits, kunits_low, kfactor, numReactants = getRateCoefficientUnits(kinetics, user=user)
-    Tfactor = Quantity(1, Tunits).getConversionFactorFromSI()
-    Pfactor = Quantity(1, Punits).getConversionFactorFromSI()
-    Efactor = Quantity(1, Eunits).getConversionFactorFromSI()
+    Tunits, Punits, Eunits = units[:3]
+    kunits, kunits_low, kfactor, numReactants = getRateCoefficientUnits(kinetics, units)
+    Tfactor = getConversionFactorFromSI(Tunits)
+    Pfactor = getConversionFactorFromSI(Punits)
+    Efactor = getConversionFactorFromSI(Eunits)
     if kunits == 's^-1':
         kunits = 's^{-1}'   
     
@@ -327,7 +326,7 @@ k(T,P) = k_0(T) [\mathrm{{M}}]
         result = ''
         start = ''
         for i, k in enumerate(kinetics.kineticsList):
-            res = render_kinetics_math(k, user=user)
+            res = getKineticsMath(k, units)
             start += '{0} + '.format(res.split(' = ')[0].replace('<div class="math">k(T', 'k_{{ {0:d} }}(T'.format(i+1), 1))
             result += res.replace('k(T', 'k_{{ {0:d} }}(T'.format(i+1), 1) + '<br/>'
         
@@ -352,7 +351,7 @@ k(T,P) = {0!s}
         result += '<tr><td class="key">Pressure range</td><td class="equals">=</td><td class="value">{0:g} to {1:g} {2!s}</td></tr>'.format(kinetics.Pmin.value * Pfactor, kinetics.Pmax.value * Pfactor, Punits)
     result += '</table>'
 
-    return mark_safe(result)
+    return result
 
 ################################################################################
 
@@ -360,28 +359,36 @@ k(T,P) = {0!s}
 def get_rate_coefficients(kinetics, user=None):
     """
     Generate and return a set of :math:`k(T,P)` data suitable for plotting
-    using Highcharts. If a `user` is specified, the user's preferred units
-    will be used; otherwise default units will be used.
+    using Highcharts, as JavaScript variables. If a `user` is specified, the
+    user's preferred units will be used; otherwise default units will be used.
     """
     if kinetics is None:
         return "// There are no kinetics for this entry."
+    units = getUserUnits(user)
+    return mark_safe(getCachedPlotData('kinetics', 'script', kinetics, units, lambda: getPlotDataScript(getRateCoefficientPlotData(kinetics, units))))
+
+def getRateCoefficientPlotData(kinetics, units=None, tolerance=None, maxPoints=None):
+    """
+    Return a dictionary of :math:`k(T,P)` data for the given `kinetics` model
+    in the given `units` (as from :func:`getUserUnits`, or default units if
+    not specified) suitable for plotting using Highcharts (see
+    :func:`get_rate_coefficients`).
+    The curves of :math:`\log k` are sampled by :func:`adaptiveSample` to
+    within `tolerance` of their height using at most `maxPoints` points
+    (``settings.PLOT_TOLERANCE`` and ``settings.PLOT_MAX_POINTS`` by default).
+    """
+    if tolerance is None: tolerance = settings.PLOT_TOLERANCE
+    if maxPoints is None: maxPoints = settings.PLOT_MAX_POINTS
+
     # Define other units and conversion factors to use
-    if user and user.is_authenticated():
-        user_profile = UserProfile.objects.get(user=user)
-        Tunits = str(user_profile.temperatureUnits)
-        Punits = str(user_profile.pressureUnits)
-        Eunits = str(user_profile.energyUnits)
-    else:
-        Tunits = 'K'
-        Punits = 'bar'
-        Eunits = 'kcal/mol'
-    kunits, kunits_low, kfactor, numReactants = getRateCoefficientUnits(kinetics, user=user)
-    Tfactor = Quantity(1, Tunits).getConversionFactorFromSI()
-    Pfactor = Quantity(1, Punits).getConversionFactorFromSI()
-    Efactor = Quantity(1, Eunits).getConversionFactorFromSI()
+    units = units or getUserUnits()
+    Tunits, Punits, Eunits = units[:3]
+    kunits, kunits_low, kfactor, numReactants = getRateCoefficientUnits(kinetics, units)
+    Tfactor = getConversionFactorFromSI(Tunits)
+    Pfactor = getConversionFactorFromSI(Punits)
+    Efactor = getConversionFactorFromSI(Eunits)
         
     # Generate data to use for plots
-    Tdata = []; Pdata = []; kdata = []
     if kinetics.Tmin is not None and kinetics.Tmax is not None:
         Tmin = kinetics.Tmin.value
         Tmax = kinetics.Tmax.value
@@ -395,62 +402,35 @@ def get_rate_coefficients(kinetics, user=None):
         Pmin = 1e3
         Pmax = 1e7
     
-    for Tinv in numpy.arange(1.0/Tmax, 1.0/Tmin, 0.00001):
-        Tdata.append(1.0/Tinv)
+    # Evaluate the model over each whole grid at once; pressure-independent
+    # models only need evaluating at one pressure, and have no k(P) curves.
+    # The k(T) curves are sampled evenly in 1/T and the k(P) curves evenly in
+    # log P, but only as finely as needed for the plotted curves to look right
     if kinetics.isPressureDependent():
-        for logP in numpy.arange(math.log10(Pmin), math.log10(Pmax)+0.001, 1):
-            Pdata.append(10**logP)
-        for P in Pdata:
-            klist = []
-            for T in Tdata:
-                klist.append(kinetics.getRateCoefficient(T,P) * kfactor)
-            kdata.append(klist)
-    elif isinstance(kinetics, ArrheniusEP):
-        for T in Tdata:
-            kdata.append(kinetics.getRateCoefficient(T, dHrxn=0) * kfactor)
+        Tdata2 = numpy.round(1.0 / numpy.arange(1.0/Tmax, 1.0/Tmin, 0.0005))
+        Pdata = 10**numpy.arange(math.log10(Pmin), math.log10(Pmax)+0.001, 1)
+        Tinv, logk = adaptiveSample(lambda x: numpy.log10(getRateCoefficientGrid(kinetics, 1.0 / x, Pdata)), 1.0/Tmax, 1.0/Tmin, tolerance, maxPoints)
+        logP, logk2 = adaptiveSample(lambda x: numpy.log10(getRateCoefficientGrid(kinetics, Tdata2, 10**x)).T, math.log10(Pmin), math.log10(Pmax), tolerance, maxPoints)
+        Pdata2 = 10**logP
+        kdata = 10**logk * kfactor
+        kdata2 = 10**logk2.T * kfactor
     else:
-        for T in Tdata:
-            kdata.append(kinetics.getRateCoefficient(T) * kfactor)
+        Pdata = Pdata2 = Tdata2 = kdata2 = numpy.array([])
+        Tinv, logk = adaptiveSample(lambda x: numpy.log10(getRateCoefficients(kinetics, 1.0 / x)), 1.0/Tmax, 1.0/Tmin, tolerance, maxPoints)
+        kdata = 10**logk[0] * kfactor
+    Tdata = 1.0 / Tinv
     
-    Tdata2 = []; Pdata2 = []; kdata2 = []
-    for Tinv in numpy.arange(1.0/Tmax, 1.0/Tmin, 0.0005):
-        Tdata2.append(round(1.0/Tinv))
-    if kinetics.isPressureDependent():
-        for logP in numpy.arange(math.log10(Pmin), math.log10(Pmax)+0.001, 0.1):
-            Pdata2.append(10**logP)
-        for P in Pdata2:
-            klist = []
-            for T in Tdata2:
-                klist.append(kinetics.getRateCoefficient(T,P) * kfactor)
-            kdata2.append(klist)
-    elif isinstance(kinetics, ArrheniusEP):
-        for T in Tdata2:
-            kdata2.append(kinetics.getRateCoefficient(T, dHrxn=0) * kfactor)
-    else:
-        for T in Tdata2:
-            kdata2.append(kinetics.getRateCoefficient(T) * kfactor)
-    
-    return mark_safe("""
-Tlist = {0};
-Plist = {1};
-klist = {2};
-Tlist2 = {3};
-Plist2 = {4};
-klist2 = {5};
-Tunits = "{6}";
-Punits = "{7}";
-kunits = "{8}";
-    """.format(
-        [T * Tfactor for T in Tdata], 
-        [P * Pfactor for P in Pdata], 
-        kdata, 
-        [T * Tfactor for T in Tdata2], 
-        [P * Pfactor for P in Pdata2], 
-        kdata2, 
-        Tunits, 
-        Punits, 
-        kunits,
-    ))
+    return {
+        'Tlist': Tdata * Tfactor,
+        'Plist': Pdata * Pfactor,
+        'klist': kdata,
+        'Tlist2': Tdata2 * Tfactor,
+        'Plist2': Pdata2 * Pfactor,
+        'klist2': kdata2,
+        'Tunits': Tunits,
+        'Punits': Punits,
+        'kunits': kunits,
+    }
 
 ###############################################################################
 
@@ -40,10 +40,8 @@ from django.utils.safestring import mark_safe
 
 import numpy
 
-from rmgweb.main.tools import getLaTeXScientificNotation, getStructureMarkup
-from rmgweb.main.models import UserProfile
+from rmgweb.main.tools import getLaTeXScientificNotation, getStructureMarkup, getPlotDataScript, getUserUnits, getConversionFactorFromSI, getCachedPlotData
 
-from rmgpy.quantity import Quantity
 from rmgpy.statmech import *
 
 ################################################################################
@@ -56,15 +54,11 @@ def render_states_math(states, user=None):
     default units will be used.
     """
     # Define other units and conversion factors to use
-    if user and user.is_authenticated():
-        user_profile = UserProfile.objects.get(user=user)
-        Tunits = str(user_profile.temperatureUnits)
-        Eunits = str(user_profile.energyUnits)
-    else:
-        Tunits = 'K'
-        Eunits = 'kcal/mol'
-    Tfactor = Quantity(1, Tunits).getConversionFactorFromSI()
-    Efactor = Quantity(1, Eunits).getConversionFactorFromSI()
+    units = getUserUnits(user)
+    Tunits = units[0]
+    Eunits = units[2]
+    Tfactor = getConversionFactorFromSI(Tunits)
+    Efactor = getConversionFactorFromSI(Eunits)
     
     # The string that will be returned to the template
     result = ''
@@ -167,20 +161,26 @@ def render_states_math(states, user=None):
 def get_states_data(states, user=None):
     """
     Generate and return a set of :math:`k(T,P)` data suitable for plotting
-    using Highcharts. If a `user` is specified, the user's preferred units
-    will be used; otherwise default units will be used.
+    using Highcharts, as JavaScript variables. If a `user` is specified, the
+    user's preferred units will be used; otherwise default units will be used.
+    """
+    units = getUserUnits(user)
+    return mark_safe(getCachedPlotData('statmech', 'script', states, units, lambda: getPlotDataScript(getStatesPlotData(states, units))))
+
+def getStatesPlotData(states, units=None):
+    """
+    Return a dictionary of partition function, density of states and hindered
+    rotor potential data for the given `states` model in the given `units`
+    (as from :func:`getUserUnits`, or default units if not specified)
+    suitable for plotting using Highcharts (see :func:`get_states_data`).
     """
     
     # Define other units and conversion factors to use
-    if user and user.is_authenticated():
-        user_profile = UserProfile.objects.get(user=user)
-        Tunits = str(user_profile.temperatureUnits)
-        Eunits = str(user_profile.energyUnits)
-    else:
-        Tunits = 'K'
-        Eunits = 'kcal/mol'
-    Tfactor = Quantity(1, Tunits).getConversionFactorFromSI()
-    Efactor = Quantity(1, Eunits).getConversionFactorFromSI()
+    units = units or getUserUnits()
+    Tunits = units[0]
+    Eunits = units[2]
+    Tfactor = getConversionFactorFromSI(Tunits)
+    Efactor = getConversionFactorFromSI(Eunits)
     Qunits = ''
     Qfactor = 1.0
     rhounits = 'per cm^-1' 
@@ -208,30 +208,17 @@ def get_states_data(states, user=None):
             Vdata.append(list(mode.getPotential(phidata) * Vfactor))
     phidata = list(phidata * phifactor)
     
-    return mark_safe("""
-Tlist = {0};
-Qlist = {1};
-Elist = {2};
-rholist = {3};
-philist = {4};
-Vlist = {5};
-Tunits = "{6}";
-Qunits = "{7}";
-Eunits = "{8}";
-rhounits = "{9}";
-phiunits = "{10}";
-Vunits = "{11}";
-    """.format(
-        Tdata, 
-        Qdata, 
-        Edata, 
-        rhodata, 
-        phidata, 
-        Vdata,
-        Tunits, 
-        Qunits, 
-        Eunits, 
-        rhounits, 
-        phiunits, 
-        Vunits,
-    ))
+    return {
+        'Tlist': Tdata,
+        'Qlist': Qdata,
+        'Elist': Edata,
+        'rholist': rhodata,
+        'philist': phidata,
+        'Vlist': Vdata,
+        'Tunits': Tunits,
+        'Qunits': Qunits,
+        'Eunits': Eunits,
+        'rhounits': rhounits,
+        'phiunits': phiunits,
+        'Vunits': Vunits,
+    }
@@ -41,10 +41,9 @@ from django.core.urlresolvers import reverse
 
 import numpy
 
-from rmgweb.main.tools import getLaTeXScientificNotation, getStructureMarkup
-from rmgweb.main.models import UserProfile
+import settings
+from rmgweb.main.tools import getLaTeXScientificNotation, getStructureMarkup, getPlotDataScript, adaptiveSample, getUserUnits, getConversionFactorFromSI, getCachedPlotData
 
-from rmgpy.quantity import Quantity
 from rmgpy.thermo import *
 
 ################################################################################
@@ -56,28 +55,24 @@ def render_thermo_math(thermo, user=None):
     `user` is specified, the user's preferred units will be used; otherwise 
     default units will be used.
     """
+    units = getUserUnits(user)
+    return mark_safe(getCachedPlotData('thermo', 'math', thermo, units, getThermoMath, thermo, units))
+
+def getThermoMath(thermo, units):
+    """
+    Return a math representation of the given `thermo` using jsMath, in the
+    given `units` (see :func:`render_thermo_math`).
+    """
     # Define other units and conversion factors to use
-    if user and user.is_authenticated():
-        user_profile = UserProfile.objects.get(user=user)
-        Tunits = str(user_profile.temperatureUnits)
-        Punits = str(user_profile.pressureUnits)
-        Cpunits = str(user_profile.heatCapacityUnits)
-        Hunits = str(user_profile.energyUnits)
-        Sunits = str(user_profile.heatCapacityUnits)
-        Gunits = str(user_profile.energyUnits)
-    else:
-        Tunits = 'K'
-        Punits = 'bar'
-        Cpunits = 'cal/(mol*K)'
-        Hunits = 'kcal/mol'
-        Sunits = 'cal/(mol*K)'
-        Gunits = 'kcal/mol'
-    Tfactor = Quantity(1, Tunits).getConversionFactorFromSI()
-    Pfactor = Quantity(1, Punits).getConversionFactorFromSI()
-    Cpfactor = Quantity(1, Cpunits).getConversionFactorFromSI()
-    Hfactor = Quantity(1, Hunits).getConversionFactorFromSI()
-    Sfactor = Quantity(1, Sunits).getConversionFactorFromSI()
-    Gfactor = Quantity(1, Gunits).getConversionFactorFromSI()
+    Tunits, Punits, Hunits, Cpunits = units[:4]
+    Sunits = Cpunits
+    Gunits = Hunits
+    Tfactor = getConversionFactorFromSI(Tunits)
+    Pfactor = getConversionFactorFromSI(Punits)
+    Cpfactor = getConversionFactorFromSI(Cpunits)
+    Hfactor = getConversionFactorFromSI(Hunits)
+    Sfactor = getConversionFactorFromSI(Sunits)
+    Gfactor = getConversionFactorFromSI(Gunits)
     
     # The string that will be returned to the template
     result = ''
@@ -256,7 +251,7 @@ def render_thermo_math(thermo, user=None):
             result += '<tr><td class="key">Temperature range</td><td class="equals">=</td><td class="value">{0:g} to {1:g} {2!s}</td></tr>'.format(thermo.Tmin.value * Tfactor, thermo.Tmax.value * Tfactor, Tunits)
         result += '</table>'
 
-    return mark_safe(result)
+    return result
 
 ################################################################################
 
@@ -264,35 +259,40 @@ def render_thermo_math(thermo, user=None):
 def get_thermo_data(thermo, user=None):
     """
     Generate and return a set of thermodynamics data suitable for plotting
-    using Highcharts. If a `user` is specified, the user's preferred units
-    will be used; otherwise default units will be used.
+    using Highcharts, as JavaScript variables. If a `user` is specified, the
+    user's preferred units will be used; otherwise default units will be used.
     """
     
     if not isinstance(thermo, (ThermoData, Wilhoit, MultiNASA)):
         return ''
+    units = getUserUnits(user)
+    return mark_safe(getCachedPlotData('thermo', 'script', thermo, units, lambda: getPlotDataScript(getThermoPlotData(thermo, units))))
+
+def getThermoPlotData(thermo, units=None, tolerance=None, maxPoints=None):
+    """
+    Return a dictionary of thermodynamics data for the given `thermo` model
+    in the given `units` (as from :func:`getUserUnits`, or default units if
+    not specified) suitable for plotting using Highcharts (see
+    :func:`get_thermo_data`).
+    The heat capacity, enthalpy, entropy and free energy curves are sampled
+    by :func:`adaptiveSample` to within `tolerance` of their height using at
+    most `maxPoints` points (``settings.PLOT_TOLERANCE`` and
+    ``settings.PLOT_MAX_POINTS`` by default).
+    """
+    if tolerance is None: tolerance = settings.PLOT_TOLERANCE
+    if maxPoints is None: maxPoints = settings.PLOT_MAX_POINTS
     
     # Define other units and conversion factors to use
-    if user and user.is_authenticated():
-        user_profile = UserProfile.objects.get(user=user)
-        Tunits = str(user_profile.temperatureUnits)
-        Punits = str(user_profile.pressureUnits)
-        Cpunits = str(user_profile.heatCapacityUnits)
-        Hunits = str(user_profile.energyUnits)
-        Sunits = str(user_profile.heatCapacityUnits)
-        Gunits = str(user_profile.energyUnits)
-    else:
-        Tunits = 'K'
-        Punits = 'bar'
-        Cpunits = 'cal/(mol*K)'
-        Hunits = 'kcal/mol'
-        Sunits = 'cal/(mol*K)'
-        Gunits = 'kcal/mol'
-    Tfactor = Quantity(1, Tunits).getConversionFactorFromSI()
-    Pfactor = Quantity(1, Punits).getConversionFactorFromSI()
-    Cpfactor = Quantity(1, Cpunits).getConversionFactorFromSI()
-    Hfactor = Quantity(1, Hunits).getConversionFactorFromSI()
-    Sfactor = Quantity(1, Sunits).getConversionFactorFromSI()
-    Gfactor = Quantity(1, Gunits).getConversionFactorFromSI()
+    units = units or getUserUnits()
+    Tunits, Punits, Hunits, Cpunits = units[:4]
+    Sunits = Cpunits
+    Gunits = Hunits
+    Tfactor = getConversionFactorFromSI(Tunits)
+    Pfactor = getConversionFactorFromSI(Punits)
+    Cpfactor = getConversionFactorFromSI(Cpunits)
+    Hfactor = getConversionFactorFromSI(Hunits)
+    Sfactor = getConversionFactorFromSI(Sunits)
+    Gfactor = getConversionFactorFromSI(Gunits)
         
     if thermo.Tmin is not None and thermo.Tmax is not None:
         Tmin = thermo.Tmin.value
@@ -300,34 +300,30 @@ def get_thermo_data(thermo, user=None):
     else:
         Tmin = 300
         Tmax = 2000
-    Tdata = []; Cpdata = []; Hdata = []; Sdata = []; Gdata = []
-    for T in numpy.arange(Tmin, Tmax+1, 10):
-        Tdata.append(T * Tfactor)
-        Cpdata.append(thermo.getHeatCapacity(T) * Cpfactor)
-        Hdata.append(thermo.getEnthalpy(T) * Hfactor)
-        Sdata.append(thermo.getEntropy(T) * Sfactor)
-        Gdata.append(thermo.getFreeEnergy(T) * Gfactor)
     
-    return mark_safe("""
-Tlist = {0};
-Cplist = {1};
-Hlist = {2};
-Slist = {3};
-Glist = {4};
-Tunits = "{5!s}";
-Cpunits = "{6!s}";
-Hunits = "{7!s}";
-Sunits = "{8!s}";
-Gunits = "{9!s}";
-    """.format(
-        Tdata,
-        Cpdata, 
-        Hdata,
-        Sdata, 
-        Gdata, 
-        Tunits, 
-        Cpunits, 
-        Hunits,
-        Sunits,
-        Gunits,
-    ))
+    def evaluate(Tlist):
+        return numpy.array([
+            [thermo.getHeatCapacity(T) for T in Tlist],
+            [thermo.getEnthalpy(T) for T in Tlist],
+            [thermo.getEntropy(T) for T in Tlist],
+            [thermo.getFreeEnergy(T) for T in Tlist],
+        ]).reshape(4, len(Tlist))
+    Tlist, data = adaptiveSample(evaluate, Tmin, Tmax, tolerance, maxPoints)
+    Tdata = Tlist * Tfactor
+    Cpdata = data[0] * Cpfactor
+    Hdata = data[1] * Hfactor
+    Sdata = data[2] * Sfactor
+    Gdata = data[3] * Gfactor
+    
+    return {
+        'Tlist': Tdata,
+        'Cplist': Cpdata,
+        'Hlist': Hdata,
+        'Slist': Sdata,
+        'Glist': Gdata,
+        'Tunits': Tunits,
+        'Cpunits': Cpunits,
+        'Hunits': Hunits,
+        'Sunits': Sunits,
+        'Gunits': Gunits,
+    }
@@ -31,12 +31,16 @@
 import math
 import numpy
 import re
+import json
+import hashlib
 
 from django.core.urlresolvers import reverse
 
-from rmgpy.quantity import constants
+from rmgpy.quantity import constants, Quantity
 from rmgpy.molecule import Molecule
 
+from rmgweb.main.cache import MemoryCache
+
 ################################################################################
 
 def moleculeToURL(molecule):
@@ -49,18 +53,48 @@ def moleculeToURL(molecule):
     adjlist = re.sub('\s+', '%20', adjlist.replace('\n', ';'))
     return adjlist
 
-def moleculeToInfo(molecule):
+def moleculeToInfo(molecule, imageFormat=None, inline=False, batch=False):
     """
     Creates an html rendering which includes molecule structure image but
-    also allows you to click on it to enter a molecule info page.
+    also allows you to click on it to enter a molecule info page. The
+    `imageFormat`, `inline` and `batch` arguments are passed on to
+    :func:`getStructureMarkup`.
     """
 
     from rmgweb.database.views import moleculeEntry
     href = reverse(moleculeEntry, kwargs={'adjlist': molecule.toAdjacencyList()})
-    structureMarkup = getStructureMarkup(molecule)
+    structureMarkup = getStructureMarkup(molecule, imageFormat, inline, batch)
     markup = '<a href="'+ href + '">' + structureMarkup + '</a>'
     return markup
 
+def getMoleculeKey(molecule):
+    """
+    Return a string that identifies the given `molecule` regardless of the
+    order in which its atoms are listed, for use as a cache key. Each atom is
+    described by its element, radical electrons, spin multiplicity, charge
+    and label, and these descriptions are repeatedly refined with those of
+    the atom's neighbors and the orders of the bonds to them; the key is a
+    hash of the sorted descriptions. Isomorphic molecules therefore always
+    have the same key, and molecules that differ in any of these respects
+    (e.g. singlet and triplet biradicals) have different ones. Some rare,
+    highly symmetric pairs of molecules cannot be told apart this way, so
+    where that matters a match should be confirmed with
+    :meth:`Molecule.isIsomorphic`.
+    """
+    atoms = molecule.atoms
+    indices = dict([(atom, i) for i, atom in enumerate(atoms)])
+    descriptions = [repr((atom.element.symbol, atom.radicalElectrons, atom.spinMultiplicity, atom.charge, atom.label)) for atom in atoms]
+    for iteration in range(len(atoms)):
+        refined = []
+        for atom in atoms:
+            neighbors = sorted([(str(bond.order), descriptions[indices[neighbor]]) for neighbor, bond in molecule.getBonds(atom).iteritems()])
+            refined.append(hashlib.sha1(repr((descriptions[indices[atom]], neighbors))).hexdigest())
+        if len(set(refined)) == len(set(descriptions)):
+            # No more atoms can be told apart
+            break
+        descriptions = refined
+    return 'atoms:' + hashlib.sha1('\n'.join(sorted(descriptions))).hexdigest()
+
 def moleculeFromURL(adjlist):
     """
     Convert a given adjacency list `adjlist` from a URL to the corresponding
@@ -85,38 +119,422 @@ def getLaTeXScientificNotation(value):
 
 ################################################################################
 
-def getStructureMarkup(item):
+def getQuantityValue(quantity, default=None):
+    """
+    Return the value of the given `quantity` in SI units, or `default` if the
+    quantity is ``None``.
+    """
+    if quantity is None:
+        return default
+    return getattr(quantity, 'value', quantity)
+
+def getQuantityArray(quantity):
+    """
+    Return the values of the given array `quantity` in SI units as a NumPy
+    array.
+    """
+    values = getattr(quantity, 'values', None)
+    if values is None:
+        values = getattr(quantity, 'value', quantity)
+    return numpy.asarray(values, numpy.float64)
+
+def roundSignificant(value, digits=6):
+    """
+    Return a copy of `value`, a number or a (nested) list, tuple or NumPy
+    array of numbers, with every number rounded to the given number of
+    significant `digits` and any infinite or NaN values replaced by ``None``.
+    Anything else is returned unchanged.
+    """
+    if isinstance(value, numpy.ndarray):
+        value = value.tolist()
+    if isinstance(value, (list, tuple)):
+        return [roundSignificant(v, digits) for v in value]
+    elif isinstance(value, (float, numpy.floating)):
+        if math.isinf(value) or math.isnan(value):
+            return None
+        return float('{0:.{1}g}'.format(value, digits))
+    return value
+
+def getPlotDataJSON(data, digits=6):
+    """
+    Return the dictionary of plot data `data` as compact JSON, with each
+    number rounded to the given number of significant `digits`.
+    """
+    return json.dumps(dict([(key, roundSignificant(value, digits)) for key, value in data.iteritems()]), separators=(',', ':'))
+
+def getPlotDataScript(data, digits=6):
+    """
+    Return JavaScript that assigns each item in the dictionary of plot data
+    `data` to a variable of the same name, as compact JSON with each number
+    rounded to the given number of significant `digits`.
+    """
+    return '\n'.join(['{0} = {1};'.format(key, json.dumps(roundSignificant(data[key], digits), separators=(',', ':'))) for key in sorted(data)])
+
+def getRateCoefficient(kinetics, T, P=1e5):
+    """
+    Return the rate coefficient in SI units given by the `kinetics` model at
+    the temperature `T` (in K) and pressure `P` (in Pa), evaluated by the
+    model itself. ArrheniusEP models are evaluated at zero enthalpy of
+    reaction.
+    """
+    from rmgpy.kinetics import ArrheniusEP
+    if isinstance(kinetics, ArrheniusEP):
+        return kinetics.getRateCoefficient(T, dHrxn=0)
+    elif kinetics.isPressureDependent():
+        return kinetics.getRateCoefficient(T, P)
+    else:
+        return kinetics.getRateCoefficient(T)
+
+def evaluateRateCoefficients(kinetics, Tlist, Plist):
+    """
+    Return a two-dimensional array of the rate coefficients in SI units given
+    by the `kinetics` model at each of the pressures in the array `Plist`
+    (in Pa, the rows) and temperatures in the array `Tlist` (in K, the
+    columns), computed with NumPy from the parameters of the model. Returns
+    ``None`` for models that can't be evaluated this way.
+    """
+    from rmgpy.kinetics import Arrhenius, ArrheniusEP, MultiKinetics, PDepArrhenius, Chebyshev, ThirdBody, Lindemann, Troe
+
+    def arrhenius(model):
+        # A pressure-independent model at each temperature
+        k = evaluateRateCoefficients(model, Tlist, Plist[:1])
+        return k[0] if k is not None else None
+
+    ones = numpy.ones((len(Plist), 1))
+    if isinstance(kinetics, Arrhenius):
+        A = getQuantityValue(kinetics.A)
+        n = getQuantityValue(kinetics.n)
+        Ea = getQuantityValue(kinetics.Ea)
+        T0 = getQuantityValue(kinetics.T0, 1.0)
+        return ones * (A * (Tlist / T0)**n * numpy.exp(-Ea / (constants.R * Tlist)))
+    elif isinstance(kinetics, ArrheniusEP):
+        # The activation energy is evaluated at zero enthalpy of reaction
+        A = getQuantityValue(kinetics.A)
+        n = getQuantityValue(kinetics.n)
+        E0 = getQuantityValue(kinetics.E0)
+        return ones * (A * Tlist**n * numpy.exp(-E0 / (constants.R * Tlist)))
+    elif isinstance(kinetics, MultiKinetics):
+        k = numpy.zeros((len(Plist), len(Tlist)))
+        for kinetics0 in kinetics.kineticsList:
+            k0 = evaluateRateCoefficients(kinetics0, Tlist, Plist)
+            if k0 is None:
+                return None
+            k += k0
+        return k
+    elif isinstance(kinetics, PDepArrhenius):
+        # Interpolate log k linearly in log P between the expressions at the
+        # pressures either side, or use the nearest expression beyond them
+        pressures = getQuantityArray(kinetics.pressures)
+        klist = [arrhenius(arrh) for arrh in kinetics.arrhenius]
+        if any([k is None for k in klist]):
+            return None
+        logk = numpy.log10(numpy.array(klist))
+        logP = numpy.log10(pressures)
+        k = numpy.empty((len(Plist), len(Tlist)))
+        for i, P in enumerate(Plist):
+            j = numpy.searchsorted(pressures, P)
+            if j < len(pressures) and pressures[j] == P:
+                k[i] = klist[j]
+            elif j == 0 or j == len(pressures):
+                k[i] = klist[min(j, len(pressures) - 1)]
+            else:
+                x = (numpy.log10(P) - logP[j-1]) / (logP[j] - logP[j-1])
+                k[i] = 10**(logk[j-1] + x * (logk[j] - logk[j-1]))
+        return k
+    elif isinstance(kinetics, Chebyshev):
+        from numpy.polynomial.chebyshev import chebvander
+        coeffs = getQuantityArray(kinetics.coeffs)
+        Tmin = getQuantityValue(kinetics.Tmin); Tmax = getQuantityValue(kinetics.Tmax)
+        Pmin = getQuantityValue(kinetics.Pmin); Pmax = getQuantityValue(kinetics.Pmax)
+        Tred = (2.0 / Tlist - 1.0 / Tmin - 1.0 / Tmax) / (1.0 / Tmax - 1.0 / Tmin)
+        Pred = (2.0 * numpy.log10(Plist) - numpy.log10(Pmin) - numpy.log10(Pmax)) / (numpy.log10(Pmax) - numpy.log10(Pmin))
+        logk = numpy.dot(numpy.dot(chebvander(Pred, coeffs.shape[1] - 1), coeffs.T), chebvander(Tred, coeffs.shape[0] - 1).T)
+        return 10**logk
+    elif isinstance(kinetics, ThirdBody):
+        # The low-pressure limit is arrheniusHigh for ThirdBody models, but
+        # arrheniusLow for Lindemann and Troe models (which are subclasses)
+        if isinstance(kinetics, Lindemann):
+            k0 = arrhenius(kinetics.arrheniusLow)
+            kinf = arrhenius(kinetics.arrheniusHigh)
+        else:
+            k0 = arrhenius(kinetics.arrheniusHigh)
+            kinf = None
+        if k0 is None or (kinf is None and isinstance(kinetics, Lindemann)):
+            return None
+        # The concentration of the bath gas, with unit collision efficiency
+        M = Plist.reshape(-1, 1) / (constants.R * Tlist)
+        if kinf is None:
+            return k0 * M
+        Pr = k0 * M / kinf
+        k = kinf * Pr / (1 + Pr)
+        if isinstance(kinetics, Troe):
+            alpha = getQuantityValue(kinetics.alpha)
+            T1 = getQuantityValue(kinetics.T1); T3 = getQuantityValue(kinetics.T3)
+            Fcent = (1 - alpha) * numpy.exp(-Tlist / T3) + alpha * numpy.exp(-Tlist / T1)
+            if kinetics.T2 is not None:
+                Fcent += numpy.exp(-getQuantityValue(kinetics.T2) / Tlist)
+            d = 0.14
+            n = 0.75 - 1.27 * numpy.log10(Fcent)
+            c = -0.4 - 0.67 * numpy.log10(Fcent)
+            logPr = numpy.log10(Pr) + c
+            F = 10**(numpy.log10(Fcent) / (1 + (logPr / (n - d * logPr))**2))
+            k = k * F
+        return k
+    return None
+
+def getRateCoefficientGrid(kinetics, Tlist, Plist):
+    """
+    Return a two-dimensional array of the rate coefficients in SI units given
+    by the `kinetics` model at each of the pressures in `Plist` (in Pa, the
+    rows) and temperatures in `Tlist` (in K, the columns). Arrhenius,
+    ArrheniusEP, MultiKinetics, PDepArrhenius, Chebyshev, ThirdBody,
+    Lindemann and Troe models are evaluated at all of the points at once
+    using NumPy. The result is checked against the model's own
+    ``getRateCoefficient`` method at a few of the points; if they differ, or
+    for any other model, each point is evaluated by that method instead.
+    """
+    Tlist = numpy.asarray(Tlist, numpy.float64)
+    Plist = numpy.asarray(Plist, numpy.float64)
+    try:
+        k = evaluateRateCoefficients(kinetics, Tlist, Plist)
+    except (AttributeError, ImportError, TypeError, ValueError):
+        # The model doesn't have the parameters we expected
+        k = None
+    if k is not None and len(Tlist) > 0 and len(Plist) > 0:
+        # Check the first, middle and last points
+        for i, j in [(0, 0), (len(Plist) // 2, len(Tlist) // 2), (-1, -1)]:
+            k0 = getRateCoefficient(kinetics, Tlist[j], Plist[i])
+            if not numpy.allclose(k[i,j], k0, rtol=1e-6, atol=0):
+                k = None
+                break
+    if k is None:
+        k = numpy.array([[getRateCoefficient(kinetics, T, P) for T in Tlist] for P in Plist])
+    return k.reshape(len(Plist), len(Tlist))
+
+def getRateCoefficients(kinetics, Tlist, P=1e5):
+    """
+    Return an array of the rate coefficients in SI units given by the
+    `kinetics` model at each of the temperatures in `Tlist` (in K) and the
+    pressure `P` (in Pa), as evaluated by :func:`getRateCoefficientGrid`.
+    """
+    return getRateCoefficientGrid(kinetics, Tlist, [P])[0]
+
+def adaptiveSample(function, xmin, xmax, tolerance=0.002, maxPoints=200, initialPoints=9):
+    """
+    Sample one or more smooth curves from `xmin` to `xmax` at as few points
+    as needed to plot them. The vectorized `function` is called with an array
+    of `x` values and returns an array of the corresponding `y` values, or a
+    two-dimensional array with one row for each curve. Starting from
+    `initialPoints` evenly spaced points, each interval is checked at its
+    midpoint and split if the curves there differ from a straight line
+    between its ends by more than `tolerance` times the range of the curve.
+    This repeats until every interval passes or there are `maxPoints` points,
+    with the worst intervals split first. Returns the arrays of `x` values (in
+    increasing order) and of `y` values (always two-dimensional).
+    """
+    x = numpy.linspace(xmin, xmax, max(initialPoints, 2))
+    y = numpy.atleast_2d(numpy.asarray(function(x), numpy.float64))
+    active = numpy.ones(len(x) - 1, numpy.bool_)
+    while active.any() and len(x) < maxPoints:
+        # The plotted height of each curve, ignoring non-finite values
+        with numpy.errstate(invalid='ignore'):
+            finite = numpy.where(numpy.isfinite(y), y, numpy.nan)
+            scale = numpy.array([numpy.nanmax(row) - numpy.nanmin(row) if numpy.isfinite(row).any() else 0 for row in finite])
+        scale[scale == 0] = numpy.inf
+
+        # Evaluate the curves at the midpoint of each interval to check
+        left = numpy.flatnonzero(active)
+        xmid = 0.5 * (x[left] + x[left+1])
+        ymid = numpy.atleast_2d(numpy.asarray(function(xmid), numpy.float64))
+        with numpy.errstate(invalid='ignore'):
+            error = numpy.abs(ymid - 0.5 * (y[:,left] + y[:,left+1])) / scale.reshape(-1, 1)
+        error[~numpy.isfinite(error)] = 0
+        error = error.max(axis=0)
+
+        # Keep the midpoints of the intervals that need splitting, worst first
+        split = numpy.flatnonzero(error > tolerance)
+        if len(split) > maxPoints - len(x):
+            split = split[numpy.argsort(-error[split])[:maxPoints - len(x)]]
+        if len(split) == 0:
+            break
+        x = numpy.concatenate([x, xmid[split]])
+        y = numpy.concatenate([y, ymid[:,split]], axis=1)
+        new = numpy.concatenate([numpy.zeros(len(x) - len(split), numpy.bool_), numpy.ones(len(split), numpy.bool_)])
+        order = numpy.argsort(x, kind='mergesort')
+        x = x[order]; y = y[:,order]; new = new[order]
+        # Only the halves of the intervals just split need checking again
+        active = new[:-1] | new[1:]
+    return x, y
+
+################################################################################
+
+# The units used for anyone who is not logged in, in the order returned by
+# getUserUnits()
+DEFAULT_UNITS = ('K', 'bar', 'kcal/mol', 'cal/(mol*K)', 'cm^3,mol,s')
+
+def getUserUnits(user=None):
+    """
+    Return the units preferred by the given `user`, as a tuple of the
+    temperature, pressure, energy, heat capacity and rate coefficient units
+    (the last as one of the choices for ``UserProfile.rateCoefficientUnits``).
+    The default units are returned if there is no `user` or they are not
+    logged in. The user's profile is only read the first time; the units are
+    then kept as the ``preferredUnits`` attribute of `user`, which lasts for
+    the rest of the request (and is restored from the session for later
+    requests by :class:`UserUnitsMiddleware`).
+    """
+    if user and user.is_authenticated():
+        units = getattr(user, 'preferredUnits', None)
+        if units is None:
+            from rmgweb.main.models import UserProfile
+            user_profile = UserProfile.objects.get(user=user)
+            units = (
+                str(user_profile.temperatureUnits),
+                str(user_profile.pressureUnits),
+                str(user_profile.energyUnits),
+                str(user_profile.heatCapacityUnits),
+                str(user_profile.rateCoefficientUnits),
+            )
+            user.preferredUnits = units
+        return units
+    return DEFAULT_UNITS
+
+# The factors that convert from SI units to each of the units asked for
+_conversionFactors = {}
+
+def getConversionFactorFromSI(units):
+    """
+    Return the factor that converts a value in SI units to the given `units`.
+    Each factor is only worked out the first time it is asked for.
+    """
+    factor = _conversionFactors.get(units)
+    if factor is None:
+        factor = _conversionFactors[units] = Quantity(1, units).getConversionFactorFromSI()
+    return factor
+
+# The plot data and math already generated for kinetics, thermo and statmech
+# models, with a cache for each of these components
+_plotCaches = {}
+
+def getPlotCache(component):
+    """
+    Return the cache of plot data and math generated for models of the given
+    `component` (``'kinetics'``, ``'thermo'`` or ``'statmech'``).
+    """
+    cache = _plotCaches.get(component)
+    if cache is None:
+        import settings
+        cache = _plotCaches.setdefault(component, MemoryCache(maxEntries=settings.PLOT_CACHE_SIZE))
+    return cache
+
+def getCachedPlotData(component, name, model, units, function, *args):
+    """
+    Return the result of calling `function` with the arguments `args` to
+    generate the plot data or math called `name` for the given `model` of the
+    given `component` in the given `units` (as from :func:`getUserUnits`).
+    The result is kept in the cache returned by :func:`getPlotCache` until
+    that component of the database is reloaded, so it must not be modified.
+    Results are found by the identity of the model, which is cheap to check
+    on every call; each result keeps a reference to its model, so that the
+    identity can't be reused by another model while the result is cached.
+    """
+    cache = getPlotCache(component)
+    key = (name, id(model), units)
+    cached = cache.get(key)
+    if cached is None or cached[0] is not model:
+        cached = (model, function(*args))
+        cache.set(key, cached)
+    return cached[1]
+
+def clearPlotCache(component):
+    """
+    Discard all of the plot data and math generated for models of the given
+    `component`, e.g. when that component of the database is reloaded.
+    """
+    getPlotCache(component).clear()
+
+def getPlotCacheStats():
+    """
+    Return a dictionary of statistics about the use of the cache of plot data
+    and math for each component.
+    """
+    return dict([(component, cache.getStats()) for component, cache in _plotCaches.items()])
+
+################################################################################
+
+def getStructureImageMarkup(kind, adjlist, title, imageFormat='png', inline=None, batch=False):
+    """
+    Return the HTML markup for an image of the given `kind` (either
+    ``'molecule'`` or ``'group'``) with the given adjacency list `adjlist`
+    and `title`. The image is linked in the given `imageFormat`, or if
+    `inline` is given (as a function returning the SVG image data) embedded
+    in the markup itself. Images that have been pre-rendered into the static
+    media are linked there; otherwise they are drawn by our views. If `batch`
+    is ``True``, such images are instead left to be fetched together with the
+    others on the page by the ``structures.js`` script.
+    """
+    from django.utils.html import escape
+    from images import getInlineSVG, getPrerenderedImageURL
+    if inline is not None:
+        prefix = 's' + hashlib.sha1(adjlist).hexdigest()[0:10] + '-'
+        return '<span class="structure" title="{1}">{0}</span>'.format(getInlineSVG(inline(), prefix), title)
+    url = getPrerenderedImageURL(kind, adjlist, imageFormat)
+    if url is None:
+        adjlist_url = adjlist.replace('\n', ';')
+        adjlist_url = re.sub('\s+', '%20', adjlist_url)
+        view = 'drawMolecule' if kind == 'molecule' else 'drawGroup'
+        if imageFormat == 'svg':
+            view += 'SVG'
+        url = reverse('rmgweb.main.views.' + view, kwargs={'adjlist': adjlist_url})
+        if batch:
+            # The script falls back to the usual URL if it can't fetch the image
+            return '<img src="/media/loading.gif" data-src="{0}" data-kind="{1}" data-adjlist="{2}" data-format="{3}" alt="{4}" title="{4}"/>'.format(url, kind, escape(adjlist), imageFormat, title)
+    return '<img src="{0}" alt="{1}" title="{1}"/>'.format(url, title)
+
+def getStructureMarkup(item, imageFormat=None, inline=False, batch=False):
     """
     Return the HTML used to markup structure information for the given `item`.
     For a :class:`Molecule`, the markup is an ``<img>`` tag so that we can
     draw the molecule. For a :class:`Group`, the markup is the
     adjacency list, wrapped in ``<pre>`` tags.
+    
+    Images are drawn in the given `imageFormat`, either ``'png'`` or
+    ``'svg'`` (``settings.STRUCTURE_IMAGE_FORMAT`` by default). If `inline` is
+    ``True``, SVG images are embedded in the markup rather than linked, which
+    saves a request per image. If `batch` is ``True``, images are fetched
+    together by the ``structures.js`` script, which must then be included in
+    the page; this saves a request per image for pages with many of them.
     """
     from rmgpy.molecule import Molecule
     from rmgpy.group import Group
     from rmgpy.species import Species
+    from images import getMoleculeImage, getGroupImage
+    import settings
     
-    if isinstance(item, Molecule):
-        # We can draw Molecule objects, so use that instead of an adjacency list
-        adjlist = item.toAdjacencyList(removeH=True)
-        adjlist = adjlist.replace('\n', ';')
-        adjlist = re.sub('\s+', '%20', adjlist)
-        structure = '<img src="{0}" alt="{1}" title="{1}"/>'.format(reverse('rmgweb.main.views.drawMolecule', kwargs={'adjlist': adjlist}), '')
-    elif isinstance(item, Species) and len(item.molecule) > 0:
+    imageFormat = imageFormat or settings.STRUCTURE_IMAGE_FORMAT
+    inline = inline and imageFormat == 'svg'
+    
+    if isinstance(item, Species) and len(item.molecule) > 0:
         # We can draw Species objects, so use that instead of an adjacency list
-        adjlist = item.molecule[0].toAdjacencyList(removeH=True)
-        adjlist = adjlist.replace('\n', ';')
-        adjlist = re.sub('\s+', '%20', adjlist)
-        structure = '<img src="{0}" alt="{1}" title="{1}"/>'.format(reverse('rmgweb.main.views.drawMolecule', kwargs={'adjlist': adjlist}), item.label)
+        molecule = item.molecule[0]
+        title = item.label
+    else:
+        molecule = item
+        title = ''
+    
+    if isinstance(molecule, Molecule):
+        # We can draw Molecule objects, so use that instead of an adjacency list
+        adjlist = molecule.toAdjacencyList(removeH=True)
+        structure = getStructureImageMarkup('molecule', adjlist, title, imageFormat,
+            inline = (lambda: getMoleculeImage(molecule, 'svg')) if inline else None, batch=batch)
     elif isinstance(item, Species) and len(item.molecule) == 0:
         # We can draw Species objects, so use that instead of an adjacency list
         structure = item.label
     elif isinstance(item, Group):
         # We can draw Group objects, so use that instead of an adjacency list
         adjlist = item.toAdjacencyList()
-        adjlist_url = adjlist.replace('\n', ';')
-        adjlist_url = re.sub('\s+', '%20', adjlist_url)
-        structure = '<img src="{0}" alt="{1}" title="{1}" />'.format(reverse('rmgweb.main.views.drawGroup', kwargs={'adjlist': adjlist_url}), adjlist)
+        structure = getStructureImageMarkup('group', adjlist, adjlist, imageFormat,
+            inline = (lambda: getGroupImage(adjlist, 'svg')) if inline else None, batch=batch)
         #structure += '<pre style="font-size:small;" class="adjacancy_list">{0}</pre>'.format(adjlist)
     elif isinstance(item, str) or isinstance(item, unicode):
         structure = item
@@ -30,15 +30,21 @@
 
 from django.shortcuts import render_to_response
 from django.template import RequestContext
-from django.http import HttpResponse, HttpResponseRedirect, HttpResponseNotFound
+from django.http import HttpResponse, HttpResponseRedirect, HttpResponseNotFound, HttpResponseNotModified, HttpResponseBadRequest
 import django.contrib.auth.views
 from django.core.urlresolvers import reverse
 from django.contrib import auth
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
+import sys
 import urllib, urllib2
+import json
+import hashlib
+import settings
 
 from forms import *
+from images import *
+from middleware import forgetUserUnits
 
 def index(request):
     """
@@ -114,6 +120,8 @@ def editProfile(request):
             userForm.save()
             profileForm.save()
             passwordForm.save()
+            # Show the new choice of units from now on
+            forgetUserUnits(request)
             return HttpResponseRedirect(reverse(viewProfile, kwargs={'username': request.user.username})) # Redirect after POST
     else:
         userForm = UserForm(instance=request.user, error_class=DivErrorList)
@@ -191,56 +199,124 @@ def cactusResolver(request, query):
     response = f.read()
     return HttpResponse(response, mimetype="text/plain")
     
-def drawMolecule(request, adjlist):
+def getImageResponse(request, key, format, getImage):
+    """
+    Return a response containing the image in the given `format` with the
+    given cache `key`, as returned by calling `getImage`, which should take
+    the image from the cache if possible. The response can be cached by
+    browsers and proxies, and is empty (with status 304) if the browser
+    already has the image.
+    """
+    etag = '"{0}"'.format(imageCaches[format].getHash(key))
+    if etag in [tag.strip() for tag in request.META.get('HTTP_IF_NONE_MATCH', '').split(',')]:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(getImage(), mimetype=IMAGE_MIMETYPES[format])
+    response['ETag'] = etag
+    response['Cache-Control'] = 'public, max-age={0:d}'.format(settings.IMAGE_CACHE_MAX_AGE)
+    return response
+
+def drawMolecule(request, adjlist, format='png'):
     """
     Returns an image of the provided adjacency list `adjlist` for a molecule.
     Note that the newline character cannot be represented in a URL;
-    semicolons should be used instead.
+    semicolons should be used instead. Images are cached by molecule, so
+    adjacency lists of the same molecule with different atom orderings share
+    a single cached image.
     """
     from rmgpy.molecule import Molecule
-    from rmgpy.molecule_draw import drawMolecule
-
-    response = HttpResponse(mimetype="image/png")
 
     adjlist = str(adjlist.replace(';', '\n'))
     molecule = Molecule().fromAdjacencyList(adjlist)
-    surface, cr, rect = drawMolecule(molecule, surface='png')
-    surface.write_to_png(response)
+    return getImageResponse(request, getMoleculeImageKey(molecule), format, lambda: getMoleculeImage(molecule, format))
 
-    return response
+def drawMoleculeSVG(request, adjlist):
+    """
+    Returns an SVG image of the provided adjacency list `adjlist` for a
+    molecule.
+    """
+    return drawMolecule(request, adjlist, format='svg')
 
-def drawGroup(request, adjlist):
+def drawGroup(request, adjlist, format='png'):
     """
     Returns an image of the provided adjacency list `adjlist` for a molecular
     pattern. Note that the newline character cannot be represented in a URL;
     semicolons should be used instead.
     """
-    from rmgpy.group import Group
-    import pydot
+    adjlist = str(adjlist.replace(';', '\n'))
+    return getImageResponse(request, getGroupImageKey(adjlist), format, lambda: getGroupImage(adjlist, format))
+
+def drawGroupSVG(request, adjlist):
+    """
+    Returns an SVG image of the provided adjacency list `adjlist` for a
+    molecular pattern.
+    """
+    return drawGroup(request, adjlist, format='svg')
 
-    response = HttpResponse(mimetype="image/png")
+def drawStructures(request):
+    """
+    Returns the images of many molecules and groups at once, so that pages
+    showing lots of structures need only a few requests to fetch them all.
+    The structures are given in the query string as repeated `s` parameters
+    of the form "kind:adjlist", where `kind` is either "molecule" or "group",
+    along with the image `format`. The response is a JSON object whose
+    `images` are a list of ``data:`` URIs in the same order, with ``null`` for
+    any structure that could not be drawn. At most
+    ``settings.STRUCTURE_BATCH_SIZE`` structures can be requested at once.
+    Like the images themselves, the response can be cached by browsers and
+    proxies, and is empty (with status 304) if the browser already has it,
+    unless any of the structures could not be drawn.
+    """
+    structures = request.GET.getlist('s')
+    format = request.GET.get('format', 'png')
+    if format not in IMAGE_MIMETYPES:
+        return HttpResponseBadRequest('Invalid image format "{0}".'.format(format))
+    if len(structures) > settings.STRUCTURE_BATCH_SIZE:
+        return HttpResponseBadRequest('Expected at most {0:d} structures.'.format(settings.STRUCTURE_BATCH_SIZE))
 
-    adjlist = str(adjlist.replace(';', '\n'))
-    pattern = Group().fromAdjacencyList(adjlist)
-
-    graph = pydot.Dot(graph_type='graph', dpi=52)
-    for index, atom in enumerate(pattern.atoms):
-        atomType = '%s ' % atom.label if atom.label != '' else ''
-        atomType += ','.join([atomType.label for atomType in atom.atomType])
-        graph.add_node(pydot.Node(name='%i' % (index+1), label=atomType, fontname='Helvetica', fontsize=16))
-    for atom1, bonds in pattern.bonds.iteritems():
-        for atom2, bond in bonds.iteritems():
-            index1 = pattern.atoms.index(atom1)
-            index2 = pattern.atoms.index(atom2)
-            if index1 < index2:
-                bondType = ','.join([order for order in bond.order])
-                graph.add_edge(pydot.Edge(
-                    src = '%i' % (index1+1),
-                    dst = '%i' % (index2+1),
-                    label = bondType,
-                    fontname='Helvetica', fontsize = 16,
-                ))
-
-    response.write(graph.create(prog='neato', format='png'))
+    cache = imageCaches[format]
+    images = []
+    for structure in structures:
+        try:
+            kind, adjlist = str(structure).split(':', 1)
+            images.append(getStructureImageKey(kind, adjlist))
+        except (ValueError, KeyError, IndexError):
+            # Not a valid kind and adjacency list
+            images.append(None)
+        except Exception, e:
+            logStructureError(structure, e)
+            images.append(None)
 
+    # The response only changes if one of the images does
+    hashes = [cache.getHash(image[0]) if image is not None else '' for image in images]
+    etag = '"{0}"'.format(hashlib.sha1(format + '\n' + '\n'.join(hashes)).hexdigest())
+    if None not in images and etag in [tag.strip() for tag in request.META.get('HTTP_IF_NONE_MATCH', '').split(',')]:
+        response = HttpResponseNotModified()
+    else:
+        uris = []
+        for structure, image in zip(structures, images):
+            if image is None:
+                uris.append(None)
+                continue
+            key, getImage = image
+            try:
+                uris.append(getDataURI(getImage(format), format))
+            except Exception, e:
+                logStructureError(structure, e)
+                uris.append(None)
+        response = HttpResponse(json.dumps({'images': uris}), mimetype="application/json")
+        if None in uris:
+            # Don't let the failure be cached, in case it was only temporary
+            response['Cache-Control'] = 'no-cache'
+            return response
+    response['ETag'] = etag
+    response['Cache-Control'] = 'public, max-age={0:d}'.format(settings.IMAGE_CACHE_MAX_AGE)
     return response
+
+def logStructureError(structure, error):
+    """
+    Report the `error` raised while drawing the `structure` requested from
+    :func:`drawStructures` in the server's error log.
+    """
+    print >> sys.stderr, 'Unable to draw structure {0!r}: {1!r}'.format(structure, error)
+    sys.stderr.flush()
@@ -0,0 +1,87 @@
+///////////////////////////////////////////////////////////////////////////////
+//
+//  structures.js - Fetch the images of many structures at once
+//
+//  Copyright (c) 2011 Prof. William H. Green (whgreen@mit.edu) and the
+//  RMG Team (rmg_dev@mit.edu)
+//
+//  Permission is hereby granted, free of charge, to any person obtaining a
+//  copy of this software and associated documentation files (the 'Software'),
+//  to deal in the Software without restriction, including without limitation
+//  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+//  and/or sell copies of the Software, and to permit persons to whom the
+//  Software is furnished to do so, subject to the following conditions:
+//
+//  The above copyright notice and this permission notice shall be included in
+//  all copies or substantial portions of the Software.
+//
+//  THE SOFTWARE IS PROVIDED 'AS IS', WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+//  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+//  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+//  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+//  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+//  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+//  DEALINGS IN THE SOFTWARE.
+//
+////////////////////////////////////////////////////////////////////////////////
+
+/**
+ * Fetch the images of every structure on the page marked up for batching by
+ * getStructureMarkup(), i.e. every <img> with a data-adjlist attribute, using
+ * a few requests to /structures/ rather than one request per image. Repeated
+ * structures are only fetched once. The structures are sorted and split into
+ * batches of at most batchSize structures and maxLength characters of query
+ * string, so that the same page always makes the same GET requests, which
+ * the browser can then answer from its cache. Any image that can't be
+ * fetched this way is loaded from its usual URL, given by the data-src
+ * attribute, instead. This can be called again after adding more images to
+ * the page.
+ */
+function loadStructureImages(batchSize, maxLength) {
+    batchSize = batchSize || 100;
+    maxLength = maxLength || 1800;
+    var requests = {};
+    $("img[data-adjlist]").each(function() {
+        var format = $(this).attr("data-format") || "png";
+        var key = $(this).attr("data-kind") + ":" + $(this).attr("data-adjlist");
+        if (!(format in requests)) requests[format] = {keys: [], images: {}};
+        if (!(key in requests[format].images)) {
+            requests[format].keys.push(key);
+            requests[format].images[key] = [];
+        }
+        requests[format].images[key].push(this);
+    });
+    $.each(requests, function(format, request) {
+        var fetch = function(keys, query) {
+            var show = function(images) {
+                $.each(keys, function(i, key) {
+                    $.each(request.images[key], function(j, img) {
+                        $(img).attr("src", images[i] || $(img).attr("data-src")).removeAttr("data-adjlist");
+                    });
+                });
+            };
+            $.ajax({
+                type: "GET",
+                url: "/structures/?" + query,
+                dataType: "json",
+                success: function(result) { show(result.images); },
+                error: function() { show([]); }
+            });
+        };
+        request.keys.sort();
+        var keys = [], query = "format=" + encodeURIComponent(format);
+        $.each(request.keys, function(i, key) {
+            var param = "&s=" + encodeURIComponent(key);
+            if (keys.length > 0 && (keys.length >= batchSize || query.length + param.length > maxLength)) {
+                fetch(keys, query);
+                keys = [];
+                query = "format=" + encodeURIComponent(format);
+            }
+            keys.push(key);
+            query += param;
+        });
+        if (keys.length > 0) fetch(keys, query);
+    });
+}
+
+$(document).ready(function() { loadStructureImages(); });
@@ -0,0 +1,80 @@
+///////////////////////////////////////////////////////////////////////////////
+//
+//  tables.js - Paginated tables of database entries
+//
+//  Copyright (c) 2011 Prof. William H. Green (whgreen@mit.edu) and the
+//  RMG Team (rmg_dev@mit.edu)
+//
+//  Permission is hereby granted, free of charge, to any person obtaining a
+//  copy of this software and associated documentation files (the 'Software'),
+//  to deal in the Software without restriction, including without limitation
+//  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+//  and/or sell copies of the Software, and to permit persons to whom the
+//  Software is furnished to do so, subject to the following conditions:
+//
+//  The above copyright notice and this permission notice shall be included in
+//  all copies or substantial portions of the Software.
+//
+//  THE SOFTWARE IS PROVIDED 'AS IS', WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+//  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+//  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+//  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+//  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+//  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+//  DEALINGS IN THE SOFTWARE.
+//
+////////////////////////////////////////////////////////////////////////////////
+
+/**
+ * Append the next page of rows to a paginated table of database entries when
+ * its "Show more" button is clicked. The button gives the URL of the JSON rows
+ * for the table, the page shown so far, the sort order, the id of the table,
+ * and the name of the function that makes a table row from each JSON row.
+ */
+function showMoreRows(button) {
+    var $button = $(button);
+    var table = $("#" + $button.attr("data-table"));
+    var makeRow = window[$button.attr("data-row")];
+    var sort = $button.attr("data-sort");
+    $button.attr("disabled", true);
+    $.getJSON($button.attr("data-url"), {page: parseInt($button.attr("data-page")) + 1, sort: sort}, function(result) {
+        $.each(result.rows, function(i, row) { table.append(makeRow(row)); });
+        $button.attr("data-page", result.page);
+        $button.siblings("a.nextPage").attr("href", "?page=" + (result.page + 1) + "&sort=" + sort);
+        if (result.page >= result.numPages) {
+            $button.siblings("a.nextPage").andSelf().hide();
+        }
+        else {
+            $button.attr("disabled", false);
+        }
+        if (typeof loadStructureImages == "function") loadStructureImages();
+    });
+}
+
+/**
+ * Return a row of a table of thermo entries from its JSON `row`.
+ */
+function makeThermoRow(row) {
+    var tr = $("<tr/>");
+    tr.append($("<td/>").append($("<a/>").attr("href", row.url).text(row.index + ". " + row.label)));
+    tr.append($("<td/>").html(row.structure));
+    tr.append($("<td/>").text(row.dataFormat));
+    return tr;
+}
+
+/**
+ * Return a row of a table of kinetics entries from its JSON `row`.
+ */
+function makeKineticsRow(row) {
+    var tr = $("<tr/>");
+    tr.append($("<td/>").append($("<a/>").attr("href", row.url).text(row.index + ". " + row.label)));
+    tr.append($("<td class='reactants'/>").html(row.reactants));
+    tr.append($("<td class='reactionArrow'/>").html(row.arrow));
+    tr.append($("<td class='products'/>").html(row.products));
+    tr.append($("<td/>").text(row.dataFormat));
+    return tr;
+}
+
+$(document).ready(function() {
+    $("button.moreRows").click(function() { showMoreRows(this); });
+});
@@ -94,6 +94,8 @@ MIDDLEWARE_CLASSES = (
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    # Keeps each user's preferred units in their session
+    'rmgweb.main.middleware.UserUnitsMiddleware',
 )
 
 TEMPLATE_CONTEXT_PROCESSORS = (
@@ -139,3 +141,94 @@ INSTALLED_APPS = (
 LOGIN_URL = '/login'
 LOGIN_REDIRECT_URL = '/'
 AUTH_PROFILE_MODULE = 'main.UserProfile'
+
+# Settings relating to the RMG database
+
+# Directory for files generated by the website, such as database snapshots
+CACHE_PATH = os.path.join(PROJECT_PATH, 'cache')
+
+# Whether to measure roughly how much memory each part of the RMG database
+# uses when it is warmed up in wsgi.py, for the staff profile page; this slows
+# down startup, so "manage.py databaseprofile" is usually the better way
+DATABASE_PROFILE_SIZES = False
+
+# Where to keep a snapshot of the fully-loaded RMG database, so that newly
+# started processes can load it instead of parsing all of the database files;
+# set to None to disable snapshots. It is saved when the database is warmed up
+# in wsgi.py (if it had to be parsed) or by "manage.py snapshotdatabase"
+DATABASE_SNAPSHOT_PATH = os.path.join(CACHE_PATH, 'database.pkl')
+
+# Watch the database files for changes in a background thread, using inotify
+# if pyinotify is installed or else polling every DATABASE_WATCHER_INTERVAL
+# seconds; if False, every database file is checked on every request instead
+DATABASE_WATCHER = True
+DATABASE_WATCHER_INTERVAL = 5.0
+
+# Settings relating to drawing molecules and groups
+
+# Where to keep images of molecules and groups once drawn, and the maximum
+# total size of those images in bytes
+IMAGE_CACHE_PATH = os.path.join(CACHE_PATH, 'images')
+IMAGE_CACHE_SIZE = 100 * 1024 * 1024
+
+# How long browsers and proxies may cache images of molecules and groups, in s
+IMAGE_CACHE_MAX_AGE = 30 * 24 * 60 * 60
+
+# The default format of images of molecules and groups on the website pages,
+# either 'png' or 'svg'
+STRUCTURE_IMAGE_FORMAT = 'png'
+
+# How to draw images of groups: 'neato' to run the Graphviz neato program for
+# each one, or 'cairo' to lay out and draw them within the website process
+# (experimental; compare the two with "manage.py benchmarkgroups" first)
+GROUP_IMAGE_RENDERER = 'neato'
+
+# Where images of the structures in the RMG database are pre-rendered to by
+# the prerenderstructures command, and the URL they are served from; set
+# STRUCTURE_IMAGE_ROOT to None to always draw images on demand instead
+STRUCTURE_IMAGE_ROOT = os.path.join(MEDIA_ROOT, 'structures')
+STRUCTURE_IMAGE_URL = MEDIA_URL + 'structures/'
+
+# The most images of structures that can be fetched in a single request
+STRUCTURE_BATCH_SIZE = 200
+
+# The number of entries shown on each page of a table of database entries
+DATABASE_TABLE_PAGE_SIZE = 100
+
+# How to cache the reactions found by searching the kinetics database: the
+# BACKEND is 'memory' to keep them in each website process, 'sqlite' to share
+# them between processes in a SQLite database at PATH, or None to disable the
+# cache; at most MAX_ENTRIES searches are kept, each for up to TIMEOUT seconds
+REACTION_CACHE = {
+    'BACKEND': 'memory',
+    'PATH': os.path.join(CACHE_PATH, 'reactions.sqlite'),
+    'MAX_ENTRIES': 500,
+    'TIMEOUT': 24 * 60 * 60,
+}
+
+# Where the RMG-Java PopulateReactions server listens, and the most time in s
+# that a kinetics search waits for it to answer before showing the results
+# without those from RMG-Java
+RMG_JAVA_HOST = 'localhost'
+RMG_JAVA_PORT = 5000
+RMG_JAVA_TIMEOUT = 10.0
+
+# How RMG-Java's answers are delimited: 'close' if the server closes the
+# connection after each answer, as the RMG-Java server does, or 'length' if
+# each request and answer is preceded by its length as a four-byte big-endian
+# integer, in which case up to RMG_JAVA_POOL_SIZE connections are reused.
+# The stock RMG-Java server only speaks 'close', so with the default below
+# every query opens a new connection and RMG_JAVA_POOL_SIZE has no effect;
+# connections are only pooled with a server (or proxy) that supports 'length'
+RMG_JAVA_FRAMING = 'close'
+RMG_JAVA_POOL_SIZE = 4
+
+# How finely the rate coefficient and thermodynamics plots are sampled: each
+# curve is drawn with just enough points (at most PLOT_MAX_POINTS) that it is
+# within PLOT_TOLERANCE of the exact curve, as a fraction of its height
+PLOT_TOLERANCE = 0.002
+PLOT_MAX_POINTS = 200
+
+# The most plot data and math (for each user's choice of units) kept in each
+# website process for each of kinetics, thermo and statmech models
+PLOT_CACHE_SIZE = 1000
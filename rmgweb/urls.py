@@ -64,7 +64,11 @@ urlpatterns = patterns('rmgweb',
     (r'^measure/', include('pdep.urls')),
 
     # Molecule drawing
+    # The SVG versions are first to avoid "svg/" being read as part of the adjacency list
+    (r'^molecule/svg/(?P<adjlist>[\S\s]+)$', 'main.views.drawMoleculeSVG'),
+    (r'^group/svg/(?P<adjlist>[\S\s]+)$', 'main.views.drawGroupSVG'),
     (r'^molecule/(?P<adjlist>[\S\s]+)$', 'main.views.drawMolecule'),
+    (r'^structures/?$', 'main.views.drawStructures'),
     (r'^group/(?P<adjlist>[\S\s]+)$', 'main.views.drawGroup'),
     
     (r'^adjacencylist/(?P<identifier>.*)$', 'main.views.getAdjacencyList'),
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+################################################################################
+#
+#	RMG Website - A Django-powered website for Reaction Mechanism Generator
+#
+#	Copyright (c) 2011 Prof. William H. Green (whgreen@mit.edu) and the
+#	RMG Team (rmg_dev@mit.edu)
+#
+#	Permission is hereby granted, free of charge, to any person obtaining a
+#	copy of this software and associated documentation files (the 'Software'),
+#	to deal in the Software without restriction, including without limitation
+#	the rights to use, copy, modify, merge, publish, distribute, sublicense,
+#	and/or sell copies of the Software, and to permit persons to whom the
+#	Software is furnished to do so, subject to the following conditions:
+#
+#	The above copyright notice and this permission notice shall be included in
+#	all copies or substantial portions of the Software.
+#
+#	THE SOFTWARE IS PROVIDED 'AS IS', WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#	IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#	FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#	AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#	LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+#	FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#	DEALINGS IN THE SOFTWARE.
+#
+################################################################################
+
+"""
+The WSGI application for serving the RMG website in production.
+
+Importing this module also fully loads the RMG database. Servers that import
+the application in a master process and then fork workers (e.g. gunicorn with
+``--preload``) therefore start every worker with the database already loaded
+and shared between them; the ``database/ready`` URL reports whether the
+worker handling it is warm.
+"""
+
+import os
+import sys
+
+# Make both the rmgweb package and its modules importable, as manage.py does
+PROJECT_PATH = os.path.dirname(os.path.abspath(__file__))
+for path in [PROJECT_PATH, os.path.dirname(PROJECT_PATH)]:
+    if path not in sys.path:
+        sys.path.insert(0, path)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rmgweb.settings')
+
+import django.core.handlers.wsgi
+application = django.core.handlers.wsgi.WSGIHandler()
+
+from rmgweb.database.tools import warmDatabase
+warmDatabase()